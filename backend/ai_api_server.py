@@ -8,17 +8,29 @@ pandas, scikit-learn, transformers, and other ML libraries.
 
 Endpoints:
 - POST /api/ai/generate-itinerary: Generate intelligent itinerary
+- POST /api/ai/generate-itinerary/batch: Generate many itineraries, streamed as NDJSON
+- POST /api/ai/generate-itinerary/stream: Stream one itinerary day by day (NDJSON or SSE)
+- POST /api/ai/replan-itinerary: Apply one edit to an existing itinerary
 - GET /api/ai/destinations: Get available destinations
+- GET /api/ai/regions: List catalog regions and which are loaded
 - GET /api/ai/health: Health check
+- GET /api/ai/metrics: Prometheus metrics (request and per-stage latency histograms)
+- GET /api/ai/health/live: Liveness probe (process is up)
+- GET /api/ai/health/ready: Readiness probe (models loaded and warmed up)
 - POST /api/ai/analyze-preferences: Analyze user travel preferences
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Body, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Any
+import asyncio
+import hmac
 import logging
 import json
+import os
 from datetime import datetime
 import uvicorn
 
@@ -27,7 +39,27 @@ from ai_itinerary_service import (
     IntelligentItineraryAI, 
     UserPreferences, 
     TravelStyle,
-    ai_itinerary_service
+    EMBEDDING_MODEL_KEY,
+    INFERENCE_BACKEND,
+    ai_itinerary_service,
+    analyze_preferences_batch_task,
+    analyze_preferences_task,
+    generate_itinerary_from_signals_task,
+    iter_itinerary_task,
+    replan_itinerary_task,
+    generate_itinerary_task,
+    warmup_worker
+)
+from app.cache import init_redis
+from services.itinerary_cache import ItineraryCache, canonical_preferences
+from services.region_catalog import normalize_region
+from services.metrics import STAGE_HISTOGRAM, metrics
+from services.profiling import PROFILE_MODES, profiler
+from services.prefork import memory_usage
+from services.generation_executor import (
+    ExecutorSaturatedError,
+    GenerationExecutor,
+    GenerationTimeoutError
 )
 
 # Configure logging
@@ -73,6 +105,22 @@ class ItineraryResponse(BaseModel):
     personalization_score: Optional[float] = None
     generation_time: Optional[float] = None
 
+class ItineraryEdit(BaseModel):
+    """A single edit to an existing itinerary"""
+    type: str = Field(..., description="swap_destination, set_stop_duration, exclude_activity or swap_days")
+    destination: Optional[str] = Field(default=None, description="Stop to change (swap_destination, set_stop_duration)")
+    new_destination: Optional[str] = Field(default=None, description="Replacement stop (swap_destination)")
+    days: Optional[int] = Field(default=None, ge=1, le=30, description="New number of days at the stop (set_stop_duration)")
+    activity: Optional[str] = Field(default=None, description="Activity name to exclude (exclude_activity)")
+    day_a: Optional[int] = Field(default=None, ge=1, description="First day to swap (swap_days)")
+    day_b: Optional[int] = Field(default=None, ge=1, description="Second day to swap (swap_days)")
+
+class ReplanRequest(BaseModel):
+    """Request model for incremental re-planning"""
+    preferences: ItineraryRequest
+    itinerary: Dict[str, Any]
+    edit: ItineraryEdit
+
 class PreferenceAnalysisRequest(BaseModel):
     """Request model for preference analysis"""
     interests: List[str]
@@ -104,33 +152,92 @@ class HealthResponse(BaseModel):
     ai_models_loaded: bool
     timestamp: str
 
-# Global variables for tracking
-request_count = 0
-generation_times = []
+class ReadinessResponse(BaseModel):
+    """Readiness probe response with per-model load state"""
+    status: str
+    ready: bool
+    warmed_up: bool
+    warmup_seconds: Optional[float] = None
+    warmup_error: Optional[str] = None
+    models: Dict[str, Dict[str, Any]]
+    timestamp: str
+
+class ProfileConfig(BaseModel):
+    """Runtime profiler settings; omitted fields are left unchanged"""
+    rate: Optional[float] = Field(default=None, ge=0, le=1, description="Fraction of requests to profile (0 disables)")
+    mode: Optional[str] = Field(default=None, description="cprofile or sample")
+
+# Request counter and per-endpoint latency histograms (fixed memory, see services/metrics.py)
+GENERATION_HISTOGRAM = "ai_generation_seconds"
+request_counter = metrics.counter("ai_itinerary_requests", "Itinerary requests received")
+
+def _next_request_number(count: int = 1) -> int:
+    return int(request_counter.inc(count))
+
+def _observe_generation(endpoint: str, seconds: float):
+    metrics.histogram(GENERATION_HISTOGRAM, "End-to-end itinerary generation time", endpoint=endpoint).observe(seconds)
+
+# Warm models up in the background at startup so liveness probes answer immediately
+WARMUP_ON_STARTUP = os.getenv("AI_WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# CPU-bound generation runs on this pool so the event loop stays free for other requests
+generation_executor = GenerationExecutor()
+if generation_executor.mode == "process":
+    generation_executor.initializer = warmup_worker
+
+# Finished itineraries cached by canonical preferences, re-dated on hits
+itinerary_cache = ItineraryCache(ai_itinerary_service.restamp_itinerary, version=EMBEDDING_MODEL_KEY)
+
+# Upper bound on profiles accepted by the batch endpoint
+MAX_BATCH_ITEMS = int(os.getenv("AI_MAX_BATCH_ITEMS", "100"))
+
+# Admin endpoints (profiling) are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("AI_ADMIN_TOKEN", "")
+
+def _require_admin(request: Request):
+    """Accept ``X-Admin-Token: <token>`` or ``Authorization: Bearer <token>``; 404 when admin is disabled"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("x-admin-token", "")
+    authorization = request.headers.get("authorization", "")
+    if not supplied and authorization.lower().startswith("bearer "):
+        supplied = authorization[7:].strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def _executor_http_error(e: Exception) -> HTTPException:
+    """Map executor admission/timeout failures to 503/504"""
+    if isinstance(e, ExecutorSaturatedError):
+        return HTTPException(status_code=503, detail=str(e))
+    return HTTPException(status_code=504, detail=str(e))
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize AI service on startup"""
+    """Start model warmup on startup"""
     logger.info("Starting AI Itinerary Service...")
     try:
-        # The AI service is already initialized globally
-        logger.info("AI Itinerary Service started successfully!")
-        logger.info(f"Loaded {len(ai_itinerary_service.destinations_df)} destinations")
-        logger.info(f"Loaded {len(ai_itinerary_service.activities_df)} activities")
+        if os.getenv("REDIS_URL"):
+            init_redis(os.getenv("REDIS_URL"))
+        if WARMUP_ON_STARTUP:
+            ai_itinerary_service.models.start_background_warmup()
+            logger.info("AI Itinerary Service started, models warming up in the background")
+        else:
+            logger.info("AI Itinerary Service started, models will load on first request")
     except Exception as e:
         logger.error(f"Failed to start AI service: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the generation pool"""
+    generation_executor.shutdown(wait=False)
+
 @app.get("/api/ai/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
     try:
-        # Check if AI models are loaded
-        models_loaded = (
-            ai_itinerary_service.sentence_model is not None and
-            ai_itinerary_service.nlp_pipeline is not None and
-            ai_itinerary_service.destinations_df is not None
-        )
+        # Report load state without triggering a model load
+        models_loaded = ai_itinerary_service.models.is_ready
         
         return HealthResponse(
             status="healthy",
@@ -143,12 +250,45 @@ async def health_check():
         logger.error(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Service unhealthy: {str(e)}")
 
+@app.get("/api/ai/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {
+        "status": "alive",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/ai/health/ready", response_model=ReadinessResponse)
+async def readiness_check():
+    """Readiness probe: 200 once every model is loaded and warmed up, 503 before"""
+    model_status = ai_itinerary_service.models.status()
+    response = ReadinessResponse(
+        status="ready" if model_status['ready'] else "not_ready",
+        timestamp=datetime.now().isoformat(),
+        **model_status
+    )
+    if not model_status['ready']:
+        return JSONResponse(status_code=503, content=response.model_dump())
+    return response
+
 @app.get("/api/ai/destinations")
-async def get_destinations():
+async def get_destinations(region: Optional[str] = None):
     """Get available destinations with details"""
     try:
+        regions = ai_itinerary_service.regions
+        if region is not None and not regions.has_region(region):
+            raise HTTPException(status_code=404, detail=f"Unknown region: {region}")
+        region_name = normalize_region(region or ai_itinerary_service.default_region)
+        
+        # Listing only needs the raw table; a region that is not resident is read (not prepared) off the loop
+        region_data = regions.peek(region_name)
+        if region_data is not None:
+            destinations_df = region_data.destinations_df
+        else:
+            destinations_df, _ = await asyncio.to_thread(regions.load_frames, region_name)
+        
         destinations = []
-        for _, dest in ai_itinerary_service.destinations_df.iterrows():
+        for _, dest in destinations_df.iterrows():
             destinations.append(DestinationInfo(
                 name=dest['name'],
                 category=dest['category'],
@@ -161,13 +301,28 @@ async def get_destinations():
         
         return {
             "success": True,
+            "region": region_name,
             "destinations": destinations,
             "total_count": len(destinations)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting destinations: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get destinations: {str(e)}")
 
+@app.get("/api/ai/regions")
+async def get_regions():
+    """List catalog regions and which of them are currently loaded"""
+    try:
+        return {
+            "success": True,
+            **ai_itinerary_service.regions.stats()
+        }
+    except Exception as e:
+        logger.error(f"Error getting regions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get regions: {str(e)}")
+
 @app.post("/api/ai/analyze-preferences", response_model=PreferenceAnalysisResponse)
 async def analyze_preferences(request: PreferenceAnalysisRequest):
     """Analyze user travel preferences using NLP"""
@@ -183,70 +338,83 @@ async def analyze_preferences(request: PreferenceAnalysisRequest):
             start_date=datetime.now().strftime("%Y-%m-%d")
         )
         
-        # Analyze preferences
-        analysis_result = ai_itinerary_service.analyze_user_preferences(preferences)
+        # Analyze preferences off the event loop
+        analysis = await generation_executor.run(analyze_preferences_task, preferences, top_n=5)
         
         # Generate recommendations based on analysis
-        top_activities = analysis_result['matched_activities'].head(5)
         recommendations = [
             f"Based on your interests, consider {activity['name']} - {activity['description']}"
-            for _, activity in top_activities.iterrows()
+            for activity in analysis['top_matching_activities']
         ]
         
         return PreferenceAnalysisResponse(
             success=True,
-            analysis={
-                "preference_categories": analysis_result['preference_categories'],
-                "emotion_analysis": analysis_result['emotion_analysis'],
-                "top_matching_activities": top_activities[['name', 'description', 'preference_score']].to_dict('records')
-            },
+            analysis=analysis,
             recommendations=recommendations
         )
         
+    except (ExecutorSaturatedError, GenerationTimeoutError) as e:
+        logger.error(f"Preference analysis not completed: {str(e)}")
+        raise _executor_http_error(e)
     except Exception as e:
         logger.error(f"Error analyzing preferences: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to analyze preferences: {str(e)}")
 
+def _build_user_preferences(request: ItineraryRequest) -> UserPreferences:
+    """
+    Validate an itinerary request and convert it to canonical UserPreferences
+    (normalized, sorted interests), raising 400 on a bad travel style
+    """
+    # Validate travel style
+    try:
+        travel_style = TravelStyle(request.travel_style.lower().replace('-', '_'))
+    except ValueError:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Invalid travel style. Must be one of: {[style.value for style in TravelStyle]}"
+        )
+    
+    # Create UserPreferences object
+    return canonical_preferences(UserPreferences(
+        destination=request.destination,
+        duration=request.duration,
+        budget=request.budget,
+        interests=request.interests,
+        travel_style=travel_style,
+        group_size=request.group_size,
+        start_date=request.start_date,
+        accommodation_preference=request.accommodation_preference,
+        transportation_preference=request.transportation_preference
+    ))
+
+async def _generate_or_cached(preferences: UserPreferences):
+    """Cached itinerary for ``preferences`` or a freshly generated one; returns (itinerary, cache_hit)"""
+    itinerary = itinerary_cache.get(preferences)
+    if itinerary is not None:
+        return itinerary, True
+    itinerary = await generation_executor.run(generate_itinerary_task, preferences)
+    itinerary_cache.set(preferences, itinerary)
+    return itinerary, False
+
 @app.post("/api/ai/generate-itinerary", response_model=ItineraryResponse)
 async def generate_itinerary(request: ItineraryRequest, background_tasks: BackgroundTasks):
     """Generate intelligent itinerary using AI/ML"""
-    global request_count, generation_times
     start_time = datetime.now()
-    request_count += 1
+    request_number = _next_request_number()
     
-    logger.info(f"Generating itinerary request #{request_count} for {request.destination}")
+    logger.info(f"Generating itinerary request #{request_number} for {request.destination}")
     
     try:
-        # Validate travel style
-        try:
-            travel_style = TravelStyle(request.travel_style.lower().replace('-', '_'))
-        except ValueError:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid travel style. Must be one of: {[style.value for style in TravelStyle]}"
-            )
-        
-        # Create UserPreferences object
-        preferences = UserPreferences(
-            destination=request.destination,
-            duration=request.duration,
-            budget=request.budget,
-            interests=request.interests,
-            travel_style=travel_style,
-            group_size=request.group_size,
-            start_date=request.start_date,
-            accommodation_preference=request.accommodation_preference,
-            transportation_preference=request.transportation_preference
-        )
+        preferences = _build_user_preferences(request)
         
         # Generate itinerary using AI service
         logger.info("Calling AI service to generate itinerary...")
-        itinerary = ai_itinerary_service.generate_intelligent_itinerary(preferences)
+        itinerary, cache_hit = await _generate_or_cached(preferences)
         
         # Calculate generation time
         end_time = datetime.now()
         generation_time = (end_time - start_time).total_seconds()
-        generation_times.append(generation_time)
+        _observe_generation('generate', generation_time)
         
         logger.info(f"Successfully generated itinerary in {generation_time:.2f} seconds")
         logger.info(f"Personalization score: {itinerary.get('personalization_score', 0):.3f}")
@@ -254,9 +422,10 @@ async def generate_itinerary(request: ItineraryRequest, background_tasks: Backgr
         # Add generation metadata
         itinerary['generation_metadata'] = {
             'generation_time_seconds': generation_time,
-            'request_number': request_count,
+            'request_number': request_number,
             'api_version': '1.0.0',
-            'ml_models_used': itinerary.get('ml_models_used', [])
+            'ml_models_used': itinerary.get('ml_models_used', []),
+            'cache_hit': cache_hit
         }
         
         return ItineraryResponse(
@@ -267,6 +436,11 @@ async def generate_itinerary(request: ItineraryRequest, background_tasks: Backgr
             generation_time=generation_time
         )
         
+    except HTTPException:
+        raise
+    except (ExecutorSaturatedError, GenerationTimeoutError) as e:
+        logger.error(f"Itinerary generation not completed: {str(e)}")
+        raise _executor_http_error(e)
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -274,27 +448,298 @@ async def generate_itinerary(request: ItineraryRequest, background_tasks: Backgr
         logger.error(f"Error generating itinerary: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate itinerary: {str(e)}")
 
+@app.post("/api/ai/generate-itinerary/batch")
+async def generate_itinerary_batch(
+    requests: List[ItineraryRequest] = Body(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+):
+    """
+    Generate itineraries for many preference profiles in one call.
+    All preference texts are encoded together and scored with one matrix multiply; itineraries
+    are streamed back as NDJSON lines ({index, success, ...}) in completion order.
+    """
+    _next_request_number(len(requests))
+    logger.info(f"Generating batch of {len(requests)} itineraries")
+    
+    # Invalid items are reported in the stream instead of failing the whole batch;
+    # cached itineraries are streamed right away and skip analysis
+    preferences_list, errors, cached = [], {}, {}
+    for index, request in enumerate(requests):
+        try:
+            preferences = _build_user_preferences(request)
+        except HTTPException as e:
+            errors[index] = e.detail
+            continue
+        itinerary = itinerary_cache.get(preferences)
+        if itinerary is not None:
+            cached[index] = itinerary
+        else:
+            preferences_list.append((index, preferences))
+    
+    try:
+        signals = await generation_executor.run(
+            analyze_preferences_batch_task, [preferences for _, preferences in preferences_list]
+        ) if preferences_list else []
+    except (ExecutorSaturatedError, GenerationTimeoutError) as e:
+        logger.error(f"Batch analysis not completed: {str(e)}")
+        raise _executor_http_error(e)
+    except Exception as e:
+        logger.error(f"Error analyzing batch preferences: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to analyze preferences: {str(e)}")
+    
+    # Leave one worker free of this batch so single requests still get through
+    slots = asyncio.Semaphore(max(1, generation_executor.max_workers - 1))
+    
+    async def generate_one(index: int, preferences: UserPreferences, item_signals: Dict) -> Dict:
+        async with slots:
+            start_time = datetime.now()
+            try:
+                itinerary = await generation_executor.run(
+                    generate_itinerary_from_signals_task, preferences, item_signals
+                )
+            except Exception as e:
+                logger.error(f"Error generating batch itinerary #{index}: {str(e)}")
+                return {"index": index, "success": False, "error": str(e)}
+            itinerary_cache.set(preferences, itinerary)
+            generation_time = (datetime.now() - start_time).total_seconds()
+            _observe_generation('batch_item', generation_time)
+            return {
+                "index": index,
+                "success": True,
+                "itinerary": itinerary,
+                "personalization_score": itinerary.get('personalization_score'),
+                "generation_time": generation_time,
+                "cache_hit": False
+            }
+    
+    async def stream():
+        for index, detail in errors.items():
+            yield json.dumps({"index": index, "success": False, "error": detail}) + "\n"
+        for index, itinerary in cached.items():
+            yield json.dumps(jsonable_encoder({
+                "index": index,
+                "success": True,
+                "itinerary": itinerary,
+                "personalization_score": itinerary.get('personalization_score'),
+                "generation_time": 0.0,
+                "cache_hit": True
+            })) + "\n"
+        tasks = [
+            asyncio.create_task(generate_one(index, preferences, item_signals))
+            for (index, preferences), item_signals in zip(preferences_list, signals)
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(jsonable_encoder(await finished)) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def _format_event(event: str, data: Any, sse: bool) -> str:
+    """One stream record as an SSE event or an NDJSON line"""
+    payload = json.dumps(jsonable_encoder(data))
+    if sse:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return json.dumps({"event": event, "data": json.loads(payload)}) + "\n"
+
+async def _cached_itinerary_events(itinerary: Dict):
+    """Replay a cached itinerary as the events a fresh generation would emit"""
+    route = itinerary['route_optimization']['optimal_sequence']
+    yield 'route', {
+        'destination': itinerary['destination'],
+        'duration': itinerary['duration'],
+        'optimal_sequence': route,
+        'days_per_destination': [sum(1 for day in itinerary['days'] if day['location'] == stop) for stop in route]
+    }
+    for day in itinerary['days']:
+        yield 'day', day
+    yield 'itinerary', itinerary
+
+@app.post("/api/ai/generate-itinerary/stream")
+async def generate_itinerary_stream(request: ItineraryRequest, http_request: Request, format: Optional[str] = None):
+    """
+    Stream an itinerary as it is generated: a 'route' event first, one 'day' event per
+    finished day, then a 'summary' event (costs, insights, everything but the days) and 'done'.
+    Server-Sent Events with ?format=sse or an ``Accept: text/event-stream`` header, NDJSON otherwise.
+    """
+    request_number = _next_request_number()
+    sse = format == "sse" or (format is None and "text/event-stream" in http_request.headers.get("accept", ""))
+    preferences = _build_user_preferences(request)
+    logger.info(f"Streaming itinerary request #{request_number} for {request.destination}")
+    
+    async def stream():
+        start_time = datetime.now()
+        cached = itinerary_cache.get(preferences)
+        if cached is not None:
+            events = _cached_itinerary_events(cached)
+        else:
+            events = generation_executor.stream(iter_itinerary_task, preferences)
+        try:
+            async for event, payload in events:
+                if event != 'itinerary':
+                    yield _format_event(event, payload, sse)
+                    continue
+                if cached is None:
+                    itinerary_cache.set(preferences, payload)
+                generation_time = (datetime.now() - start_time).total_seconds()
+                _observe_generation('stream', generation_time)
+                summary = {key: value for key, value in payload.items() if key != 'days'}
+                summary['generation_metadata'] = {
+                    'generation_time_seconds': generation_time,
+                    'request_number': request_number,
+                    'api_version': '1.0.0',
+                    'ml_models_used': payload.get('ml_models_used', []),
+                    'cache_hit': cached is not None
+                }
+                yield _format_event('summary', summary, sse)
+            yield _format_event('done', {'success': True}, sse)
+        except Exception as e:
+            logger.error(f"Error streaming itinerary: {str(e)}")
+            yield _format_event('error', {'success': False, 'error': str(e)}, sse)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream" if sse else "application/x-ndjson")
+
+@app.post("/api/ai/replan-itinerary", response_model=ItineraryResponse)
+async def replan_itinerary(request: ReplanRequest):
+    """Apply one edit to an existing itinerary, rebuilding only the affected days, legs and totals"""
+    start_time = datetime.now()
+    try:
+        preferences = _build_user_preferences(request.preferences)
+        itinerary = await generation_executor.run(
+            replan_itinerary_task, preferences, request.itinerary, request.edit.model_dump(exclude_none=True)
+        )
+        generation_time = (datetime.now() - start_time).total_seconds()
+        
+        return ItineraryResponse(
+            success=True,
+            message=f"Itinerary re-planned ({request.edit.type})",
+            itinerary=itinerary,
+            personalization_score=itinerary.get('personalization_score'),
+            generation_time=generation_time
+        )
+        
+    except HTTPException:
+        raise
+    except (ExecutorSaturatedError, GenerationTimeoutError) as e:
+        logger.error(f"Re-planning not completed: {str(e)}")
+        raise _executor_http_error(e)
+    except (ValueError, KeyError) as e:
+        logger.error(f"Invalid re-plan request: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Invalid edit: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error re-planning itinerary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to re-plan itinerary: {str(e)}")
+
 @app.get("/api/ai/stats")
 async def get_service_stats():
     """Get AI service statistics"""
     try:
-        avg_generation_time = sum(generation_times) / len(generation_times) if generation_times else 0
+        request_latency = metrics.histograms(GENERATION_HISTOGRAM)
+        generated = sum(snapshot['count'] for snapshot in request_latency.values())
+        avg_generation_time = (
+            sum(snapshot['avg_ms'] * snapshot['count'] for snapshot in request_latency.values()) / generated / 1000.0
+            if generated else 0
+        )
+        
+        # Only regions that are already prepared are reported; stats never loads a catalog
+        default_region = ai_itinerary_service.regions.peek(ai_itinerary_service.default_region)
         
         return {
-            "total_requests": request_count,
+            "total_requests": int(request_counter.value),
             "average_generation_time": round(avg_generation_time, 2),
-            "destinations_available": len(ai_itinerary_service.destinations_df),
-            "activities_available": len(ai_itinerary_service.activities_df),
+            "latency": {
+                "requests": request_latency,
+                "stages": metrics.histograms(STAGE_HISTOGRAM)
+            },
+            "destinations_available": len(default_region.destinations_df) if default_region is not None else None,
+            "activities_available": len(default_region.activities_df) if default_region is not None else None,
             "ml_models_loaded": {
-                "sentence_transformer": ai_itinerary_service.sentence_model is not None,
-                "nlp_pipeline": ai_itinerary_service.nlp_pipeline is not None,
-                "route_graph": ai_itinerary_service.route_graph is not None
-            }
+                "sentence_transformer": ai_itinerary_service.models.is_loaded('sentence_transformer'),
+                "nlp_pipeline": ai_itinerary_service.models.is_loaded('nlp_pipeline'),
+                "route_matrices": default_region is not None and default_region.route_matrices is not None
+            },
+            "models": ai_itinerary_service.models.status(),
+            "inference_backend": INFERENCE_BACKEND,
+            "inference_queue": ai_itinerary_service.inference.stats(),
+            "generation_executor": generation_executor.stats(),
+            "itinerary_cache": itinerary_cache.stats(),
+            "profiling": profiler.status(),
+            "worker": {"pid": os.getpid(), "memory": memory_usage()},
+            "regions": ai_itinerary_service.regions.stats()
         }
     except Exception as e:
         logger.error(f"Error getting stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/ai/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/ai/admin/profile")
+async def get_profile(request: Request, limit: int = 50, sort: str = "cumulative"):
+    """Profiler status and the aggregated per-function time table"""
+    _require_admin(request)
+    if sort not in ("cumulative", "self"):
+        raise HTTPException(status_code=400, detail="sort must be 'cumulative' or 'self'")
+    return {
+        "profiling": profiler.status(),
+        "functions": profiler.function_table(limit=max(1, min(limit, 1000)), sort=sort)
+    }
+
+@app.put("/api/ai/admin/profile")
+async def configure_profile(request: Request, config: ProfileConfig):
+    """Change the sampling rate or profiler mode without a restart"""
+    _require_admin(request)
+    if config.mode is not None and config.mode.lower() not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(PROFILE_MODES)}")
+    profiler.configure(rate=config.rate, mode=config.mode)
+    return profiler.status()
+
+@app.delete("/api/ai/admin/profile")
+async def reset_profile(request: Request):
+    """Discard the aggregated profile"""
+    _require_admin(request)
+    profiler.reset()
+    return profiler.status()
+
+@app.get("/api/ai/admin/profile/pstats")
+async def download_profile_pstats(request: Request):
+    """Aggregated cProfile data as a .pstats file (load with pstats.Stats or snakeviz)"""
+    _require_admin(request)
+    data = profiler.pstats_bytes()
+    if data is None:
+        raise HTTPException(status_code=404, detail="No cProfile data collected yet")
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="itinerary.pstats"'}
+    )
+
+@app.get("/api/ai/admin/profile/collapsed", response_class=PlainTextResponse)
+async def download_profile_collapsed(request: Request):
+    """Aggregated profile as collapsed stacks for flamegraph.pl, speedscope or inferno"""
+    _require_admin(request)
+    return PlainTextResponse(
+        profiler.collapsed_stacks(),
+        headers={"Content-Disposition": 'attachment; filename="itinerary.collapsed"'}
+    )
+
+# Point-in-time values and running totals exported alongside the histograms
+metrics.gauge_callback("ai_executor_in_flight", "Generation tasks running or queued",
+                       lambda: generation_executor.stats()['in_flight'])
+metrics.counter_callback("ai_executor_rejected", "Generation tasks rejected because the queue was full",
+                         lambda: generation_executor.stats()['rejected'])
+metrics.counter_callback("ai_executor_timeouts", "Generation tasks that exceeded their timeout",
+                         lambda: generation_executor.stats()['timeouts'])
+metrics.counter_callback("ai_itinerary_cache_hits", "Itinerary cache hits",
+                         lambda: itinerary_cache.stats()['hits'])
+metrics.counter_callback("ai_itinerary_cache_misses", "Itinerary cache misses",
+                         lambda: itinerary_cache.stats()['misses'])
+metrics.gauge_callback("ai_models_ready", "1 once all models are loaded and warmed up",
+                       lambda: 1.0 if ai_itinerary_service.models.is_ready else 0.0)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler"""
@@ -11,30 +11,60 @@ Technologies used:
 - scikit-learn: User preference clustering and recommendation algorithms
 - Hugging Face transformers: NLP for preference analysis and content generation
 - sentence-transformers: Semantic similarity for activity matching
-- networkx: Graph algorithms for optimal routing
-- geopy: Geographic calculations and distance optimization
+- numpy: Vectorized distance matrices and TSP route optimization
 """
 
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import KMeans
-from transformers import pipeline, AutoTokenizer, AutoModel
-from sentence_transformers import SentenceTransformer
-import networkx as nx
-from geopy.distance import geodesic
 import json
 import datetime
 import logging
+import os
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from services.catalog_index import ActivityGroups, CatalogIndex, ScoredActivity
+from services.embedding_store import EmbeddingStore, normalize_rows
+from services.geo_matrix import RouteMatrices, build_route_matrices
+from services.inference_batcher import InferenceScheduler
+from services.metrics import STAGE_HELP, STAGE_HISTOGRAM, metrics, stage_section, stage_timer
+from services.model_registry import ModelRegistry
+from services.profiling import profiler
+from services.region_catalog import RegionCatalog, normalize_region
+from services.route_optimizer import solve_route
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SENTENCE_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMOTION_MODEL_NAME = 'cardiffnlp/twitter-roberta-base-emotion'
+
+# 'torch' runs the PyTorch models, 'onnx' their int8-quantized ONNX exports (services/onnx_backend.py)
+INFERENCE_BACKEND = os.getenv('AI_INFERENCE_BACKEND', 'torch').lower()
+if INFERENCE_BACKEND not in ('torch', 'onnx'):
+    raise ValueError(f"Unknown AI_INFERENCE_BACKEND: {INFERENCE_BACKEND}. Must be 'torch' or 'onnx'")
+# Embedding cache key; ONNX int8 vectors differ slightly, so they get their own artifacts
+EMBEDDING_MODEL_KEY = f"{SENTENCE_MODEL_NAME}+onnx-int8" if INFERENCE_BACKEND == 'onnx' else SENTENCE_MODEL_NAME
+
+# Recent preference texts whose embedding/emotion analysis is kept for re-planning and repeats
+ANALYSIS_CACHE_SIZE = int(os.getenv('AI_ANALYSIS_CACHE_SIZE', '1024'))
+
+# Edits accepted by replan_itinerary
+REPLAN_EDIT_TYPES = ('swap_destination', 'set_stop_duration', 'exclude_activity', 'swap_days')
+
+# Text pushed through every model (and a full itinerary request) during warmup
+WARMUP_TEXT = 'nature culture food relaxation'
+
+DEFAULT_REGION = 'kerala'
+
+# Road travel assumptions used to derive travel-time and cost matrices
+AVERAGE_ROAD_SPEED_KMH = 40.0
+TRAVEL_COST_PER_KM = 0.5
+
 class TravelStyle(Enum):
     LUXURY = "luxury"
     MID_RANGE = "mid-range"
@@ -83,6 +113,16 @@ class Activity:
     tags: List[str]
     time_slot: str  # morning, afternoon, evening, full_day
 
+@dataclass
+class RegionData:
+    """Catalog, indexes, route matrices and embeddings for one loaded region"""
+    name: str
+    destinations_df: pd.DataFrame
+    activities_df: pd.DataFrame
+    catalog: CatalogIndex
+    route_matrices: RouteMatrices
+    activity_embeddings: np.ndarray
+
 class IntelligentItineraryAI:
     """
     Advanced AI service for generating intelligent, personalized travel itineraries
@@ -93,24 +133,90 @@ class IntelligentItineraryAI:
         """Initialize the AI service with ML models and data"""
         logger.info("Initializing Intelligent Itinerary AI Service...")
         
-        # Initialize ML models
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.nlp_pipeline = pipeline("text-classification", 
-                                   model="cardiffnlp/twitter-roberta-base-emotion")
+        # ML models load lazily on first use or during warmup, keeping imports cheap
+        self.models = ModelRegistry()
+        self.models.register('sentence_transformer', _load_sentence_model,
+                             lambda model: model.encode([WARMUP_TEXT] * 4))
+        self.models.register('nlp_pipeline', _load_emotion_pipeline,
+                             lambda model: model([WARMUP_TEXT] * 4))
+        self.models.add_warmup_hook(self._warmup_default_region)
+        
+        # Batch concurrent per-request encode/classify calls into single forward passes
+        self.inference = InferenceScheduler(
+            lambda texts: self.sentence_model.encode(texts),
+            lambda texts: self.nlp_pipeline(texts)
+        )
+        
+        # Per-text NLP results, reused when the same preferences are analyzed again
+        self._analysis_signals: "OrderedDict[str, Tuple[np.ndarray, List[Dict]]]" = OrderedDict()
+        self._analysis_signals_lock = threading.Lock()
         
         # Initialize data structures
-        self.destinations_df = None
-        self.activities_df = None
         self.user_preferences_df = None
-        self.route_graph = None
+        self.embedding_store = EmbeddingStore()
         
-        # Load destination and activity data
-        self._load_kerala_data()
-        self._build_route_graph()
+        # Regions load lazily on first use; the default region stays resident once loaded
+        self.default_region = DEFAULT_REGION
+        self.regions = RegionCatalog(prepare=self._prepare_region)
+        register_builtin_regions(self.regions)
+        self.regions.pin(self.default_region)
         
         logger.info("AI Service initialized successfully!")
     
-    def _load_kerala_data(self):
+    @property
+    def sentence_model(self):
+        return self.models.get('sentence_transformer')
+    
+    @property
+    def nlp_pipeline(self):
+        return self.models.get('nlp_pipeline')
+    
+    def warmup(self):
+        """Load all models, run a dummy batch through each and prepare the default region"""
+        self.models.warmup()
+    
+    def _warmup_default_region(self):
+        """Prepare the default region and run one end-to-end request through the batched models"""
+        self.regions.get(self.default_region)
+        self.analyze_user_preferences(UserPreferences(
+            destination=self.default_region,
+            duration=3,
+            budget=1000.0,
+            interests=WARMUP_TEXT.split(),
+            travel_style=TravelStyle.MID_RANGE,
+            group_size=1,
+            start_date=datetime.datetime.now().strftime('%Y-%m-%d')
+        ))
+    
+    @property
+    def destinations_df(self) -> pd.DataFrame:
+        return self.regions.get(self.default_region).destinations_df
+    
+    @property
+    def activities_df(self) -> pd.DataFrame:
+        return self.regions.get(self.default_region).activities_df
+    
+    @property
+    def catalog(self) -> CatalogIndex:
+        return self.regions.get(self.default_region).catalog
+    
+    @property
+    def route_matrices(self) -> RouteMatrices:
+        return self.regions.get(self.default_region).route_matrices
+    
+    @property
+    def activity_embeddings(self) -> np.ndarray:
+        return self.regions.get(self.default_region).activity_embeddings
+    
+    def _region_for(self, preferences: UserPreferences) -> RegionData:
+        """Region catalog serving the requested destination, falling back to the default region"""
+        region = normalize_region(preferences.destination)
+        if not self.regions.has_region(region):
+            region = self.default_region
+        return self.regions.get(region)
+    
+    @staticmethod
+    def _kerala_catalog_frames() -> Tuple[pd.DataFrame, pd.DataFrame]:
         """Load and structure Kerala travel data using pandas"""
         logger.info("Loading Kerala destination and activity data...")
         
@@ -203,7 +309,7 @@ class IntelligentItineraryAI:
         ]
         
         # Create destinations DataFrame
-        self.destinations_df = pd.DataFrame(kerala_destinations)
+        destinations_df = pd.DataFrame(kerala_destinations)
         
         # Detailed activities for each destination
         activities_data = [
@@ -271,47 +377,44 @@ class IntelligentItineraryAI:
         ]
         
         # Create activities DataFrame
-        self.activities_df = pd.DataFrame(activities_data)
-        
-        logger.info(f"Loaded {len(self.destinations_df)} destinations and {len(self.activities_df)} activities")
-    
-    def _build_route_graph(self):
-        """Build a graph network for optimal routing using NetworkX"""
-        logger.info("Building route optimization graph...")
-        
-        self.route_graph = nx.Graph()
-        
-        # Add destinations as nodes
-        for _, destination in self.destinations_df.iterrows():
-            self.route_graph.add_node(
-                destination['name'],
-                pos=(destination['latitude'], destination['longitude']),
-                category=destination['category'],
-                avg_cost=destination['average_cost'],
-                duration=destination['recommended_duration']
-            )
-        
-        # Add edges with distances and travel times
-        destinations = self.destinations_df.to_dict('records')
-        for i, dest1 in enumerate(destinations):
-            for j, dest2 in enumerate(destinations[i+1:], i+1):
-                # Calculate geodesic distance
-                coord1 = (dest1['latitude'], dest1['longitude'])
-                coord2 = (dest2['latitude'], dest2['longitude'])
-                distance = geodesic(coord1, coord2).kilometers
-                
-                # Estimate travel time (assuming average speed of 40 km/h on Kerala roads)
-                travel_time = distance / 40.0
-                
-                self.route_graph.add_edge(
-                    dest1['name'], 
-                    dest2['name'],
-                    distance=distance,
-                    travel_time=travel_time,
-                    cost=distance * 0.5  # Estimated cost per km
-                )
+        activities_df = pd.DataFrame(activities_data)
+        
+        logger.info(f"Loaded {len(destinations_df)} destinations and {len(activities_df)} activities")
+        return destinations_df, activities_df
+    
+    def _prepare_region(self, region: str, destinations_df: pd.DataFrame, activities_df: pd.DataFrame) -> RegionData:
+        """Build the index, route matrices and activity embeddings for a freshly loaded region"""
+        logger.info(f"Preparing region '{region}': building route optimization matrices...")
         
-        logger.info(f"Built route graph with {self.route_graph.number_of_nodes()} nodes and {self.route_graph.number_of_edges()} edges")
+        # Estimated travel time assumes an average road speed of 40 km/h
+        route_matrices = build_route_matrices(
+            destinations_df['name'].tolist(),
+            destinations_df['latitude'].to_numpy(),
+            destinations_df['longitude'].to_numpy(),
+            speed_kmh=AVERAGE_ROAD_SPEED_KMH,
+            cost_per_km=TRAVEL_COST_PER_KM,
+            cache_dir=os.getenv('AI_ROUTE_MATRIX_CACHE_DIR')
+        )
+        
+        # Activity embeddings come from the persistent store (prebuilt by `python -m services.embedding_store build`),
+        # encoded only on a miss
+        (namespace, texts), = embedding_jobs(region, destinations_df, activities_df)
+        activity_embeddings = self.embedding_store.load_or_build(
+            namespace,
+            texts,
+            EMBEDDING_MODEL_KEY,
+            lambda texts: self.sentence_model.encode(texts)
+        )
+        
+        logger.info(f"Region '{region}' ready with {len(route_matrices)} destinations")
+        return RegionData(
+            name=region,
+            destinations_df=destinations_df,
+            activities_df=activities_df,
+            catalog=CatalogIndex(destinations_df, activities_df),
+            route_matrices=route_matrices,
+            activity_embeddings=activity_embeddings
+        )
     
     def analyze_user_preferences(self, preferences: UserPreferences) -> Dict:
         """
@@ -319,30 +422,95 @@ class IntelligentItineraryAI:
         """
         logger.info("Analyzing user preferences with NLP...")
         
+        region = self._region_for(preferences)
+        
         # Combine user interests and travel style into text
-        preference_text = f"{' '.join(preferences.interests)} {preferences.travel_style.value}"
+        preference_text = self._preference_text(preferences)
         
-        # Generate embeddings for user preferences
-        preference_embedding = self.sentence_model.encode([preference_text])
+        with self._analysis_signals_lock:
+            signals = self._analysis_signals.get(preference_text)
+            if signals is not None:
+                self._analysis_signals.move_to_end(preference_text)
         
-        # Analyze sentiment/emotion in preferences
-        emotion_analysis = self.nlp_pipeline(preference_text)
+        if signals is not None:
+            preference_embedding, emotion_analysis = signals
+        else:
+            # Generate embeddings for user preferences (activity embeddings are precomputed)
+            preference_embedding = self.inference.encode(preference_text)
+            
+            # Analyze sentiment/emotion in preferences
+            emotion_analysis = self.inference.classify(preference_text)
+            
+            with self._analysis_signals_lock:
+                self._analysis_signals[preference_text] = (preference_embedding, emotion_analysis)
+                while len(self._analysis_signals) > ANALYSIS_CACHE_SIZE:
+                    self._analysis_signals.popitem(last=False)
+        
+        # Cosine similarity against the pre-normalized activity matrix is a single dot product;
+        # scores stay float64 so they serialize like the previous sklearn output
+        similarities = (region.activity_embeddings @ normalize_rows(preference_embedding)[0]).astype(np.float64)
         
-        # Create activity embeddings
-        activity_descriptions = self.activities_df['description'].tolist()
-        activity_embeddings = self.sentence_model.encode(activity_descriptions)
+        return self._build_analysis(preferences, region, preference_embedding, emotion_analysis, similarities)
+    
+    def analyze_preferences_batch(self, preferences_list: List[UserPreferences]) -> List[Dict]:
+        """
+        Preference signals for many profiles at once: one encoder pass, one classifier pass
+        and one similarity matrix multiply per region. Returns plain data per profile
+        (region name, embedding, emotions, activity scores) for ``analysis_from_signals``.
+        """
+        logger.info(f"Analyzing {len(preferences_list)} preference profiles in one batch...")
+        if not preferences_list:
+            return []
         
-        # Calculate similarity between user preferences and activities
-        similarities = cosine_similarity(preference_embedding, activity_embeddings)[0]
+        texts = [self._preference_text(preferences) for preferences in preferences_list]
+        embeddings = normalize_rows(np.asarray(self.sentence_model.encode(texts)))
+        emotions = [[result] for result in self.nlp_pipeline(texts)]
         
-        # Add similarity scores to activities DataFrame
-        activities_with_scores = self.activities_df.copy()
-        activities_with_scores['preference_score'] = similarities
+        regions = [self._region_for(preferences) for preferences in preferences_list]
+        scores = [None] * len(preferences_list)
+        by_region: Dict[str, List[int]] = {}
+        for position, region in enumerate(regions):
+            by_region.setdefault(region.name, []).append(position)
+        for positions in by_region.values():
+            region = regions[positions[0]]
+            # (profiles, activities) similarity block for every profile of this region
+            block = (embeddings[positions] @ region.activity_embeddings.T).astype(np.float64)
+            for row, position in enumerate(positions):
+                scores[position] = block[row]
         
+        return [
+            {
+                'region': regions[position].name,
+                'preference_embedding': embeddings[position:position + 1],
+                'emotion_analysis': emotions[position],
+                'activity_scores': scores[position]
+            }
+            for position in range(len(preferences_list))
+        ]
+    
+    def analysis_from_signals(self, preferences: UserPreferences, signals: Dict) -> Dict:
+        """Full analysis results from one entry of ``analyze_preferences_batch``"""
+        return self._build_analysis(
+            preferences,
+            self.regions.get(signals['region']),
+            signals['preference_embedding'],
+            signals['emotion_analysis'],
+            signals['activity_scores']
+        )
+    
+    @staticmethod
+    def _preference_text(preferences: UserPreferences) -> str:
+        return f"{' '.join(preferences.interests)} {preferences.travel_style.value}"
+    
+    def _build_analysis(self, preferences: UserPreferences, region: RegionData, preference_embedding: np.ndarray,
+                        emotion_analysis: List[Dict], similarities: np.ndarray) -> Dict:
         return {
+            'region': region,
             'preference_embedding': preference_embedding,
             'emotion_analysis': emotion_analysis,
-            'matched_activities': activities_with_scores.sort_values('preference_score', ascending=False),
+            'preference_score': float(similarities.mean()) if len(similarities) else 0.0,
+            'activity_scores': similarities,
+            'activity_groups': ActivityGroups(region.catalog, similarities),
             'preference_categories': self._extract_preference_categories(preferences)
         }
     
@@ -367,98 +535,53 @@ class IntelligentItineraryAI:
         """
         Generate optimal route using graph algorithms and user preferences
         """
-        logger.info("Generating optimal route using graph algorithms...")
+        logger.info("Generating optimal route using route matrices...")
         
         if len(selected_destinations) <= 2:
             return selected_destinations
         
-        # Create subgraph with selected destinations
-        subgraph = self.route_graph.subgraph(selected_destinations)
+        region = self._region_for(preferences)
         
         # Find optimal route using different strategies based on preferences
         if preferences.travel_style == TravelStyle.BUDGET:
             # Minimize cost - use shortest path by cost
-            route = self._find_minimum_cost_route(subgraph, selected_destinations)
+            route = self._find_minimum_cost_route(region, selected_destinations)
         elif preferences.duration <= 5:
             # Short trip - minimize travel time
-            route = self._find_minimum_time_route(subgraph, selected_destinations)
+            route = self._find_minimum_time_route(region, selected_destinations)
         else:
             # Balanced approach - consider both distance and destination appeal
-            route = self._find_balanced_route(subgraph, selected_destinations, preferences)
+            route = self._find_balanced_route(region, selected_destinations, preferences)
         
         return route
     
-    def _find_minimum_cost_route(self, graph: nx.Graph, destinations: List[str]) -> List[str]:
+    def _find_minimum_cost_route(self, region: RegionData, destinations: List[str]) -> List[str]:
         """Find route that minimizes travel costs"""
-        # Use nearest neighbor heuristic with cost as weight
-        route = []
-        remaining = set(destinations)
-        current = destinations[0]  # Start from first destination
-        route.append(current)
-        remaining.remove(current)
-        
-        while remaining:
-            next_dest = min(remaining, 
-                          key=lambda dest: graph[current][dest]['cost'] if graph.has_edge(current, dest) else float('inf'))
-            route.append(next_dest)
-            remaining.remove(next_dest)
-            current = next_dest
-        
-        return route
+        # Exact Held-Karp / local-search TSP on the cost matrix, starting from the first destination
+        solution = solve_route(region.route_matrices.submatrix(destinations, 'cost'), start=0)
+        return [destinations[i] for i in solution.order]
     
-    def _find_minimum_time_route(self, graph: nx.Graph, destinations: List[str]) -> List[str]:
+    def _find_minimum_time_route(self, region: RegionData, destinations: List[str]) -> List[str]:
         """Find route that minimizes travel time"""
-        # Use nearest neighbor heuristic with travel time as weight
-        route = []
-        remaining = set(destinations)
-        current = destinations[0]
-        route.append(current)
-        remaining.remove(current)
-        
-        while remaining:
-            next_dest = min(remaining,
-                          key=lambda dest: graph[current][dest]['travel_time'] if graph.has_edge(current, dest) else float('inf'))
-            route.append(next_dest)
-            remaining.remove(next_dest)
-            current = next_dest
-        
-        return route
+        solution = solve_route(region.route_matrices.submatrix(destinations, 'travel_time'), start=0)
+        return [destinations[i] for i in solution.order]
     
-    def _find_balanced_route(self, graph: nx.Graph, destinations: List[str], preferences: UserPreferences) -> List[str]:
+    def _find_balanced_route(self, region: RegionData, destinations: List[str], preferences: UserPreferences) -> List[str]:
         """Find balanced route considering multiple factors"""
         # Score each destination based on user preferences
         dest_scores = {}
         for dest in destinations:
-            dest_info = self.destinations_df[self.destinations_df['name'] == dest].iloc[0]
+            dest_info = region.catalog.destination(dest)
             score = self._calculate_destination_score(dest_info, preferences)
             dest_scores[dest] = score
         
-        # Use modified nearest neighbor considering both distance and destination appeal
-        route = []
-        remaining = set(destinations)
-        
-        # Start with highest-scored destination
-        current = max(destinations, key=lambda d: dest_scores[d])
-        route.append(current)
-        remaining.remove(current)
-        
-        while remaining:
-            # Consider both travel cost and destination appeal
-            def combined_score(dest):
-                if not graph.has_edge(current, dest):
-                    return float('-inf')
-                travel_cost = graph[current][dest]['cost']
-                dest_appeal = dest_scores[dest] * 10  # Scale destination appeal
-                return dest_appeal - travel_cost  # Higher appeal, lower cost = better score
-            
-            next_dest = max(remaining, key=combined_score)
-            route.append(next_dest)
-            remaining.remove(next_dest)
-            current = next_dest
-        
-        return route
+        # Start with the highest-scored destination, then minimize travel cost through the rest
+        start = max(range(len(destinations)), key=lambda i: dest_scores[destinations[i]])
+        solution = solve_route(region.route_matrices.submatrix(destinations, 'cost'), start=start)
+        return [destinations[i] for i in solution.order]
     
-    def _calculate_destination_score(self, destination: pd.Series, preferences: UserPreferences) -> float:
+    def _calculate_destination_score(self, destination: Dict, preferences: UserPreferences,
+                                     preference_categories: Optional[Dict] = None) -> float:
         """Calculate destination appeal score based on user preferences"""
         score = 0.0
         
@@ -470,7 +593,8 @@ class IntelligentItineraryAI:
             'relaxation_focused': {'backwaters': 0.9, 'beach': 0.8, 'wellness': 0.9}
         }
         
-        preference_categories = self._extract_preference_categories(preferences)
+        if preference_categories is None:
+            preference_categories = self._extract_preference_categories(preferences)
         
         for category, weight in preference_categories.items():
             if weight and category in category_weights:
@@ -486,62 +610,73 @@ class IntelligentItineraryAI:
         return score
     
     def select_activities_for_destination(self, destination: str, preferences: UserPreferences, 
-                                        day_number: int, analysis_results: Dict) -> List[Dict]:
+                                        day_number: int, analysis_results: Dict,
+                                        excluded_activities: Optional[set] = None) -> List[Dict]:
         """
         Select optimal activities for a destination using ML recommendations
         """
-        # Get activities for this destination
-        dest_activities = analysis_results['matched_activities'][
-            analysis_results['matched_activities']['location'] == destination
-        ].copy()
-        
-        if dest_activities.empty:
-            return []
-        
         # Consider time of day and activity flow
         activities_per_day = 2 if day_number == 1 else 3  # Lighter first day
         
-        # Balance activity types within a day
-        selected_activities = []
-        used_time_slots = set()
+        # Ranked candidates are computed once per destination per request
+        groups = analysis_results['activity_groups']
+        
+        def candidates(complete: bool = False) -> List[ScoredActivity]:
+            ranked = groups.ranked(destination, complete)
+            if excluded_activities:
+                ranked = [activity for activity in ranked if activity.name not in excluded_activities]
+            return ranked
         
-        # Sort by preference score
-        dest_activities_sorted = dest_activities.sort_values('preference_score', ascending=False)
+        picks = self._pick_by_time_slot(candidates(), activities_per_day)
+        if len(picks) < activities_per_day and not groups.is_complete(destination):
+            # Time-slot conflicts or exclusions exhausted the top-k; fall back to the full ranking
+            picks = self._pick_by_time_slot(candidates(complete=True), activities_per_day)
+        
+        if not picks:
+            return []
         
-        for _, activity in dest_activities_sorted.iterrows():
-            if len(selected_activities) >= activities_per_day:
+        coordinates = self._get_destination_coordinates(destination, analysis_results['region'])
+        destination_key = destination.lower()
+        return [
+            {
+                'id': f"{destination_key}_{activity.name.lower().replace(' ', '_')}_{day_number}",
+                'name': activity.name,
+                'description': activity.description,
+                'category': activity.category,
+                'duration': activity.duration,
+                'cost': activity.cost,
+                'rating': activity.rating,
+                'time_slot': activity.time_slot,
+                'preference_score': activity.score,
+                'location': {
+                    'name': destination,
+                    'coordinates': dict(coordinates)
+                }
+            }
+            for activity in picks
+        ]
+    
+    @staticmethod
+    def _pick_by_time_slot(candidates: List[ScoredActivity], limit: int) -> List[ScoredActivity]:
+        """Take the best candidates in order, skipping any whose time slot is already used"""
+        picks = []
+        used_time_slots = set()
+        for activity in candidates:
+            if len(picks) >= limit:
                 break
-            
             # Avoid time slot conflicts
-            if activity['time_slot'] not in used_time_slots or activity['time_slot'] == 'full_day':
-                selected_activities.append({
-                    'id': f"{destination.lower()}_{activity['name'].lower().replace(' ', '_')}_{day_number}",
-                    'name': activity['name'],
-                    'description': activity['description'],
-                    'category': activity['category'],
-                    'duration': activity['duration'],
-                    'cost': activity['cost'],
-                    'rating': activity['rating'],
-                    'time_slot': activity['time_slot'],
-                    'preference_score': activity['preference_score'],
-                    'location': {
-                        'name': destination,
-                        'coordinates': self._get_destination_coordinates(destination)
-                    }
-                })
-                
-                if activity['time_slot'] != 'full_day':
-                    used_time_slots.add(activity['time_slot'])
-        
-        return selected_activities
+            if activity.time_slot == 'full_day':
+                picks.append(activity)
+            elif activity.time_slot not in used_time_slots:
+                picks.append(activity)
+                used_time_slots.add(activity.time_slot)
+        return picks
     
-    def _get_destination_coordinates(self, destination: str) -> Dict:
+    def _get_destination_coordinates(self, destination: str, region: Optional[RegionData] = None) -> Dict:
         """Get coordinates for a destination"""
-        dest_info = self.destinations_df[self.destinations_df['name'] == destination]
-        if not dest_info.empty:
-            row = dest_info.iloc[0]
-            return {'lat': row['latitude'], 'lng': row['longitude']}
-        return {'lat': 0, 'lng': 0}
+        catalog = region.catalog if region is not None else self.catalog
+        coordinates = catalog.coordinates(destination)
+        return coordinates if coordinates is not None else {'lat': 0, 'lng': 0}
     
     def calculate_costs_and_logistics(self, route: List[str], activities: Dict, 
                                     preferences: UserPreferences) -> Dict:
@@ -558,6 +693,7 @@ class IntelligentItineraryAI:
         }
         
         base_costs = daily_base_costs.get(preferences.travel_style, daily_base_costs[TravelStyle.MID_RANGE])
+        route_matrices = self._region_for(preferences).route_matrices
         
         for i, destination in enumerate(route):
             # Daily accommodation and meals
@@ -571,13 +707,14 @@ class IntelligentItineraryAI:
             # Add transportation cost (except for first destination)
             if i > 0:
                 prev_dest = route[i-1]
-                if self.route_graph.has_edge(prev_dest, destination):
-                    transport_cost = self.route_graph[prev_dest][destination]['cost']
+                leg = route_matrices.leg(prev_dest, destination)
+                if leg is not None:
+                    transport_cost = leg['cost']
                     transport_info = {
                         'from': prev_dest,
                         'to': destination,
-                        'distance': self.route_graph[prev_dest][destination]['distance'],
-                        'time': self.route_graph[prev_dest][destination]['travel_time'],
+                        'distance': leg['distance'],
+                        'time': leg['travel_time'],
                         'cost': transport_cost
                     }
                     transportation_plan.append(transport_info)
@@ -598,114 +735,299 @@ class IntelligentItineraryAI:
             }
         }
     
-    def generate_intelligent_itinerary(self, preferences: UserPreferences) -> Dict:
+    def generate_intelligent_itinerary(self, preferences: UserPreferences,
+                                       analysis_results: Optional[Dict] = None) -> Dict:
         """
-        Main method to generate intelligent, personalized itinerary using ML and AI
+        Main method to generate intelligent, personalized itinerary using ML and AI.
+        ``analysis_results`` may be passed in when preferences were already analyzed (e.g. in a batch).
         """
         logger.info(f"Generating intelligent itinerary for {preferences.destination}")
         
         try:
-            # Step 1: Analyze user preferences using NLP
-            analysis_results = self.analyze_user_preferences(preferences)
+            itinerary = None
+            with profiler.profile('generate'):
+                for event, payload in self.iter_intelligent_itinerary(preferences, analysis_results):
+                    if event == 'itinerary':
+                        itinerary = payload
             
-            # Step 2: Select destinations based on preferences and duration
-            selected_destinations = self._select_destinations_for_trip(preferences, analysis_results)
+            logger.info(f"Successfully generated AI itinerary with {len(itinerary['days'])} days and personalization score: {itinerary['personalization_score']:.3f}")
+            return itinerary
             
-            # Step 3: Generate optimal route using graph algorithms
+        except Exception as e:
+            logger.error(f"Error generating intelligent itinerary: {str(e)}")
+            raise Exception(f"Failed to generate AI itinerary: {str(e)}")
+    
+    def iter_intelligent_itinerary(self, preferences: UserPreferences,
+                                   analysis_results: Optional[Dict] = None):
+        """
+        Generate an itinerary incrementally as ``(event, payload)`` pairs: ``'route'`` once the
+        route is fixed, one ``'day'`` per finished day, then ``'itinerary'`` with the complete result.
+        """
+        # Step 1: Analyze user preferences using NLP
+        if analysis_results is None:
+            with stage_timer('analysis'):
+                analysis_results = self.analyze_user_preferences(preferences)
+        
+        # Step 2: Select destinations based on preferences and duration
+        with stage_timer('destination_selection'):
+            selected_destinations = self._select_destinations_for_trip(preferences, analysis_results)
+        
+        # Step 3: Generate optimal route using graph algorithms
+        with stage_timer('routing'):
             optimal_route = self.generate_optimal_route(preferences, selected_destinations)
             
-            # Step 4: Generate day-by-day itinerary
-            days = []
-            activities_by_destination = {}
-            current_date = datetime.datetime.strptime(preferences.start_date, "%Y-%m-%d")
-            
             # Distribute days across destinations
-            days_per_destination = self._distribute_days(optimal_route, preferences.duration)
+            days_per_destination = self._distribute_days(optimal_route, preferences.duration, analysis_results['region'])
+        
+        # Step 4: Generate day-by-day itinerary
+        days = []
+        activities_by_destination = {}
+        current_date = datetime.datetime.strptime(preferences.start_date, "%Y-%m-%d")
+        # Days are yielded as they finish, so the stage total only counts time spent building them
+        activity_selection_seconds = 0.0
+        
+        yield 'route', {
+            'destination': preferences.destination,
+            'duration': preferences.duration,
+            'optimal_sequence': optimal_route,
+            'days_per_destination': days_per_destination
+        }
+        
+        day_counter = 1
+        for dest_index, destination in enumerate(optimal_route):
+            days_at_dest = days_per_destination[dest_index]
             
-            day_counter = 1
-            for dest_index, destination in enumerate(optimal_route):
-                days_at_dest = days_per_destination[dest_index]
-                
-                for day_at_dest in range(days_at_dest):
-                    # Select activities using ML recommendations
-                    day_activities = self.select_activities_for_destination(
-                        destination, preferences, day_at_dest + 1, analysis_results
+            for day_at_dest in range(days_at_dest):
+                # Build day information with ML-selected activities
+                with stage_section('activity_selection') as section:
+                    day_info = self._build_day(
+                        destination, day_at_dest + 1, day_counter, current_date,
+                        preferences, analysis_results
                     )
-                    
-                    if destination not in activities_by_destination:
-                        activities_by_destination[destination] = []
-                    activities_by_destination[destination].extend(day_activities)
-                    
-                    # Build day information
-                    day_info = {
-                        'day': day_counter,
-                        'date': current_date.strftime("%Y-%m-%d"),
-                        'location': destination,
-                        'theme': self._generate_day_theme(destination, day_at_dest + 1, preferences),
-                        'activities': day_activities,
-                        'transportation': self._get_transportation_info(optimal_route, dest_index) if dest_index > 0 and day_at_dest == 0 else None,
-                        'estimated_cost': sum(activity['cost'] for activity in day_activities) + 
-                                        (200 if preferences.travel_style == TravelStyle.LUXURY else 
-                                         80 if preferences.travel_style == TravelStyle.MID_RANGE else 25),
-                        'highlights': [activity['name'] for activity in day_activities[:2]],
-                        'tips': self._generate_local_tips(destination, preferences),
-                        'weather_info': self._get_weather_guidance(destination, current_date),
-                        'local_insights': self._generate_ai_insights(destination, preferences)
-                    }
-                    
-                    days.append(day_info)
-                    day_counter += 1
-                    current_date += datetime.timedelta(days=1)
-                    
-                    if day_counter > preferences.duration:
-                        break
+                    day_info['transportation'] = self._get_transportation_info(optimal_route, dest_index, analysis_results['region']) if dest_index > 0 and day_at_dest == 0 else None
+                activity_selection_seconds += section.seconds
+                
+                if destination not in activities_by_destination:
+                    activities_by_destination[destination] = []
+                activities_by_destination[destination].extend(day_info['activities'])
+                
+                days.append(day_info)
+                yield 'day', day_info
+                day_counter += 1
+                current_date += datetime.timedelta(days=1)
                 
                 if day_counter > preferences.duration:
                     break
             
-            # Step 5: Calculate comprehensive costs and logistics
+            if day_counter > preferences.duration:
+                break
+        
+        metrics.histogram(STAGE_HISTOGRAM, STAGE_HELP, stage='activity_selection').observe(activity_selection_seconds)
+        
+        # Step 5: Calculate comprehensive costs and logistics
+        with stage_timer('costing'):
             cost_logistics = self.calculate_costs_and_logistics(optimal_route, activities_by_destination, preferences)
-            
-            # Step 6: Generate AI-powered insights and recommendations
+        
+        # Step 6: Generate AI-powered insights and recommendations
+        with stage_timer('insights'):
             ai_insights = self._generate_comprehensive_insights(preferences, optimal_route, analysis_results)
-            
-            # Build final itinerary
-            itinerary = {
-                'id': f"ai_itinerary_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                'destination': preferences.destination,
-                'duration': preferences.duration,
-                'budget': preferences.budget,
-                'title': f"AI-Curated {preferences.duration}-Day {preferences.destination} Journey",
-                'description': f"Intelligently crafted {preferences.duration}-day personalized itinerary for {preferences.destination} "
-                             f"optimized for {preferences.travel_style.value} travel style with {', '.join(preferences.interests)} interests.",
-                'days': days,
-                'total_cost': cost_logistics['total_cost'],
-                'cost_breakdown': cost_logistics['cost_breakdown'],
-                'transportation_plan': cost_logistics['transportation_plan'],
-                'route_optimization': {
-                    'strategy': 'AI-optimized routing using graph algorithms and preference analysis',
-                    'optimal_sequence': optimal_route,
-                    'reasoning': ai_insights['route_reasoning']
-                },
-                'ai_insights': ai_insights,
-                'personalization_score': analysis_results['matched_activities']['preference_score'].mean(),
-                'sustainability_tips': self._generate_sustainability_tips(),
-                'local_culture_guide': self._generate_culture_guide(optimal_route),
-                'emergency_info': self._generate_emergency_info(),
-                'created_at': datetime.datetime.now().isoformat(),
-                'generated_by': 'Intelligent AI Itinerary System v1.0',
-                'ml_models_used': ['sentence-transformers', 'scikit-learn', 'networkx', 'huggingface-transformers']
-            }
-            
-            logger.info(f"Successfully generated AI itinerary with {len(days)} days and personalization score: {itinerary['personalization_score']:.3f}")
-            return itinerary
-            
-        except Exception as e:
-            logger.error(f"Error generating intelligent itinerary: {str(e)}")
-            raise Exception(f"Failed to generate AI itinerary: {str(e)}")
+        
+        # Build final itinerary
+        itinerary = {
+            'id': f"ai_itinerary_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            'destination': preferences.destination,
+            'duration': preferences.duration,
+            'budget': preferences.budget,
+            'title': f"AI-Curated {preferences.duration}-Day {preferences.destination} Journey",
+            'description': f"Intelligently crafted {preferences.duration}-day personalized itinerary for {preferences.destination} "
+                         f"optimized for {preferences.travel_style.value} travel style with {', '.join(preferences.interests)} interests.",
+            'days': days,
+            'total_cost': cost_logistics['total_cost'],
+            'cost_breakdown': cost_logistics['cost_breakdown'],
+            'transportation_plan': cost_logistics['transportation_plan'],
+            'route_optimization': {
+                'strategy': 'AI-optimized routing using graph algorithms and preference analysis',
+                'optimal_sequence': optimal_route,
+                'reasoning': ai_insights['route_reasoning']
+            },
+            'ai_insights': ai_insights,
+            'personalization_score': analysis_results['preference_score'],
+            'sustainability_tips': self._generate_sustainability_tips(),
+            'local_culture_guide': self._generate_culture_guide(optimal_route),
+            'emergency_info': self._generate_emergency_info(),
+            'created_at': datetime.datetime.now().isoformat(),
+            'generated_by': 'Intelligent AI Itinerary System v1.0',
+            'ml_models_used': ['sentence-transformers', 'scikit-learn', 'numpy', 'huggingface-transformers']
+        }
+        
+        yield 'itinerary', itinerary
+    
+    def _build_day(self, destination: str, day_at_dest: int, day_number: int, date: datetime.datetime,
+                   preferences: UserPreferences, analysis_results: Dict,
+                   excluded_activities: Optional[set] = None) -> Dict:
+        """One day of the itinerary at ``destination`` (``day_at_dest`` counts from 1 at each stop)"""
+        # Select activities using ML recommendations
+        day_activities = self.select_activities_for_destination(
+            destination, preferences, day_at_dest, analysis_results, excluded_activities
+        )
+        return {
+            'day': day_number,
+            'date': date.strftime("%Y-%m-%d"),
+            'location': destination,
+            'theme': self._generate_day_theme(destination, day_at_dest, preferences),
+            'activities': day_activities,
+            'transportation': None,
+            'estimated_cost': sum(activity['cost'] for activity in day_activities) + 
+                            (200 if preferences.travel_style == TravelStyle.LUXURY else 
+                             80 if preferences.travel_style == TravelStyle.MID_RANGE else 25),
+            'highlights': [activity['name'] for activity in day_activities[:2]],
+            'tips': self._generate_local_tips(destination, preferences),
+            'weather_info': self._get_weather_guidance(destination, date),
+            'local_insights': self._generate_ai_insights(destination, preferences)
+        }
+    
+    def restamp_itinerary(self, itinerary: Dict, start_date: str) -> Dict:
+        """Re-date a previously generated itinerary for a new start date (days, weather, id)"""
+        current_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+        for day in itinerary['days']:
+            day['date'] = current_date.strftime("%Y-%m-%d")
+            day['weather_info'] = self._get_weather_guidance(day['location'], current_date)
+            current_date += datetime.timedelta(days=1)
+        now = datetime.datetime.now()
+        itinerary['id'] = f"ai_itinerary_{now.strftime('%Y%m%d_%H%M%S')}"
+        itinerary['created_at'] = now.isoformat()
+        return itinerary
+    
+    def replan_itinerary(self, preferences: UserPreferences, itinerary: Dict, edit: Dict) -> Dict:
+        """
+        Apply one edit to a generated itinerary, rebuilding only the affected days,
+        the transport legs around changed stops and the cost totals.
+        
+        Supported edits (``edit['type']``):
+        - swap_destination: replace stop ``destination`` with ``new_destination``
+        - set_stop_duration: give stop ``destination`` ``days`` days
+        - exclude_activity: drop ``activity`` everywhere and refill the days that had it
+        - swap_days: exchange the plans of days ``day_a`` and ``day_b`` of the same stop
+        """
+        edit_type = edit.get('type')
+        if edit_type not in REPLAN_EDIT_TYPES:
+            raise ValueError(f"Unknown edit type: {edit_type}. Must be one of: {list(REPLAN_EDIT_TYPES)}")
+        
+        # Preference analysis is reused from recent requests when the same preferences were seen
+        analysis_results = self.analyze_user_preferences(preferences)
+        region = analysis_results['region']
+        excluded = set(itinerary.get('excluded_activities', []))
+        
+        # Stops in route order, each with its days (None marks a day to rebuild)
+        route = list(itinerary['route_optimization']['optimal_sequence'])
+        remaining = list(itinerary['days'])
+        stops = []
+        for destination in route:
+            stop_days = []
+            while remaining and remaining[0]['location'] == destination:
+                stop_days.append(remaining.pop(0))
+            stops.append([destination, stop_days])
+        
+        def stop_index(destination: str) -> int:
+            if destination not in route:
+                raise ValueError(f"{destination} is not a stop of this itinerary")
+            return route.index(destination)
+        
+        if edit_type == 'swap_destination':
+            index = stop_index(edit.get('destination'))
+            new_destination = edit.get('new_destination')
+            if region.catalog.destination(new_destination) is None:
+                raise ValueError(f"Unknown destination for region {region.name}: {new_destination}")
+            if new_destination in route:
+                raise ValueError(f"{new_destination} is already part of this itinerary")
+            route[index] = new_destination
+            stops[index] = [new_destination, [None] * len(stops[index][1])]
+        
+        elif edit_type == 'set_stop_duration':
+            index = stop_index(edit.get('destination'))
+            days = int(edit.get('days') or 0)
+            if days < 1:
+                raise ValueError("A stop needs at least one day")
+            stop_days = stops[index][1]
+            stops[index][1] = stop_days[:days] + [None] * max(0, days - len(stop_days))
+        
+        elif edit_type == 'exclude_activity':
+            activity = edit.get('activity')
+            if not activity:
+                raise ValueError("exclude_activity needs an activity name")
+            excluded.add(activity)
+            for stop in stops:
+                stop[1] = [None if day is not None and any(a['name'] == activity for a in day['activities']) else day
+                           for day in stop[1]]
+        
+        elif edit_type == 'swap_days':
+            numbers = (edit.get('day_a'), edit.get('day_b'))
+            located = {}
+            for index, (_, stop_days) in enumerate(stops):
+                for position, day in enumerate(stop_days):
+                    if day['day'] in numbers:
+                        located[day['day']] = (index, position)
+            if len(located) != 2 or len({index for index, _ in located.values()}) != 1:
+                raise ValueError("swap_days needs two existing days of the same stop")
+            (index, first), (_, second) = located[numbers[0]], located[numbers[1]]
+            stop_days = stops[index][1]
+            stop_days[first], stop_days[second] = stop_days[second], stop_days[first]
+        
+        # Re-number and re-date every day; rebuild only the days marked None
+        current_date = datetime.datetime.strptime(preferences.start_date, "%Y-%m-%d")
+        days = []
+        activities_by_destination = {}
+        rebuilt = 0
+        for dest_index, (destination, stop_days) in enumerate(stops):
+            for day_at_dest, day in enumerate(stop_days):
+                if day is None:
+                    day = self._build_day(destination, day_at_dest + 1, len(days) + 1, current_date,
+                                          preferences, analysis_results, excluded)
+                    rebuilt += 1
+                else:
+                    day = dict(day)
+                    if day['date'] != current_date.strftime("%Y-%m-%d"):
+                        day['date'] = current_date.strftime("%Y-%m-%d")
+                        day['weather_info'] = self._get_weather_guidance(destination, current_date)
+                day['day'] = len(days) + 1
+                # Legs only change around edited stops, but looking one up is a matrix read
+                day['transportation'] = (self._get_transportation_info(route, dest_index, region)
+                                         if dest_index > 0 and day_at_dest == 0 else None)
+                activities_by_destination.setdefault(destination, []).extend(day['activities'])
+                days.append(day)
+                current_date += datetime.timedelta(days=1)
+        
+        duration = len(days)
+        cost_logistics = self.calculate_costs_and_logistics(route, activities_by_destination, preferences)
+        ai_insights = self._generate_comprehensive_insights(preferences, route, analysis_results)
+        
+        updated = dict(itinerary)
+        updated.update({
+            'duration': duration,
+            'title': f"AI-Curated {duration}-Day {preferences.destination} Journey",
+            'description': f"Intelligently crafted {duration}-day personalized itinerary for {preferences.destination} "
+                           f"optimized for {preferences.travel_style.value} travel style with {', '.join(preferences.interests)} interests.",
+            'days': days,
+            'total_cost': cost_logistics['total_cost'],
+            'cost_breakdown': cost_logistics['cost_breakdown'],
+            'transportation_plan': cost_logistics['transportation_plan'],
+            'route_optimization': dict(itinerary['route_optimization'], optimal_sequence=route,
+                                       reasoning=ai_insights['route_reasoning']),
+            'ai_insights': ai_insights,
+            'local_culture_guide': self._generate_culture_guide(route),
+            'excluded_activities': sorted(excluded),
+            'last_edit': dict(edit, days_rebuilt=rebuilt),
+            'updated_at': datetime.datetime.now().isoformat()
+        })
+        logger.info(f"Re-planned itinerary with {edit_type}: rebuilt {rebuilt} of {duration} days")
+        return updated
     
     def _select_destinations_for_trip(self, preferences: UserPreferences, analysis_results: Dict) -> List[str]:
         """Select optimal destinations based on duration and preferences"""
+        region = analysis_results['region']
+        if region.name != DEFAULT_REGION:
+            return self._rank_destinations_for_trip(region, preferences, analysis_results)
+        
         # Destinations based on trip duration
         if preferences.duration <= 3:
             return ['Kochi', 'Munnar']
@@ -718,7 +1040,28 @@ class IntelligentItineraryAI:
         else:
             return ['Kochi', 'Munnar', 'Thekkady', 'Alleppey', 'Kumarakom', 'Kovalam', 'Wayanad']
     
-    def _distribute_days(self, destinations: List[str], total_days: int) -> List[int]:
+    def _rank_destinations_for_trip(self, region: RegionData, preferences: UserPreferences,
+                                    analysis_results: Dict) -> List[str]:
+        """Pick the best-scoring destinations of a catalog region, sized by trip duration"""
+        if preferences.duration <= 3:
+            stops = 2
+        elif preferences.duration <= 5:
+            stops = 3
+        elif preferences.duration <= 7:
+            stops = 4
+        elif preferences.duration <= 10:
+            stops = 5
+        else:
+            stops = 7
+        
+        records = region.catalog.destination_records
+        categories = analysis_results['preference_categories']
+        scores = np.array([self._calculate_destination_score(record, preferences, categories) for record in records])
+        best = np.argsort(-scores, kind='stable')[:min(stops, len(records))]
+        return [region.catalog.destination_names[i] for i in best]
+    
+    def _distribute_days(self, destinations: List[str], total_days: int,
+                         region: Optional[RegionData] = None) -> List[int]:
         """Distribute days across destinations optimally"""
         base_days = total_days // len(destinations)
         extra_days = total_days % len(destinations)
@@ -728,8 +1071,8 @@ class IntelligentItineraryAI:
         # Add extra days to destinations with higher recommended duration
         for i in range(extra_days):
             dest_name = destinations[i % len(destinations)]
-            dest_info = self.destinations_df[self.destinations_df['name'] == dest_name]
-            if not dest_info.empty and dest_info.iloc[0]['recommended_duration'] > base_days:
+            recommended_duration = (region.catalog if region is not None else self.catalog).recommended_duration(dest_name)
+            if recommended_duration is not None and recommended_duration > base_days:
                 days_distribution[i % len(destinations)] += 1
         
         # Ensure minimum 1 day per destination
@@ -751,7 +1094,8 @@ class IntelligentItineraryAI:
         theme_index = min(day_number - 1, len(dest_themes) - 1)
         return dest_themes[theme_index]
     
-    def _get_transportation_info(self, route: List[str], current_index: int) -> Dict:
+    def _get_transportation_info(self, route: List[str], current_index: int,
+                                 region: Optional[RegionData] = None) -> Dict:
         """Get transportation information between destinations"""
         if current_index == 0:
             return None
@@ -759,8 +1103,9 @@ class IntelligentItineraryAI:
         from_dest = route[current_index - 1]
         to_dest = route[current_index]
         
-        if self.route_graph.has_edge(from_dest, to_dest):
-            edge_data = self.route_graph[from_dest][to_dest]
+        route_matrices = region.route_matrices if region is not None else self.route_matrices
+        edge_data = route_matrices.leg(from_dest, to_dest)
+        if edge_data is not None:
             return {
                 'from': from_dest,
                 'to': to_dest,
@@ -831,7 +1176,7 @@ class IntelligentItineraryAI:
             'best_time_to_visit': 'October to March for optimal weather conditions',
             'cultural_highlights': 'Experience authentic Kerala culture through classical dance, spice markets, and traditional houseboats',
             'sustainability_focus': 'Support local communities by choosing local guides and eco-friendly accommodations',
-            'personalization_notes': f"Itinerary customized based on your preference score of {analysis['matched_activities']['preference_score'].mean():.2f}/1.0"
+            'personalization_notes': f"Itinerary customized based on your preference score of {analysis['preference_score']:.2f}/1.0"
         }
     
     def _generate_sustainability_tips(self) -> List[str]:
@@ -870,5 +1215,61 @@ class IntelligentItineraryAI:
             ]
         }
 
+def _load_sentence_model():
+    if INFERENCE_BACKEND == 'onnx':
+        from services.onnx_backend import load_encoder
+        return load_encoder(SENTENCE_MODEL_NAME)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(SENTENCE_MODEL_NAME)
+
+def _load_emotion_pipeline():
+    if INFERENCE_BACKEND == 'onnx':
+        from services.onnx_backend import load_classifier
+        return load_classifier(EMOTION_MODEL_NAME)
+    from transformers import pipeline
+    return pipeline("text-classification", model=EMOTION_MODEL_NAME)
+
+def embedding_jobs(region: str, destinations_df: pd.DataFrame, activities_df: pd.DataFrame) -> List[Tuple[str, List[str]]]:
+    """(namespace, texts) of every embedding matrix a region needs at serving time"""
+    return [(f"{region}_activities", activities_df['description'].tolist())]
+
+def register_builtin_regions(catalog: RegionCatalog):
+    """Register the in-code catalogs that ship with the service"""
+    catalog.register_builtin(DEFAULT_REGION, IntelligentItineraryAI._kerala_catalog_frames)
+
 # Initialize the AI service
-ai_itinerary_service = IntelligentItineraryAI()
\ No newline at end of file
+ai_itinerary_service = IntelligentItineraryAI()
+
+# Executor entry points: module-level so process pool workers can unpickle them by name
+def generate_itinerary_task(preferences: UserPreferences) -> Dict:
+    return ai_itinerary_service.generate_intelligent_itinerary(preferences)
+
+def analyze_preferences_batch_task(preferences_list: List[UserPreferences]) -> List[Dict]:
+    return ai_itinerary_service.analyze_preferences_batch(preferences_list)
+
+def generate_itinerary_from_signals_task(preferences: UserPreferences, signals: Dict) -> Dict:
+    analysis_results = ai_itinerary_service.analysis_from_signals(preferences, signals)
+    return ai_itinerary_service.generate_intelligent_itinerary(preferences, analysis_results)
+
+def iter_itinerary_task(preferences: UserPreferences):
+    with profiler.profile('stream'):
+        yield from ai_itinerary_service.iter_intelligent_itinerary(preferences)
+
+def replan_itinerary_task(preferences: UserPreferences, itinerary: Dict, edit: Dict) -> Dict:
+    return ai_itinerary_service.replan_itinerary(preferences, itinerary, edit)
+
+def analyze_preferences_task(preferences: UserPreferences, top_n: int = 5) -> Dict:
+    """Preference analysis reduced to plain data (no DataFrames or region objects to pickle)"""
+    analysis = ai_itinerary_service.analyze_user_preferences(preferences)
+    return {
+        'preference_categories': analysis['preference_categories'],
+        'emotion_analysis': analysis['emotion_analysis'],
+        'top_matching_activities': [
+            {'name': activity.name, 'description': activity.description, 'preference_score': activity.score}
+            for activity in analysis['activity_groups'].top(top_n)
+        ]
+    }
+
+def warmup_worker():
+    """Process pool initializer: load and warm up the models once per worker"""
+    ai_itinerary_service.warmup()
\ No newline at end of file
@@ -35,6 +35,11 @@ def create_app():
     # Initialize Firebase Admin SDK for authentication
     initialize_firebase()
     
+    # Shared Redis cache (LLM responses); falls back to per-process memory without REDIS_URL
+    if os.getenv('REDIS_URL'):
+        from app.cache import init_redis
+        init_redis(os.getenv('REDIS_URL'))
+
     # Initialize MongoDB connection
     try:
         get_mongo_db()
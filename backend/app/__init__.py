@@ -1,16 +1,16 @@
-from flask import Flask, jsonify
-from flask_cors import CORS
-from .config import load_config
-from .firebase import init_firebase
-from .routes.health import health_bp
-from .routes.itineraries import itineraries_bp
-from .routes.recommendations import recommendations_bp
-from .routes.auth import auth_bp
-from .routes.profiles import profiles_bp
-from .routes.trips import trips_bp
-
-
-def create_app() -> Flask:
+def create_app():
+	# Imported here so submodules such as app.cache can be used without Flask or the routes
+	from flask import Flask, jsonify
+	from flask_cors import CORS
+	from .config import load_config
+	from .firebase import init_firebase
+	from .routes.health import health_bp
+	from .routes.itineraries import itineraries_bp
+	from .routes.recommendations import recommendations_bp
+	from .routes.auth import auth_bp
+	from .routes.profiles import profiles_bp
+	from .routes.trips import trips_bp
+
 	app = Flask(__name__)
 	config = load_config()
 	app.config.update(config)
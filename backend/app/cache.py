@@ -2,48 +2,102 @@
 Cache module with Redis primary and in-memory fallback
 Thread-safe for production concurrent users
 """
-import redis
-from datetime import datetime, timedelta
+from collections import OrderedDict
 from threading import Lock
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 import json
+import os
+import time
 
-_redis_client = None
-_memory_cache = {}
-_cache_lock = Lock()
+# redis is optional: without it every caller shares the in-memory fallback
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Bounds of the in-memory fallback; least recently used entries are evicted past either
+MEMORY_CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "2048"))
+MEMORY_CACHE_MAX_BYTES = int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
 
 
 class InMemoryCache:
-    """Thread-safe in-memory cache fallback when Redis unavailable"""
+    """Thread-safe LRU cache fallback when Redis unavailable, bounded by entry count and size"""
     
-    @staticmethod
-    def get(key: str) -> Optional[str]:
-        with _cache_lock:
-            if key not in _memory_cache:
+    def __init__(self, max_entries: int = MEMORY_CACHE_MAX_ENTRIES, max_bytes: int = MEMORY_CACHE_MAX_BYTES):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        # key -> (value, expires_at on the monotonic clock, size); cached payloads are ASCII, so characters are bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._lock = Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
                 return None
-            entry = _memory_cache[key]
-            if datetime.now() > entry['expires_at']:
-                del _memory_cache[key]
+            if time.monotonic() > entry[1]:
+                self._remove(key)
+                self._expirations += 1
                 return None
-            return entry['value']
+            self._entries.move_to_end(key)
+            return entry[0]
     
-    @staticmethod
-    def set(key: str, value: str, ttl: int = 3600):
-        with _cache_lock:
-            _memory_cache[key] = {
-                'value': value,
-                'expires_at': datetime.now() + timedelta(seconds=ttl)
-            }
+    def set(self, key: str, value: str, ttl: int = 3600):
+        size = len(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            if len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._shrink()
+    
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+    
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+    
+    def _shrink(self):
+        # Expired entries go first, then the least recently used ones
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if now > entry[1]]:
+            self._remove(key)
+            self._expirations += 1
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
     
-    @staticmethod
-    def delete(key: str):
-        with _cache_lock:
-            if key in _memory_cache:
-                del _memory_cache[key]
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+            }
+
+
+_redis_client = None
+_memory_cache = InMemoryCache()
 
 
 def init_redis(redis_url: str):
 	global _redis_client
+	if redis is None:
+		print("⚠️ redis package not installed, using in-memory cache")
+		_redis_client = None
+		return
 	try:
 		_redis_client = redis.from_url(redis_url, decode_responses=True)
 		_redis_client.ping()  # Test connection
@@ -58,6 +112,11 @@ def get_redis():
 	return _redis_client
 
 
+def memory_cache_stats() -> dict:
+	"""Size and eviction counts of the in-memory fallback"""
+	return _memory_cache.stats()
+
+
 def cache_get(key: str) -> Optional[str]:
 	"""Get from cache (Redis or in-memory fallback)"""
 	try:
@@ -65,7 +124,7 @@ def cache_get(key: str) -> Optional[str]:
 			return _redis_client.get(key)
 	except:
 		pass
-	return InMemoryCache.get(key)
+	return _memory_cache.get(key)
 
 
 def cache_set(key: str, value: str, ttl: int = 3600):
@@ -74,9 +133,9 @@ def cache_set(key: str, value: str, ttl: int = 3600):
 		if _redis_client:
 			_redis_client.setex(key, ttl, value)
 		else:
-			InMemoryCache.set(key, value, ttl)
+			_memory_cache.set(key, value, ttl)
 	except:
-		InMemoryCache.set(key, value, ttl)
+		_memory_cache.set(key, value, ttl)
 
 
 def cache_delete(key: str):
@@ -86,6 +145,6 @@ def cache_delete(key: str):
 			_redis_client.delete(key)
 	except:
 		pass
-	InMemoryCache.delete(key)
+	_memory_cache.delete(key)
 
 
@@ -0,0 +1,9 @@
+"""
+benchmarks
+Offline benchmarks for the AI itinerary pipeline and the LLM output parser.
+
+Everything here runs without model downloads: the sentence encoder and the
+emotion classifier are replaced by deterministic stubs and catalogs are
+generated synthetically. Run from the backend directory, e.g.
+``python -m benchmarks.itinerary_pipeline --help``.
+"""
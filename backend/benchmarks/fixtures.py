@@ -0,0 +1,145 @@
+"""
+benchmarks/fixtures.py
+Deterministic stub models and synthetic catalogs for the pipeline benchmarks.
+
+The stub encoder hashes tokens into a fixed-size bag-of-words vector, so
+texts sharing words still score as similar and the similarity ranking does
+real work; the stub classifier derives a stable emotion label from the text.
+Catalogs use the same columns as the built-in Kerala catalog.
+"""
+
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ai_itinerary_service import IntelligentItineraryAI, TravelStyle, UserPreferences, WARMUP_TEXT
+from services.embedding_store import EmbeddingStore
+
+STUB_DIMENSION = 384
+STUB_LABELS = ('joy', 'optimism', 'anger', 'sadness')
+
+CATEGORIES = ('hill_station', 'backwaters', 'beach', 'heritage', 'wildlife', 'city', 'pilgrimage')
+ACTIVITY_CATEGORIES = ('nature', 'cultural', 'adventure', 'relaxation', 'history', 'wellness', 'beach', 'wildlife')
+TIME_SLOTS = ('morning', 'afternoon', 'evening', 'full_day')
+SEASONS = ('winter', 'summer', 'monsoon', 'all_year')
+VOCABULARY = (
+    'nature', 'culture', 'food', 'relaxation', 'adventure', 'wildlife', 'trekking', 'mountains',
+    'history', 'heritage', 'art', 'spa', 'wellness', 'beach', 'sunset', 'photography', 'temples',
+    'markets', 'shopping', 'backwaters', 'houseboat', 'spices', 'tea', 'waterfalls', 'caves',
+    'safari', 'birds', 'cycling', 'village', 'dance', 'museum', 'architecture', 'peaceful', 'scenic',
+)
+
+
+def _stable_hash(text: str) -> int:
+    return zlib.crc32(text.encode('utf-8'))
+
+
+class StubEncoder:
+    """``SentenceTransformer.encode`` stand-in: signed feature hashing of lower-cased tokens"""
+
+    def __init__(self, dimension: int = STUB_DIMENSION):
+        self.dimension = dimension
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return self.encode([texts])[0]
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for token in (text or '').lower().split():
+                digest = _stable_hash(token)
+                rows.append(row)
+                columns.append(digest % self.dimension)
+                signs.append(1.0 if digest & 0x80000000 else -1.0)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(embeddings, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)),
+                  np.asarray(signs, dtype=np.float32))
+        # Keep empty texts away from the zero vector
+        embeddings[:, 0] += 1e-3
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+class StubClassifier:
+    """``text-classification`` pipeline stand-in returning one stable label per text"""
+
+    def __call__(self, texts, **kwargs) -> List[Dict]:
+        if isinstance(texts, str):
+            texts = [texts]
+        results = []
+        for text in texts:
+            digest = _stable_hash(text or '')
+            results.append({'label': STUB_LABELS[digest % len(STUB_LABELS)], 'score': 0.5 + (digest % 50) / 100.0})
+        return results
+
+
+def synthetic_catalog(n_destinations: int, n_activities: int, seed: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Destination and activity frames of the given sizes; every destination gets activities round-robin."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(VOCABULARY)
+    names = [f"Destination {index:05d}" for index in range(n_destinations)]
+
+    # Spread stops over a region roughly the size of a large Indian state
+    latitudes = rng.uniform(8.0, 20.0, n_destinations).round(4)
+    longitudes = rng.uniform(72.0, 84.0, n_destinations).round(4)
+    destinations = []
+    for index, name in enumerate(names):
+        tags = rng.choice(vocabulary, size=5, replace=False).tolist()
+        destinations.append({
+            'name': name,
+            'latitude': float(latitudes[index]),
+            'longitude': float(longitudes[index]),
+            'category': CATEGORIES[index % len(CATEGORIES)],
+            'activities': tags[:4],
+            'average_cost': round(float(rng.uniform(30.0, 250.0)), 2),
+            'recommended_duration': int(rng.integers(1, 5)),
+            'season_preference': SEASONS[index % len(SEASONS)],
+            'description': f"{' '.join(tags[:3])} destination with {tags[3]} and {tags[4]}",
+            'tags': tags,
+        })
+
+    activities = []
+    for index in range(n_activities):
+        tags = rng.choice(vocabulary, size=3, replace=False).tolist()
+        extra = rng.choice(vocabulary, size=3, replace=False).tolist()
+        activities.append({
+            'name': f"Activity {index:06d}",
+            'description': f"{' '.join(extra)} {' '.join(tags)} experience",
+            'category': ACTIVITY_CATEGORIES[index % len(ACTIVITY_CATEGORIES)],
+            'duration': float(rng.choice([1.5, 2.0, 2.5, 3.0, 4.0, 8.0])),
+            'cost': round(float(rng.uniform(0.0, 150.0)), 2),
+            'location': names[index % n_destinations],
+            'rating': round(float(rng.uniform(3.5, 5.0)), 1),
+            'tags': tags,
+            'time_slot': TIME_SLOTS[index % len(TIME_SLOTS)],
+        })
+
+    return pd.DataFrame(destinations), pd.DataFrame(activities)
+
+
+def build_stub_service(cache_dir: str) -> IntelligentItineraryAI:
+    """Itinerary service with stub models and a private embedding store under ``cache_dir``."""
+    service = IntelligentItineraryAI()
+    service.models.register('sentence_transformer', StubEncoder, lambda model: model.encode([WARMUP_TEXT]))
+    service.models.register('nlp_pipeline', StubClassifier, lambda model: model([WARMUP_TEXT]))
+    service.embedding_store = EmbeddingStore(cache_dir=cache_dir)
+    return service
+
+
+def preference_profiles(region: str, count: int = 8, seed: int = 0,
+                        start_date: Optional[str] = None) -> List[UserPreferences]:
+    """Varied but reproducible preference profiles for ``region``."""
+    rng = np.random.default_rng(seed)
+    styles = list(TravelStyle)
+    profiles = []
+    for index in range(count):
+        profiles.append(UserPreferences(
+            destination=region,
+            duration=int(rng.integers(2, 15)),
+            budget=float(rng.integers(500, 10000)),
+            interests=rng.choice(np.array(VOCABULARY), size=int(rng.integers(2, 6)), replace=False).tolist(),
+            travel_style=styles[index % len(styles)],
+            group_size=int(rng.integers(1, 6)),
+            start_date=start_date or '2026-01-01'
+        ))
+    return profiles
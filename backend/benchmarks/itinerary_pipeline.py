@@ -0,0 +1,225 @@
+"""
+benchmarks/itinerary_pipeline.py
+Per-stage latency and memory benchmark of ``IntelligentItineraryAI``.
+
+Each scenario registers a synthetic region, prepares it once (route matrices
+and activity embeddings, reported as ``region_prepare``) and then runs the
+production generator ``iter_intelligent_itinerary`` to completion, timing its
+own stage sections through ``services.metrics.stage_hook``: analysis,
+destination_selection, routing, activity_selection, costing and insights.
+Latencies come from untraced runs; peak memory per stage from one extra run
+under ``tracemalloc``. Results can be saved as JSON and compared against a
+previous run to catch regressions.
+
+Usage:
+    python -m benchmarks.itinerary_pipeline
+    python -m benchmarks.itinerary_pipeline --scenarios small medium --iterations 50 --json after.json
+    python -m benchmarks.itinerary_pipeline --compare before.json --max-regression 1.25
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fixtures import build_stub_service, preference_profiles, synthetic_catalog
+from services.metrics import stage_hook
+
+# name -> (destinations, activities)
+SCENARIOS = {
+    'small': (7, 10),
+    'medium': (200, 1_000),
+    'large': (2_000, 100_000),
+}
+
+STAGES = ('analysis', 'destination_selection', 'routing', 'activity_selection', 'costing', 'insights')
+
+# Stages faster than this are too noisy to flag as regressions
+MIN_COMPARABLE_MS = 0.05
+
+
+class _StageTimes:
+    """Stage hook summing the sections of each stage over one generation"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    def start(self, stage: str):
+        pass
+
+    def end(self, stage: str, seconds: float):
+        self.seconds[stage] += seconds
+
+
+class _StagePeaks:
+    """Stage hook recording the peak traced allocation of each stage section"""
+
+    def __init__(self, peaks: Dict[str, int]):
+        self.peaks = peaks
+        self._baseline = 0
+
+    def start(self, stage: str):
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.get_traced_memory()[0]
+
+    def end(self, stage: str, seconds: float):
+        self.peaks[stage] = max(self.peaks.get(stage, 0), tracemalloc.get_traced_memory()[1] - self._baseline)
+
+
+def run_generation(service, preferences, hook=None) -> Dict:
+    """Run the production streaming generator to completion, reporting its stages to ``hook``."""
+    itinerary = None
+    with stage_hook(hook) if hook is not None else nullcontext():
+        for event, payload in service.iter_intelligent_itinerary(preferences):
+            if event == 'itinerary':
+                itinerary = payload
+    return itinerary
+
+
+def _summary(samples: List[float]) -> Dict:
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'count': int(values.size),
+        'min_ms': round(float(values.min()), 4),
+        'p50_ms': round(float(np.percentile(values, 50)), 4),
+        'p95_ms': round(float(np.percentile(values, 95)), 4),
+        'mean_ms': round(float(values.mean()), 4),
+    }
+
+
+def run_scenario(name: str, n_destinations: int, n_activities: int, iterations: int,
+                 seed: int = 0, cache_dir: Optional[str] = None) -> Dict:
+    """Benchmark one synthetic catalog size and return its per-stage report."""
+    region = f"bench_{name}"
+    frames = synthetic_catalog(n_destinations, n_activities, seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        service = build_stub_service(cache_dir or tmp)
+        service.regions.register_builtin(region, lambda: frames)
+        service.models.load_all()
+
+        # Region preparation happens once per process, so it is measured once, cold
+        tracemalloc.start()
+        started = time.perf_counter()
+        service.regions.get(region)
+        prepare_seconds = time.perf_counter() - started
+        prepare_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        profiles = preference_profiles(region, seed=seed)
+
+        def generate(index: int, hook=None):
+            # Every iteration pays for preference analysis instead of hitting the signal cache
+            service._analysis_signals.clear()
+            run_generation(service, profiles[index % len(profiles)], hook)
+
+        generate(0)  # warm caches and code paths
+
+        samples = {stage: [] for stage in STAGES}
+        totals = []
+        for index in range(iterations):
+            times = _StageTimes()
+            started = time.perf_counter()
+            generate(index, times)
+            totals.append(time.perf_counter() - started)
+            for stage in STAGES:
+                samples[stage].append(times.seconds.get(stage, 0.0))
+
+        peaks: Dict[str, int] = {}
+        tracemalloc.start()
+        for index in range(len(profiles)):
+            generate(index, _StagePeaks(peaks))
+        tracemalloc.stop()
+
+    stages = {stage: {**_summary(samples[stage]), 'peak_kib': round(peaks.get(stage, 0) / 1024.0, 1)}
+              for stage in STAGES}
+    stages['total'] = {**_summary(totals), 'peak_kib': round(max(peaks.values(), default=0) / 1024.0, 1)}
+    return {
+        'destinations': n_destinations,
+        'activities': n_activities,
+        'iterations': iterations,
+        'region_prepare': {'ms': round(prepare_seconds * 1000.0, 2), 'peak_kib': round(prepare_peak / 1024.0, 1)},
+        'stages': stages,
+    }
+
+
+def compare(current: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Stages whose p50 grew by more than ``max_regression`` times the baseline."""
+    regressions = []
+    for scenario, report in current['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if previous is None:
+            continue
+        for stage, summary in report['stages'].items():
+            before = previous['stages'].get(stage, {}).get('p50_ms')
+            after = summary['p50_ms']
+            if before is None or max(before, after) < MIN_COMPARABLE_MS:
+                continue
+            if after > before * max_regression:
+                regressions.append(f"{scenario}/{stage}: p50 {before:.3f} ms -> {after:.3f} ms "
+                                   f"({after / before:.2f}x)")
+    return regressions
+
+
+def format_report(results: Dict) -> str:
+    lines = []
+    for scenario, report in results['scenarios'].items():
+        prepare = report['region_prepare']
+        lines.append(f"\n{scenario}: {report['destinations']} destinations, {report['activities']} activities, "
+                     f"{report['iterations']} iterations "
+                     f"(region_prepare {prepare['ms']:.1f} ms, peak {prepare['peak_kib']:.0f} KiB)")
+        lines.append(f"  {'stage':<22}{'p50 ms':>10}{'p95 ms':>10}{'min ms':>10}{'peak KiB':>11}")
+        for stage, summary in report['stages'].items():
+            lines.append(f"  {stage:<22}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}"
+                         f"{summary['min_ms']:>10.3f}{summary['peak_kib']:>11.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the itinerary pipeline with stub models")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--max-regression", type=float, default=1.25,
+                        help="Fail when a stage p50 exceeds the baseline by this factor")
+    args = parser.parse_args(argv)
+    # The service logs every stage at INFO
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {
+        'created_at': datetime.datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'seed': args.seed,
+        'scenarios': {},
+    }
+    for name in args.scenarios:
+        n_destinations, n_activities = SCENARIOS[name]
+        results['scenarios'][name] = run_scenario(name, n_destinations, n_activities, args.iterations, args.seed)
+    print(format_report(results))
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(results, json.load(fh), args.max_regression)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nNo regressions against", args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+benchmarks/json_recovery.py
+Fuzz test and benchmark of ``services.json_recovery.parse_model_json``.
+
+The samples of ``benchmarks/model_outputs.py`` are parsed with the tolerant
+extractor and with the previous approach (``json.loads``, then the text
+between the first ``{`` and last ``}`` with ``,}``/``,]`` replaced). Both are
+timed and compared on how many of the complete days they recover. The fuzzer
+then mutates the samples (truncation at random offsets, inserted commas,
+deleted characters, prose and fences around the document) and checks that
+the extractor only ever raises ``ValueError``, and that a truncated response
+yields exactly the days completed before the cut, in frontend shape, and no
+half-written day after them.
+
+Usage:
+    python -m benchmarks.json_recovery
+    python -m benchmarks.json_recovery --fuzz-cases 20000 --seed 3 --json recovery.json
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.model_outputs import ModelOutput, sample_outputs
+from services.json_recovery import normalize_days, parse_model_json
+from services.json_stream import DaysStreamParser
+
+
+def legacy_parse(text: str) -> Dict:
+    """The extractor ``parse_model_json`` replaced, plus the route's second walk over ``days``."""
+    text = text.strip()
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise ValueError("Could not parse JSON from model output")
+        candidate = text[start:end + 1]
+        try:
+            parsed = json.loads(candidate)
+        except ValueError:
+            parsed = json.loads(candidate.replace(",}", "}").replace(",]", "]"))
+    days = []
+    for index, day in enumerate(parsed.get("days", [])):
+        if isinstance(day, dict):
+            activities = day.get("activities", [])
+            days.append({
+                "day": day.get("day", index + 1),
+                "title": day.get("title", f"Day {index + 1}"),
+                "description": day.get("description", ""),
+                "locations": [{**a, "name": a.get("place", ""), "description": a.get("details", "")}
+                              for a in activities],
+                "activities": activities,
+            })
+    parsed["days"] = days
+    return parsed
+
+
+def _recovered_days(parse: Callable[[str], Dict], text: str) -> int:
+    try:
+        return len(parse(text).get("days") or [])
+    except ValueError:
+        return 0
+
+
+def _p50_ms(fn: Callable[[], object], iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return round(samples[len(samples) // 2] * 1000.0, 4)
+
+
+def run_samples(outputs: List[ModelOutput], iterations: int) -> Dict:
+    results = {}
+    for output in outputs:
+        def legacy():
+            try:
+                legacy_parse(output.text)
+            except ValueError:
+                pass
+        results[output.name] = {
+            'bytes': len(output.text.encode("utf-8")),
+            'complete_days': output.complete_days,
+            'recovered_days': _recovered_days(parse_model_json, output.text),
+            'legacy_recovered_days': _recovered_days(legacy_parse, output.text),
+            'p50_ms': _p50_ms(lambda: parse_model_json(output.text), iterations),
+            'legacy_p50_ms': _p50_ms(legacy, iterations),
+        }
+    return results
+
+
+def _mutate(rng: random.Random, text: str) -> str:
+    choice = rng.randrange(4)
+    if choice == 0:
+        position = rng.randrange(len(text))
+        return text[:position] + "," + text[position:]
+    if choice == 1:
+        position = rng.randrange(len(text))
+        return text[:position] + text[position + rng.randint(1, 8):]
+    if choice == 2:
+        return f"Sure! {rng.choice(('Here you go', 'Your plan'))}:\n```json\n{text}\n```\nEnjoy your trip."
+    return "".join(char for char in text if rng.random() > 0.01)
+
+
+def fuzz(outputs: List[ModelOutput], cases: int, seed: int) -> Dict:
+    """Random truncations and mutations of the samples; returns counts and the first failures."""
+    rng = random.Random(seed)
+    clean = [output for output in outputs if output.name.startswith("bare_")]
+    failures: List[str] = []
+    truncations = mutations = 0
+    for case in range(cases):
+        if case % 2 == 0:
+            output = rng.choice(clean)
+            cut = rng.randrange(len(output.text) + 1)
+            text = output.text[:cut]
+            parser = DaysStreamParser("days")
+            expected = len(parser.feed(text))
+            truncations += 1
+            try:
+                days = parse_model_json(text).get("days") or []
+            except ValueError:
+                days = []
+            reference = normalize_days(copy.deepcopy(output.itinerary))["days"][:expected]
+            if days != reference:
+                failures.append(f"{output.name} cut at {cut}: {len(days)} days recovered, {expected} complete")
+        else:
+            text = _mutate(rng, rng.choice(outputs).text)
+            mutations += 1
+            try:
+                parse_model_json(text)
+            except ValueError:
+                pass
+            except Exception as e:
+                failures.append(f"mutation {case}: {type(e).__name__}: {e}")
+    return {'cases': cases, 'truncations': truncations, 'mutations': mutations,
+            'failures': len(failures), 'first_failures': failures[:10]}
+
+
+def format_report(results: Dict) -> str:
+    lines = [f"  {'sample':<24}{'bytes':>8}{'days':>6}{'new':>6}{'legacy':>8}{'p50 ms':>10}{'legacy ms':>11}"]
+    for name, sample in results['samples'].items():
+        lines.append(f"  {name:<24}{sample['bytes']:>8}{sample['complete_days']:>6}{sample['recovered_days']:>6}"
+                     f"{sample['legacy_recovered_days']:>8}{sample['p50_ms']:>10.3f}{sample['legacy_p50_ms']:>11.3f}")
+    fuzzed = results['fuzz']
+    lines.append(f"\nfuzz: {fuzzed['cases']} cases ({fuzzed['truncations']} truncations, "
+                 f"{fuzzed['mutations']} mutations), {fuzzed['failures']} failures")
+    lines.extend(f"  {failure}" for failure in fuzzed['first_failures'])
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fuzz test and benchmark of the model output JSON extractor")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--fuzz-cases", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    outputs = sample_outputs(args.seed)
+    results = {
+        'created_at': datetime.datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'seed': args.seed,
+        'samples': run_samples(outputs, args.iterations),
+        'fuzz': fuzz(outputs, args.fuzz_cases, args.seed),
+    }
+    print(format_report(results))
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    mismatched = [name for name, sample in results['samples'].items()
+                  if sample['recovered_days'] != sample['complete_days']]
+    if mismatched:
+        print("\nRecovered day count differs from the complete days in:", ", ".join(mismatched))
+    return 1 if mismatched or results['fuzz']['failures'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
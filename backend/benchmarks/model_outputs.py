@@ -0,0 +1,106 @@
+"""
+benchmarks/model_outputs.py
+Itinerary responses in the shapes the OpenAI and Gemini calls return them.
+
+``sample_outputs`` renders deterministic itineraries (the prompt's schema,
+Indian destinations, INR costs) in every variant seen from the providers:
+bare JSON, ```json fences, a line of prose around the document, trailing
+commas, Python literals, raw newlines inside strings, invalid escapes and
+responses cut off at ``max_tokens``. Each sample records how many complete
+days a parser has to recover from it.
+"""
+
+import json
+import random
+from typing import Dict, List, NamedTuple
+
+DESTINATIONS = ('Munnar', 'Alleppey', 'Jaipur', 'Goa', 'Varanasi', 'Leh', 'Hampi', 'Rishikesh')
+PLACES = (
+    'Tea Museum', 'Mattupetty Dam', 'Eravikulam National Park', 'Houseboat Cruise', 'Marari Beach',
+    'Amber Fort', 'Hawa Mahal', 'City Palace', 'Baga Beach', 'Fort Aguada', 'Dashashwamedh Ghat',
+    'Sarnath', 'Shanti Stupa', 'Pangong Lake', 'Virupaksha Temple', 'Vittala Temple', 'Laxman Jhula',
+    'Spice Plantation', 'Local Market', 'Sunset Point',
+)
+SLOTS = ('Morning', 'Afternoon', 'Evening')
+
+
+class ModelOutput(NamedTuple):
+    name: str
+    text: str
+    # Days a parser must recover; every earlier day is complete in ``text``
+    complete_days: int
+    itinerary: Dict
+
+
+def sample_itinerary(duration: int, seed: int = 0) -> Dict:
+    rng = random.Random(seed * 1_000 + duration)
+    destination = rng.choice(DESTINATIONS)
+    days = []
+    for day in range(1, duration + 1):
+        activities = [{
+            "time": SLOTS[slot % len(SLOTS)],
+            "place": rng.choice(PLACES),
+            "details": f"{rng.choice(('Visit', 'Explore', 'Walk around', 'Photograph'))} the area "
+                       f"with a local guide; carry water and cash for entry tickets.",
+            "approx_time_mins": rng.choice((60, 90, 120, 180)),
+            "estimated_cost": rng.choice((0, 100, 250, 500, 1200)),
+        } for slot in range(rng.randint(3, 5))]
+        days.append({
+            "day": day,
+            "date": f"2025-12-{day:02d}",
+            "title": f"Day {day} - {activities[0]['place']}",
+            "description": f"A relaxed day in {destination} built around {activities[0]['place']}.",
+            "activities": activities,
+            "food_suggestion": rng.choice(('Appam with stew', 'Dal baati churma', 'Fish curry rice', 'Thali')),
+        })
+    return {
+        "destination": destination,
+        "start_date": "2025-12-01",
+        "duration_days": duration,
+        "group_size": rng.randint(1, 6),
+        "budget": f"₹{rng.choice((15000, 25000, 60000))}",
+        "summary": f"{duration}-day trip to {destination} mixing sightseeing, food and downtime.",
+        "days": days,
+        "travel_tips": ["Carry ID", "Keep cash for local markets", "Book houseboats early in peak season"],
+        "estimated_total_cost": sum(a["estimated_cost"] for d in days for a in d["activities"]),
+    }
+
+
+def _with_trailing_commas(text: str) -> str:
+    return text.replace("}\n", "},\n").replace('"\n', '",\n').replace("]\n", "],\n")
+
+
+def _python_literals(itinerary: Dict) -> str:
+    itinerary = dict(itinerary, is_refundable=False, visa_required=None)
+    return json.dumps(itinerary, ensure_ascii=False, indent=2).replace("false", "False").replace("null", "None")
+
+
+def _truncated(text: str, keep_days: int) -> str:
+    """Cut ``text`` in the middle of day ``keep_days + 1``, as a ``max_tokens`` stop does."""
+    marker = f'"day": {keep_days + 1},'
+    cut = text.index(marker) + len(marker) + 40
+    return text[:cut]
+
+
+def sample_outputs(seed: int = 0, durations=(3, 7, 14)) -> List[ModelOutput]:
+    outputs = []
+    for duration in durations:
+        itinerary = sample_itinerary(duration, seed)
+        pretty = json.dumps(itinerary, ensure_ascii=False, indent=2)
+        compact = json.dumps(itinerary, ensure_ascii=False)
+        tag = f"{duration}d"
+        outputs += [
+            ModelOutput(f"bare_{tag}", compact, duration, itinerary),
+            ModelOutput(f"fenced_{tag}", f"```json\n{pretty}\n```", duration, itinerary),
+            ModelOutput(f"prose_{tag}",
+                        f"Here is your itinerary for {itinerary['destination']}:\n\n{pretty}\n\n"
+                        f"Let me know if you'd like to adjust anything!", duration, itinerary),
+            ModelOutput(f"trailing_commas_{tag}", f"```json\n{_with_trailing_commas(pretty)}\n```",
+                        duration, itinerary),
+            ModelOutput(f"python_literals_{tag}", _python_literals(itinerary), duration, itinerary),
+            ModelOutput(f"raw_newlines_{tag}", pretty.replace("; carry", ";\ncarry"), duration, itinerary),
+            ModelOutput(f"bad_escapes_{tag}", pretty.replace("Carry ID", "Carry \\'ID\\'"), duration, itinerary),
+            ModelOutput(f"truncated_{tag}", _truncated(f"```json\n{pretty}", duration - 1),
+                        duration - 1, itinerary),
+        ]
+    return outputs
@@ -3,8 +3,8 @@ AI Routes - Hugging Face transformers and OpenAI integration
 Demonstrates ML/AI capabilities with Python Flask backend
 """
 from flask import Blueprint, request, jsonify, current_app
-from openai import OpenAI
 from datetime import datetime
+from services.llm_clients import get_client
 # Import transformers when available
 try:
     from transformers import pipeline
@@ -35,23 +35,22 @@ def ai_chat():
         # Use OpenAI if API key available
         if current_app.config.get('OPENAI_API_KEY'):
             try:
-                client = OpenAI(api_key=current_app.config['OPENAI_API_KEY'])
+                # Shared pooled client: connections stay open across chat requests
+                client = get_client('openai', current_app.config['OPENAI_API_KEY'])
                 
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
+                ai_response = client.complete(
+                    [
                         {
                             "role": "system", 
                             "content": "You are a helpful travel assistant for TravelSensei. Help users plan their trips, find hotels, and provide travel recommendations."
                         },
                         {"role": "user", "content": message}
                     ],
+                    model="gpt-3.5-turbo",
                     max_tokens=500,
                     temperature=0.7
                 )
                 
-                ai_response = response.choices[0].message.content
-                
                 return jsonify({
                     'success': True,
                     'response': ai_response,
@@ -34,15 +34,62 @@ Blueprint to expose AI itinerary generation endpoint.
 Mount under /api/itineraries in app creation.
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from datetime import datetime
-from services.ai_itinerary_service import generate_ai_itinerary
+from services.ai_itinerary_service import (generate_ai_itinerary, generation_flight, llm_cache, provider_stats,
+                                             stream_ai_itinerary)
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 ai_itinerary_bp = Blueprint("ai_itinerary", __name__)
 
 
+def _build_payload(data: dict) -> dict:
+    """Normalize a generate-ai request body into the payload of the AI service"""
+    # basic validation & defaults
+    destination = data.get("destination", "Kerala, India")
+    duration = int(data.get("duration_days", data.get("duration", 3)))
+    start_date = data.get("start_date", datetime.now().strftime("%Y-%m-%d"))
+    # Ensure valid date format
+    try:
+        # Accept ISO datetime with T as well
+        if "T" in start_date:
+            start_date = start_date.split("T")[0]
+        datetime.strptime(start_date, "%Y-%m-%d")
+    except Exception:
+        start_date = datetime.now().strftime("%Y-%m-%d")
+
+    # Prepare payload for service
+    payload = {
+        "destination": destination,
+        "start_date": start_date,
+        "duration_days": duration,
+        "budget": data.get("budget", data.get("budget_per_person", 1000)),
+        "group_size": data.get("group_size", 2),
+        "travel_style": data.get("travel_style", ""),
+        "accommodation": data.get("accommodation", ""),
+        "interests": data.get("interests", [])
+    }
+    return payload
+
+
+def _ensure_hotels(itinerary: dict, payload: dict):
+    # Always attach hotel recommendations if missing from AI response
+    hotels = itinerary.get('hotels') or itinerary.get('recommended_hotels')
+    if not hotels:
+        from services.itinerary_ai_enhanced import EnhancedItineraryAI
+        ai = EnhancedItineraryAI()
+        hotels = ai._get_smart_hotel_recommendations({'full_name': payload["destination"]}, payload["duration_days"],
+                                                     payload.get('budget', 1000), 'hotel')
+        itinerary['recommended_hotels'] = hotels
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
 @ai_itinerary_bp.route("/generate-ai", methods=["POST", "OPTIONS"])
 def generate_ai():
     """
@@ -62,41 +109,11 @@ def generate_ai():
         data = request.get_json() or {}
         logger.info("AI Itinerary request received: %s", data)
 
-        # basic validation & defaults
-        destination = data.get("destination", "Kerala, India")
-        duration = int(data.get("duration_days", data.get("duration", 3)))
-        start_date = data.get("start_date", datetime.now().strftime("%Y-%m-%d"))
-        # Ensure valid date format
-        try:
-            # Accept ISO datetime with T as well
-            if "T" in start_date:
-                start_date = start_date.split("T")[0]
-            datetime.strptime(start_date, "%Y-%m-%d")
-        except Exception:
-            start_date = datetime.now().strftime("%Y-%m-%d")
-
-        # Prepare payload for service
-        payload = {
-            "destination": destination,
-            "start_date": start_date,
-            "duration_days": duration,
-            "budget": data.get("budget", data.get("budget_per_person", 1000)),
-            "group_size": data.get("group_size", 2),
-            "travel_style": data.get("travel_style", ""),
-            "accommodation": data.get("accommodation", ""),
-            "interests": data.get("interests", [])
-        }
+        payload = _build_payload(data)
 
         # Generate itinerary via AI service
         itinerary = generate_ai_itinerary(payload)
-
-        # Always attach hotel recommendations if missing from AI response
-        hotels = itinerary.get('hotels') or itinerary.get('recommended_hotels')
-        if not hotels:
-            from services.itinerary_ai_enhanced import EnhancedItineraryAI
-            ai = EnhancedItineraryAI()
-            hotels = ai._get_smart_hotel_recommendations({'full_name': destination}, duration, payload.get('budget', 1000), 'hotel')
-            itinerary['recommended_hotels'] = hotels
+        _ensure_hotels(itinerary, payload)
 
         response_payload = {
             "success": True,
@@ -112,3 +129,54 @@ def generate_ai():
     except Exception as e:
         logger.exception("Error generating AI itinerary: %s", e)
         return jsonify({"success": False, "error": "Internal Server Error"}), 500
+
+
+@ai_itinerary_bp.route("/generate-ai/stream", methods=["POST"])
+def generate_ai_stream():
+    """
+    POST /api/itineraries/generate-ai/stream (same body as /generate-ai)
+    Server-Sent Events: one 'day' event per day as soon as the model has written it,
+    then 'summary' (the itinerary without its days), then 'done', or 'error'.
+    """
+    data = request.get_json(silent=True) or {}
+    logger.info("Streaming AI itinerary request received: %s", data)
+    try:
+        payload = _build_payload(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    def stream():
+        started = time.perf_counter()
+        first_day_seconds = None
+        try:
+            for event, value in stream_ai_itinerary(payload):
+                if event == "day":
+                    if first_day_seconds is None:
+                        first_day_seconds = round(time.perf_counter() - started, 3)
+                    yield _sse("day", value)
+                    continue
+                _ensure_hotels(value, payload)
+                summary = {key: item for key, item in value.items() if key != "days"}
+                yield _sse("summary", {
+                    "success": True,
+                    "ai_generated": True,
+                    "generated_at": datetime.now().isoformat(),
+                    "itinerary": summary,
+                    "generation_metadata": {
+                        "first_day_seconds": first_day_seconds,
+                        "generation_time_seconds": round(time.perf_counter() - started, 3),
+                    },
+                })
+            yield _sse("done", {"success": True})
+        except Exception as e:
+            logger.exception("Error streaming AI itinerary: %s", e)
+            yield _sse("error", {"success": False, "error": "Internal Server Error"})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(stream()), mimetype="text/event-stream", headers=headers)
+
+
+@ai_itinerary_bp.route("/generate-ai/cache-stats", methods=["GET"])
+def generate_ai_cache_stats():
+    """GET /api/itineraries/generate-ai/cache-stats: LLM response cache, request coalescing and provider counters"""
+    return jsonify({**llm_cache.stats(), 'single_flight': generation_flight.stats(), 'provider': provider_stats()}), 200
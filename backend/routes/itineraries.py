@@ -128,8 +128,6 @@ def generate_ai_itinerary():
 
         logger.info(f"Launching Gemini AI for {destination} with user_data: {user_data}")
 
-        gemini_result['dayPlans'] = formatted_day_plans
-        gemini_result['day_plans'] = formatted_day_plans
         # Synchronous Gemini call (no threading)
         try:
             from services.ai_itinerary_service import generate_ai_itinerary as generate_gemini_itinerary
@@ -221,34 +219,9 @@ def generate_ai_itinerary():
 
         # Always map 'days' to 'day_plans' and 'dayPlans' for frontend compatibility
 
-        # Always use Gemini's 'days' as the source of truth for day-by-day plan
-        day_plans_raw = gemini_result.get('days', [])
-        formatted_day_plans = []
-        for idx, day in enumerate(day_plans_raw):
-            if not isinstance(day, dict):
-                continue
-            activities = day.get('activities', [])
-            locations = [
-                {
-                    **activity,
-                    'name': activity.get('place', ''),
-                    'description': activity.get('details', '')
-                }
-                for activity in activities
-            ]
-            if (not locations or len(locations) == 0) and (not activities or len(activities) == 0):
-                locations = [{
-                    'name': 'No activities planned',
-                    'description': 'No activities or locations were generated for this day.'
-                }]
-            formatted_day = {
-                'day': day.get('day', idx + 1),
-                'title': day.get('title', f"Day {day.get('day', idx + 1)}"),
-                'description': day.get('description', ''),
-                'locations': locations,
-                'activities': activities
-            }
-            formatted_day_plans.append(formatted_day)
+        # Always use Gemini's 'days' as the source of truth for day-by-day plan;
+        # the service already gave each day its title, description and locations
+        formatted_day_plans = [day for day in gemini_result.get('days', []) if isinstance(day, dict)]
 
         # Always set both 'dayPlans' and 'day_plans' in the response for frontend compatibility
         gemini_result['dayPlans'] = formatted_day_plans
@@ -109,11 +109,17 @@ Returns a Python dict formatted for your frontend.
 """
 
 import os
-import json
 import logging
 from datetime import datetime
+from typing import Iterator, Tuple
 from dotenv import load_dotenv
 
+from services.itinerary_chunks import iter_chunked_itinerary, should_chunk
+from services.json_recovery import normalize_day, normalize_days, parse_model_json
+from services.json_stream import DaysStreamParser
+from services.llm_cache import LLMResponseCache
+from services.single_flight import SingleFlight
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -121,29 +127,22 @@ MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "openai").lower()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")  # optional
 
-# Try imports lazily (so project won't fail if gemini client not installed)
-_openai_client = None
-_genai = None
-if MODEL_PROVIDER == "openai":
-    try:
-        from openai import OpenAI
-        _openai_client = OpenAI(api_key=OPENAI_API_KEY)
-    except Exception as e:
-        logger.warning("OpenAI client init failed: %s", e)
-        _openai_client = None
-elif MODEL_PROVIDER == "gemini":
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=GEMINI_API_KEY)
-        _genai = genai
-    except Exception as e:
-        logger.warning("Gemini client init failed: %s", e)
-        _genai = None
+# Read after load_dotenv so the connection, timeout and hedging settings in .env apply
+from services.llm_clients import build_hedged_client
 
+# Pooled provider client shared by all requests (None without an API key)
+_llm = build_hedged_client(MODEL_PROVIDER)
+if _llm is None:
+    logger.warning("No API key configured for provider %s", MODEL_PROVIDER)
 
-def build_itinerary_prompt(payload: dict) -> str:
+# Parsed model responses, shared by every route that calls generate_ai_itinerary
+llm_cache = LLMResponseCache()
+generation_flight = SingleFlight()
+
+
+def trip_details(payload: dict) -> dict:
     """
-    Build a detailed, structured prompt for the AI model.
+    Trip fields of a request payload with the prompt defaults applied.
     payload is expected to contain keys like:
       - destination, duration, budget, group_size, travel_style, accommodation, interests, start_date
     """
@@ -162,19 +161,41 @@ def build_itinerary_prompt(payload: dict) -> str:
     interests = payload.get("interests", [])
     interests_str = ", ".join(interests) if isinstance(interests, (list, tuple)) else str(interests)
     start_date = payload.get("start_date", datetime.now().strftime("%Y-%m-%d"))
+    return {
+        "destination": destination,
+        "duration": duration,
+        "budget_display": budget_display,
+        "group_size": group_size,
+        "travel_style": travel_style,
+        "accommodation": accommodation,
+        "interests": interests_str,
+        "start_date": start_date,
+    }
+
+
+def trip_details_block(trip: dict) -> str:
+    """The "User trip details" lines shared by every itinerary prompt."""
+    return f"""User trip details:
+- Destination: {trip["destination"]}
+- Start Date: {trip["start_date"]}
+- Duration (days): {trip["duration"]}
+- Group Size: {trip["group_size"]}
+- Budget (per person, INR approx): ₹{trip["budget_display"]}
+- Travel Style: {trip["travel_style"]}
+- Accommodation Type: {trip["accommodation"]}
+- Interests: {trip["interests"]}"""
+
+
+def build_itinerary_prompt(payload: dict) -> str:
+    """Build a detailed, structured prompt for the AI model (see ``trip_details`` for the payload keys)."""
+    trip = trip_details(payload)
+    destination, duration, start_date = trip["destination"], trip["duration"], trip["start_date"]
+    group_size, budget_display = trip["group_size"], trip["budget_display"]
 
     prompt = f"""
 You are TravelSensei — an expert travel planner. Create a realistic, local-aware, day-by-day itinerary in JSON format.
 
-User trip details:
-- Destination: {destination}
-- Start Date: {start_date}
-- Duration (days): {duration}
-- Group Size: {group_size}
-- Budget (per person, INR approx): ₹{budget_display}
-- Travel Style: {travel_style}
-- Accommodation Type: {accommodation}
-- Interests: {interests_str}
+{trip_details_block(trip)}
 
 Requirements & formatting rules:
 1. Output MUST be valid JSON only (no explanation before/after).
@@ -221,30 +242,27 @@ Example output schema (strict JSON):
     return prompt.strip()
 
 
-def _parse_json_from_text(text: str) -> dict:
-    """Try to extract and parse JSON from arbitrary model text."""
-    text = text.strip()
-    # Quick try: direct load
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-
-    # Attempt to locate first { ... } block
-        start = text.find("{")
-        end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        candidate = text[start:end+1]
-        try:
-            return json.loads(candidate)
-        except Exception:
-            # try to fix common trailing commas
-            candidate_fixed = candidate.replace(",}", "}").replace(",]", "]")
-            try:
-                return json.loads(candidate_fixed)
-            except Exception:
-                logger.exception("Failed to parse JSON from candidate")
-    raise ValueError("Could not parse JSON from model output")
+def _resolve_model(model: str = None) -> str:
+    # Use a valid default for Gemini, fallback to OpenAI model for OpenAI
+    if MODEL_PROVIDER == "gemini":
+        return model or os.getenv("AI_MODEL", "gemini-2.5-flash")
+    return model or os.getenv("AI_MODEL", "gpt-4o-mini")
+
+
+def _ai_available() -> bool:
+    return _llm is not None
+
+
+def _messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": "You are TravelSensei, an expert travel planner."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def provider_stats():
+    """Request, latency and hedging counters of the provider client, or None without one."""
+    return _llm.stats() if _llm is not None else None
 
 
 def generate_ai_itinerary(payload: dict, model: str = None, temperature: float = 0.75) -> dict:
@@ -253,62 +271,169 @@ def generate_ai_itinerary(payload: dict, model: str = None, temperature: float =
     Returns a Python dict matching the schema described in the prompt.
     """
     prompt = build_itinerary_prompt(payload)
-    # Use a valid default for Gemini, fallback to OpenAI model for OpenAI
-    if MODEL_PROVIDER == "gemini":
-        model_to_use = model or os.getenv("AI_MODEL", "gemini-2.5-flash")
-    else:
-        model_to_use = model or os.getenv("AI_MODEL", "gpt-4o-mini")
+    model_to_use = _resolve_model(model)
 
     logger.info("Generating AI itinerary for %s (%s days) using provider=%s model=%s",
                 payload.get("destination"), payload.get("duration_days"), MODEL_PROVIDER, model_to_use)
 
-    # Use OpenAI if selected
-    if MODEL_PROVIDER == "openai" and _openai_client is not None:
-        try:
-            resp = _openai_client.chat.completions.create(
-                model=model_to_use,
-                messages=[
-                    {"role": "system", "content": "You are TravelSensei, an expert travel planner."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=1400
-            )
-            content = resp.choices[0].message.content
-            parsed = _parse_json_from_text(content)
-            return parsed
-        except Exception as e:
-            logger.exception("OpenAI call failed: %s", e)
-            raise
-
-    # Use Gemini if selected
-    if MODEL_PROVIDER == "gemini" and _genai is not None:
-        try:
-            model = _genai.GenerativeModel(model_to_use)
-            gen_response = model.generate_content(prompt)
-            # Log the raw Gemini response for debugging
-            logger.info("[Gemini] Raw response object: %r", gen_response)
-            content = gen_response.text if hasattr(gen_response, "text") else str(gen_response)
-            logger.info("[Gemini] Raw response text: %s", content)
-            parsed = _parse_json_from_text(content)
-            logger.info("[Gemini] Parsed response: %r", parsed)
-            # Attach hotel recommendations if missing
-            if 'hotels' not in parsed and 'recommended_hotels' not in parsed:
-                from services.itinerary_ai_enhanced import EnhancedItineraryAI
-                ai = EnhancedItineraryAI()
-                dest = payload.get('destination')
-                duration = int(payload.get('duration_days', 3))
-                budget = int(payload.get('budget', 1000))
-                hotels = ai._get_smart_hotel_recommendations({'full_name': dest}, duration, budget, 'hotel')
-                parsed['recommended_hotels'] = hotels
-            return parsed
-        except Exception as e:
-            logger.exception("Gemini call failed: %s", e)
-            raise
-
-    # Fallback: simple rule-based generator if no AI configured
-    logger.warning("No AI client available, using lightweight fallback generator.")
-    return _fallback_itinerary(payload)
+    if not _ai_available():
+        # Fallback: simple rule-based generator if no AI configured
+        logger.warning("No AI client available, using lightweight fallback generator.")
+        return _fallback_itinerary(payload)
+
+    cached = llm_cache.get(prompt, MODEL_PROVIDER, model_to_use, temperature)
+    if cached is not None:
+        logger.info("Serving cached AI itinerary for %s (model=%s)", payload.get("destination"), model_to_use)
+        return cached
+
+    def published():
+        return llm_cache.get(prompt, MODEL_PROVIDER, model_to_use, temperature, record=False)
+
+    def generate():
+        # A caller that finished just before this flight started may already have cached the response
+        parsed = published()
+        if parsed is None:
+            complete = True
+            if should_chunk(trip_details(payload)["duration"]):
+                parsed, complete = _generate_chunked(payload, model_to_use, temperature)
+            else:
+                parsed = _call_provider(prompt, payload, model_to_use, temperature)
+                complete = _has_all_days(parsed, payload)
+            # Days filled in from the outline or lost to truncation are not worth replaying for a day
+            if complete:
+                llm_cache.set(prompt, MODEL_PROVIDER, model_to_use, temperature, parsed)
+        return parsed
+
+    # Identical concurrent requests share one provider call
+    key = llm_cache.key(prompt, MODEL_PROVIDER, model_to_use, temperature)
+    parsed, shared = generation_flight.do(key, generate, lookup=published)
+    if shared:
+        logger.info("Shared an in-flight AI itinerary for %s (model=%s)", payload.get("destination"), model_to_use)
+    return parsed
+
+
+def _has_all_days(parsed: dict, payload: dict) -> bool:
+    """Whether the model wrote every requested day; output cut off at ``max_tokens`` is recovered without its tail."""
+    written, requested = len(parsed.get("days") or []), trip_details(payload)["duration"]
+    if written < requested:
+        logger.warning("AI itinerary for %s has %d of %d days (output truncated), not caching it",
+                       payload.get("destination"), written, requested)
+        return False
+    return True
+
+
+def _call_provider(prompt: str, payload: dict, model_to_use: str, temperature: float) -> dict:
+    """One (possibly hedged) OpenAI or Gemini call for ``prompt``, parsed into a dict."""
+    try:
+        # An answer that does not parse loses to a hedged request that does
+        parsed = _llm.complete(_messages(prompt), model_to_use, temperature, max_tokens=1400,
+                               validate=parse_model_json)
+    except Exception as e:
+        logger.exception("%s call failed: %s", MODEL_PROVIDER, e)
+        raise
+    if MODEL_PROVIDER == "gemini":
+        parsed = _attach_hotels(parsed, payload)
+    return parsed
+
+
+def _iter_chunked(payload: dict, model_to_use: str, temperature: float) -> Iterator[Tuple[str, dict]]:
+    """Long trips: skeleton plus concurrently generated day ranges (see services/itinerary_chunks.py)."""
+    trip = trip_details(payload)
+
+    def complete(prompt: str, max_tokens: int) -> dict:
+        return _llm.complete(_messages(prompt), model_to_use, temperature, max_tokens=max_tokens,
+                             validate=parse_model_json)
+
+    try:
+        for event, value in iter_chunked_itinerary(trip, trip_details_block(trip), complete):
+            if event == "day":
+                # Merging dropped repeated activities; rebuild the day's locations (same dict as in the itinerary)
+                value = normalize_day(value, value["day"])
+            elif event == "itinerary" and MODEL_PROVIDER == "gemini":
+                value = _attach_hotels(value, payload)
+            yield event, value
+    except Exception as e:
+        logger.exception("%s chunked generation failed: %s", MODEL_PROVIDER, e)
+        raise
+
+
+def _generate_chunked(payload: dict, model_to_use: str, temperature: float) -> Tuple[dict, bool]:
+    """The merged itinerary, and whether every day came from the model rather than the outline."""
+    complete = True
+    for event, value in _iter_chunked(payload, model_to_use, temperature):
+        if event == "degraded":
+            complete = False
+        elif event == "itinerary":
+            return value, complete
+    raise ValueError("Chunked generation finished without an itinerary")
+
+
+def _attach_hotels(parsed: dict, payload: dict) -> dict:
+    """Attach hotel recommendations to a Gemini itinerary if missing"""
+    if 'hotels' not in parsed and 'recommended_hotels' not in parsed:
+        from services.itinerary_ai_enhanced import EnhancedItineraryAI
+        ai = EnhancedItineraryAI()
+        dest = payload.get('destination')
+        duration = int(payload.get('duration_days', 3))
+        budget = int(payload.get('budget', 1000))
+        hotels = ai._get_smart_hotel_recommendations({'full_name': dest}, duration, budget, 'hotel')
+        parsed['recommended_hotels'] = hotels
+    return parsed
+
+
+def stream_ai_itinerary(payload: dict, model: str = None, temperature: float = 0.75) -> Iterator[Tuple[str, dict]]:
+    """
+    Streaming variant of ``generate_ai_itinerary``.
+    Yields ('day', day) for each day as soon as the model finishes writing it, then
+    ('itinerary', itinerary) with the complete parsed response (days included).
+    """
+    prompt = build_itinerary_prompt(payload)
+    model_to_use = _resolve_model(model)
+    logger.info("Streaming AI itinerary for %s (%s days) using provider=%s model=%s",
+                payload.get("destination"), payload.get("duration_days"), MODEL_PROVIDER, model_to_use)
+
+    if not _ai_available():
+        logger.warning("No AI client available, using lightweight fallback generator.")
+        itinerary = _fallback_itinerary(payload)
+    else:
+        itinerary = llm_cache.get(prompt, MODEL_PROVIDER, model_to_use, temperature)
+    if itinerary is not None:
+        for day in itinerary.get("days") or []:
+            yield "day", day
+        yield "itinerary", itinerary
+        return
+
+    if should_chunk(trip_details(payload)["duration"]):
+        complete = True
+        for event, value in _iter_chunked(payload, model_to_use, temperature):
+            if event == "degraded":
+                complete = False
+                continue
+            if event == "itinerary" and complete:
+                llm_cache.set(prompt, MODEL_PROVIDER, model_to_use, temperature, value)
+            yield event, value
+        return
+
+    parser = DaysStreamParser("days")
+    try:
+        for chunk in _llm.stream(_messages(prompt), model_to_use, temperature, max_tokens=1400):
+            for position, day in parser.feed_indexed(chunk):
+                yield "day", normalize_day(day, position + 1)
+    except Exception as e:
+        logger.exception("%s streaming call failed: %s", MODEL_PROVIDER, e)
+        raise
+
+    parsed = parse_model_json(parser.text)
+    # Days the incremental parser could not decode on their own
+    days = parsed.get("days") or []
+    for index in parser.skipped + list(range(parser.elements, len(days))):
+        if index < len(days):
+            yield "day", days[index]
+    if MODEL_PROVIDER == "gemini":
+        parsed = _attach_hotels(parsed, payload)
+    if _has_all_days(parsed, payload):
+        llm_cache.set(prompt, MODEL_PROVIDER, model_to_use, temperature, parsed)
+    yield "itinerary", parsed
 
 
 def _fallback_itinerary(payload: dict) -> dict:
@@ -332,7 +457,7 @@ def _fallback_itinerary(payload: dict) -> dict:
             ],
             "food_suggestion": "Try local speciality"
         })
-    return {
+    return normalize_days({
         "destination": destination,
         "start_date": start_date,
         "duration_days": duration,
@@ -342,4 +467,4 @@ def _fallback_itinerary(payload: dict) -> dict:
         "days": days,
         "travel_tips": ["Carry ID", "Keep cash for local markets"],
         "estimated_total_cost": int(duration * 2000)
-    }
+    })
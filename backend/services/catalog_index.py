@@ -0,0 +1,136 @@
+"""
+services/catalog_index.py
+Name-to-row index over the destination and activity catalogs.
+
+Built once when a catalog is loaded so that itinerary generation can look up
+destinations and their activities in O(1) without allocating boolean masks
+or intermediate DataFrames on every call.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+_EMPTY_ROWS.setflags(write=False)
+
+
+class CatalogIndex:
+    """Row positions, records and per-destination activity slices for one catalog"""
+
+    def __init__(self, destinations_df: pd.DataFrame, activities_df: pd.DataFrame):
+        self.destination_names: List[str] = destinations_df['name'].tolist()
+        self.destination_positions: Dict[str, int] = {
+            name: position for position, name in enumerate(self.destination_names)
+        }
+        self.destination_records: List[Dict] = destinations_df.to_dict('records')
+        self.latitudes = np.ascontiguousarray(destinations_df['latitude'].to_numpy(dtype=np.float64))
+        self.longitudes = np.ascontiguousarray(destinations_df['longitude'].to_numpy(dtype=np.float64))
+        self.recommended_durations = np.ascontiguousarray(
+            destinations_df['recommended_duration'].to_numpy(dtype=np.int64)
+        )
+
+        self.activity_records: List[Dict] = activities_df.to_dict('records')
+
+        # Group activity rows by destination: rows of destination i are
+        # activity_order[activity_offsets[i]:activity_offsets[i + 1]]
+        codes = np.fromiter(
+            (self.destination_positions.get(location, -1) for location in activities_df['location']),
+            dtype=np.int64, count=len(activities_df)
+        )
+        order = np.argsort(codes, kind='stable')
+        unmatched = int((codes < 0).sum())
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.destination_names))
+        self.activity_order = np.ascontiguousarray(order[unmatched:])
+        self.activity_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.activity_order.setflags(write=False)
+
+    def destination_position(self, name: str) -> Optional[int]:
+        return self.destination_positions.get(name)
+
+    def destination(self, name: str) -> Optional[Dict]:
+        """Destination record (column -> value) or None if unknown."""
+        position = self.destination_positions.get(name)
+        return None if position is None else self.destination_records[position]
+
+    def coordinates(self, name: str) -> Optional[Dict]:
+        position = self.destination_positions.get(name)
+        if position is None:
+            return None
+        return {'lat': float(self.latitudes[position]), 'lng': float(self.longitudes[position])}
+
+    def recommended_duration(self, name: str) -> Optional[int]:
+        position = self.destination_positions.get(name)
+        return None if position is None else int(self.recommended_durations[position])
+
+    def activity_rows(self, name: str) -> np.ndarray:
+        """Read-only array of activity row positions located at ``name`` (empty if none)."""
+        position = self.destination_positions.get(name)
+        if position is None:
+            return _EMPTY_ROWS
+        return self.activity_order[self.activity_offsets[position]:self.activity_offsets[position + 1]]
+
+
+class ScoredActivity:
+    """Lightweight activity record carrying its per-request preference score"""
+    __slots__ = ('name', 'description', 'category', 'duration', 'cost', 'rating', 'time_slot', 'score')
+
+    def __init__(self, record: Dict, score: float):
+        self.name = record['name']
+        self.description = record['description']
+        self.category = record['category']
+        self.duration = record['duration']
+        self.cost = record['cost']
+        self.rating = record['rating']
+        self.time_slot = record['time_slot']
+        self.score = score
+
+
+class ActivityGroups:
+    """
+    Per-destination activity candidates ranked by one request's similarity vector.
+    Each destination is ranked at most once per request, using argpartition to
+    pull only the top ``top_k`` rows unless a caller needs to look deeper.
+    """
+
+    def __init__(self, catalog: CatalogIndex, scores: np.ndarray, top_k: int = 12):
+        self.catalog = catalog
+        self.scores = scores
+        self.top_k = top_k
+        self._ranked: Dict[str, List[ScoredActivity]] = {}
+        self._complete: Dict[str, bool] = {}
+
+    def ranked(self, destination: str, complete: bool = False) -> List[ScoredActivity]:
+        """Candidates for ``destination`` in descending score order (top-k unless ``complete``)."""
+        cached = self._ranked.get(destination)
+        if cached is not None and (self._complete[destination] or not complete):
+            return cached
+
+        rows = self.catalog.activity_rows(destination)
+        dest_scores = self.scores[rows]
+        k = len(rows) if complete else min(self.top_k, len(rows))
+        if k < len(rows):
+            top = np.argpartition(-dest_scores, k - 1)[:k]
+            top = top[np.argsort(-dest_scores[top], kind='stable')]
+        else:
+            top = np.argsort(-dest_scores, kind='stable')
+
+        records = self.catalog.activity_records
+        ranked = [ScoredActivity(records[rows[i]], float(dest_scores[i])) for i in top]
+        self._ranked[destination] = ranked
+        self._complete[destination] = k == len(rows)
+        return ranked
+
+    def is_complete(self, destination: str) -> bool:
+        return self._complete.get(destination, False)
+
+    def top(self, n: int) -> List[ScoredActivity]:
+        """The ``n`` best-scoring activities across all destinations, best first."""
+        n = min(n, len(self.scores))
+        if n <= 0:
+            return []
+        top = np.argpartition(-self.scores, n - 1)[:n]
+        top = top[np.argsort(-self.scores[top], kind='stable')]
+        records = self.catalog.activity_records
+        return [ScoredActivity(records[i], float(self.scores[i])) for i in top]
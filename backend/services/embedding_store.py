@@ -0,0 +1,315 @@
+"""
+services/embedding_store.py
+Persistent, content-addressed store for precomputed catalog embeddings.
+
+Embedding matrices are keyed by a hash of the model name and the catalog texts,
+written once as ``.npy`` files (plus a small JSON manifest) and opened
+memory-mapped afterwards, so restarts and sibling uvicorn workers share the
+same read-only pages instead of re-encoding the catalog. Each artifact also
+records a hash per entry, so a rebuild after a catalog edit only encodes the
+entries whose text changed.
+
+Artifacts can be built ahead of deploys for every known region:
+    python -m services.embedding_store build [--region kerala] [--batch-size 256] [--prune]
+    python -m services.embedding_store list
+"""
+
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "AI_EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "embeddings"),
+)
+
+
+# Version of the artifact layout (manifest fields and the per-entry key file)
+ARTIFACT_VERSION = 2
+
+DEFAULT_BATCH_SIZE = 64
+
+
+def catalog_hash(texts: Sequence[str], model_name: str) -> str:
+    """Stable content hash of a catalog for a given embedding model."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    for text in texts:
+        encoded = (text or "").encode("utf-8")
+        # Length-prefix every entry so ["ab", "c"] and ["a", "bc"] differ
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def entry_keys(texts: Sequence[str]) -> np.ndarray:
+    """64-bit content hash per text, used to reuse rows of earlier artifacts."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b((text or "").encode("utf-8"), digest_size=8).digest(), "little")
+         for text in texts),
+        dtype=np.uint64, count=len(texts),
+    )
+
+
+def _model_slug(model_name: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in model_name)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so cosine similarity becomes a plain dot product."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def save_npy_atomic(path: str, array: np.ndarray):
+    """Write ``array`` to ``path`` via a temp file and rename, so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy.tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            np.save(fh, array)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class EmbeddingStore:
+    """Build-once, load-many store of L2-normalized float32 embedding matrices."""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+
+    def artifact_path(self, namespace: str, model_name: str, digest: str) -> str:
+        """Path of the ``.npy`` artifact for a namespace/model/catalog hash."""
+        filename = f"{namespace}__{_model_slug(model_name)}__{digest[:16]}.npy"
+        return os.path.join(self.cache_dir, filename)
+
+    def load(self, namespace: str, texts: Sequence[str], model_name: str) -> Optional[np.ndarray]:
+        """Open a previously built matrix memory-mapped, or return None."""
+        digest = catalog_hash(texts, model_name)
+        path = self.artifact_path(namespace, model_name, digest)
+        manifest = self._read_manifest(path)
+        if manifest is None or manifest.get("catalog_hash") != digest:
+            return None
+        try:
+            matrix = np.load(path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable embedding artifact %s: %s", path, e)
+            return None
+        if matrix.ndim != 2 or matrix.shape[0] != len(texts):
+            logger.warning("Ignoring embedding artifact %s with unexpected shape %s", path, matrix.shape)
+            return None
+        return matrix
+
+    def load_or_build(self, namespace: str, texts: Sequence[str], model_name: str,
+                      encode_fn: Callable[[List[str]], np.ndarray],
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+        """
+        Return the embedding matrix for ``texts``, encoding and persisting it on a miss.
+        The returned array is read-only (memory-mapped when it came from disk).
+        """
+        return self.build(namespace, texts, model_name, encode_fn, batch_size)[0]
+
+    def build(self, namespace: str, texts: Sequence[str], model_name: str,
+              encode_fn: Callable[[List[str]], np.ndarray],
+              batch_size: int = DEFAULT_BATCH_SIZE) -> Tuple[np.ndarray, Dict]:
+        """
+        ``load_or_build`` plus a report of what was done. On a miss, rows for texts already
+        embedded by an earlier artifact of the same namespace and model are copied over and
+        only new or changed texts go through ``encode_fn``, deduplicated, in ``batch_size`` chunks.
+        """
+        matrix = self.load(namespace, texts, model_name)
+        if matrix is not None:
+            logger.info("Loaded %d precomputed %s embeddings from cache", matrix.shape[0], namespace)
+            return matrix, {'namespace': namespace, 'count': int(matrix.shape[0]), 'status': 'cached',
+                            'reused': int(matrix.shape[0]), 'encoded': 0}
+
+        started = time.perf_counter()
+        texts = list(texts)
+        keys = entry_keys(texts)
+        matrix, reused = self._reuse_rows(namespace, model_name, keys)
+
+        missing = [row for row in range(len(texts)) if not reused[row]]
+        unique_texts = list(dict.fromkeys(texts[row] for row in missing))
+        logger.info("Encoding %d of %d %s descriptions (%d reused from earlier artifacts)...",
+                    len(unique_texts), len(texts), namespace, len(texts) - len(missing))
+        if unique_texts:
+            batches = [encode_fn(unique_texts[i:i + batch_size]) for i in range(0, len(unique_texts), batch_size)]
+            encoded = normalize_rows(np.concatenate(batches, axis=0))
+            if matrix is None:
+                matrix = np.zeros((len(texts), encoded.shape[1]), dtype=np.float32)
+            position = {text: index for index, text in enumerate(unique_texts)}
+            matrix[missing] = encoded[[position[texts[row]] for row in missing]]
+        elif matrix is None:
+            matrix = np.zeros((0, 0), np.float32)
+
+        digest = catalog_hash(texts, model_name)
+        path = self.artifact_path(namespace, model_name, digest)
+        report = {
+            'namespace': namespace,
+            'count': len(texts),
+            'status': 'built',
+            'reused': len(texts) - len(missing),
+            'encoded': len(unique_texts),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        try:
+            self._write(path, matrix, {
+                "version": ARTIFACT_VERSION,
+                "namespace": namespace,
+                "model_name": model_name,
+                "catalog_hash": digest,
+                "count": int(matrix.shape[0]),
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "reused": report['reused'],
+                "encoded": report['encoded'],
+            }, keys)
+            return np.load(path, mmap_mode="r"), report
+        except OSError as e:
+            logger.warning("Could not persist %s embeddings to %s: %s", namespace, path, e)
+            matrix.setflags(write=False)
+            return matrix, {**report, 'status': 'memory-only'}
+
+    def _artifacts(self, namespace: str, model_name: str) -> List[str]:
+        """Artifact paths of ``namespace``/``model_name``, newest first."""
+        pattern = os.path.join(glob.escape(self.cache_dir), f"{glob.escape(namespace)}__{glob.escape(_model_slug(model_name))}__*.npy")
+        paths = [path for path in glob.glob(pattern) if not path.endswith(".keys.npy")]
+        return sorted(paths, key=lambda path: os.path.getmtime(path), reverse=True)
+
+    def _reuse_rows(self, namespace: str, model_name: str,
+                    keys: np.ndarray) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """Matrix pre-filled from the newest earlier artifact with per-entry keys, and a mask of filled rows."""
+        reused = np.zeros(len(keys), dtype=bool)
+        for path in self._artifacts(namespace, model_name):
+            manifest = self._read_manifest(path)
+            if manifest is None or manifest.get("model_name") != model_name or manifest.get("version") != ARTIFACT_VERSION:
+                continue
+            try:
+                previous = np.load(path, mmap_mode="r")
+                previous_keys = np.load(self._keys_path(path))
+            except (OSError, ValueError):
+                continue
+            if previous.ndim != 2 or previous.shape[0] != previous_keys.shape[0] or not len(previous_keys):
+                continue
+            order = np.argsort(previous_keys, kind="stable")
+            sorted_keys = previous_keys[order]
+            slots = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+            reused = sorted_keys[slots] == keys
+            matrix = np.zeros((len(keys), previous.shape[1]), dtype=np.float32)
+            matrix[reused] = previous[order[slots[reused]]]
+            return matrix, reused
+        return None, reused
+
+    def _write(self, path: str, matrix: np.ndarray, manifest: Dict, keys: Optional[np.ndarray] = None):
+        """Write artifact and manifest atomically so concurrent workers never see partial files."""
+        save_npy_atomic(path, matrix)
+        if keys is not None:
+            save_npy_atomic(self._keys_path(path), keys)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".json.tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(manifest, fh)
+        os.replace(tmp_path, self._manifest_path(path))
+
+    @staticmethod
+    def _manifest_path(path: str) -> str:
+        return path[:-len(".npy")] + ".json"
+
+    @staticmethod
+    def _keys_path(path: str) -> str:
+        return path[:-len(".npy")] + ".keys.npy"
+
+    def manifests(self) -> List[Dict]:
+        """Manifests of every artifact in the store, with their paths."""
+        entries = []
+        for path in sorted(glob.glob(os.path.join(glob.escape(self.cache_dir), "*.npy"))):
+            if path.endswith(".keys.npy"):
+                continue
+            manifest = self._read_manifest(path)
+            if manifest is not None:
+                entries.append({**manifest, 'path': path})
+        return entries
+
+    def prune(self, namespace: str, model_name: str, keep: Sequence[str]) -> List[str]:
+        """Delete artifacts of ``namespace``/``model_name`` other than the paths in ``keep``."""
+        removed = []
+        for path in self._artifacts(namespace, model_name):
+            if path in keep:
+                continue
+            for stale in (path, self._manifest_path(path), self._keys_path(path)):
+                if os.path.exists(stale):
+                    os.unlink(stale)
+            removed.append(path)
+        return removed
+
+    def _read_manifest(self, path: str) -> Optional[Dict]:
+        try:
+            with open(self._manifest_path(path)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from ai_itinerary_service import EMBEDDING_MODEL_KEY, ai_itinerary_service, embedding_jobs, register_builtin_regions
+    from services.region_catalog import DEFAULT_CATALOG_DIR, RegionCatalog, normalize_region
+
+    parser = argparse.ArgumentParser(description="Build catalog embedding artifacts ahead of serving")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--catalog-dir", default=DEFAULT_CATALOG_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Encode every known region's catalogs, reusing unchanged entries")
+    build.add_argument("--region", action="append", help="Only these regions (repeatable; default: all)")
+    build.add_argument("--batch-size", type=int, default=256)
+    build.add_argument("--prune", action="store_true", help="Delete superseded artifacts of the built namespaces")
+    commands.add_parser("list", help="List stored artifacts")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    store = EmbeddingStore(args.cache_dir)
+    if args.command == "list":
+        for manifest in store.manifests():
+            print(f"{manifest.get('namespace')}  {manifest.get('model_name')}  {manifest.get('count')}x{manifest.get('dim')}  "
+                  f"{manifest.get('catalog_hash', '')[:16]}  v{manifest.get('version', 1)}  {manifest.get('created_at', '')}")
+        return 0
+
+    catalog = RegionCatalog(args.catalog_dir)
+    register_builtin_regions(catalog)
+    regions = [normalize_region(region) for region in args.region] if args.region else catalog.available_regions()
+    unknown = [region for region in regions if not catalog.has_region(region)]
+    if unknown:
+        parser.error(f"Unknown regions: {', '.join(unknown)}")
+
+    model = ai_itinerary_service.sentence_model
+    encode_fn = lambda texts: model.encode(texts, batch_size=len(texts))
+    for region in regions:
+        destinations_df, activities_df = catalog.load_frames(region)
+        for namespace, texts in embedding_jobs(region, destinations_df, activities_df):
+            _, report = store.build(namespace, texts, EMBEDDING_MODEL_KEY, encode_fn, args.batch_size)
+            print(json.dumps(report))
+            if args.prune:
+                current = store.artifact_path(namespace, EMBEDDING_MODEL_KEY, catalog_hash(texts, EMBEDDING_MODEL_KEY))
+                for path in store.prune(namespace, EMBEDDING_MODEL_KEY, keep=[current]):
+                    logger.info("Removed superseded artifact %s", path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+services/generation_executor.py
+Runs CPU-bound itinerary work off the asyncio event loop.
+
+Requests are handed to a thread pool (default; the inference batcher then
+merges concurrent model calls) or to a process pool whose workers preload the
+models once. Admission is bounded: at most ``max_workers`` tasks run and
+``max_pending`` more may wait, beyond which callers get ``ExecutorSaturatedError``
+immediately. Every task has a timeout, and queue-wait and run times are tracked
+for the stats endpoint.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODE = os.getenv("AI_EXECUTOR_MODE", "thread").lower()
+DEFAULT_WORKERS = int(os.getenv("AI_EXECUTOR_WORKERS", "0")) or (os.cpu_count() or 1)
+DEFAULT_MAX_PENDING = int(os.getenv("AI_EXECUTOR_MAX_PENDING", "64"))
+DEFAULT_TIMEOUT_S = float(os.getenv("AI_GENERATION_TIMEOUT_S", "30"))
+
+# Number of recent samples kept for the wait/run time percentiles in stats()
+_SAMPLE_WINDOW = 1024
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """All workers are busy and the pending queue is full"""
+
+
+class GenerationTimeoutError(TimeoutError):
+    """A task did not finish within its timeout"""
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    # Runs in the worker; wall-clock start time lets the caller measure queue wait across processes
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return result, started_at, time.time()
+
+
+# Markers on the queue between a streaming task and its consumer
+_ITEM, _DONE, _ERROR = "item", "done", "error"
+
+
+def _drain_into(channel, fn: Callable, args: tuple, kwargs: dict):
+    # Runs in the worker: forwards every item of the generator ``fn`` to the consumer
+    started_at = time.time()
+    try:
+        for item in fn(*args, **kwargs):
+            channel.put((_ITEM, item))
+    except Exception as e:
+        channel.put((_ERROR, f"{type(e).__name__}: {e}"))
+    else:
+        channel.put((_DONE, None))
+    return None, started_at, time.time()
+
+
+class _LoopChannel:
+    """Thread-to-event-loop queue: worker threads put, the loop awaits without blocking a thread"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, item):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    async def get(self, timeout: float):
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            raise queue.Empty
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+
+class StreamTaskError(RuntimeError):
+    """A streaming task raised inside the worker"""
+
+
+class GenerationExecutor:
+    """Bounded thread/process pool with queue-wait metrics and per-task timeouts"""
+
+    def __init__(self, mode: Optional[str] = None, max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, timeout_s: Optional[float] = None,
+                 initializer: Optional[Callable[[], Any]] = None):
+        self.mode = (mode or DEFAULT_MODE).lower()
+        if self.mode not in ("thread", "process"):
+            raise ValueError(f"Unknown executor mode: {self.mode}")
+        self.max_workers = max(1, max_workers or DEFAULT_WORKERS)
+        self.max_pending = max(0, DEFAULT_MAX_PENDING if max_pending is None else max_pending)
+        self.timeout_s = DEFAULT_TIMEOUT_S if timeout_s is None else timeout_s
+        self.initializer = initializer
+
+        self._pool = None
+        self._manager = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._wait_samples = deque(maxlen=_SAMPLE_WINDOW)
+        self._run_samples = deque(maxlen=_SAMPLE_WINDOW)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                if self.mode == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="generation",
+                                                    initializer=self.initializer)
+                logger.info("Started %s generation pool with %d workers", self.mode, self.max_workers)
+            return self._pool
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and await its result.
+        In process mode ``fn`` and its arguments must be picklable (module-level functions).
+        """
+        with self._stats_lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self._rejected += 1
+                raise ExecutorSaturatedError(
+                    f"Generation queue is full ({self._in_flight} requests in flight)"
+                )
+            self._in_flight += 1
+            self._submitted += 1
+
+        submitted_at = time.time()
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._get_pool(), functools.partial(_timed_call, fn, args, kwargs))
+        except Exception:
+            self._release(None)
+            raise
+        # A slot is only freed when the task really ends, even if its caller timed out earlier
+        future.add_done_callback(self._release)
+        timeout = self.timeout_s if timeout is None else timeout
+        try:
+            result, started_at, finished_at = await asyncio.wait_for(asyncio.shield(future), timeout=timeout or None)
+        except asyncio.TimeoutError:
+            # The worker keeps running the task; only the caller stops waiting for it
+            with self._stats_lock:
+                self._timeouts += 1
+            raise GenerationTimeoutError(f"Generation did not finish within {timeout:.1f}s")
+        except Exception:
+            with self._stats_lock:
+                self._errors += 1
+            raise
+
+        with self._stats_lock:
+            self._completed += 1
+            self._wait_samples.append(max(0.0, started_at - submitted_at))
+            self._run_samples.append(finished_at - started_at)
+        return result
+
+    def _channel(self, loop: asyncio.AbstractEventLoop):
+        """Queue a worker can write to: loop-bound for threads, a manager proxy for processes"""
+        if self.mode != "process":
+            return _LoopChannel(loop)
+        with self._pool_lock:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+            return self._manager.Queue()
+
+    async def stream(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        Run the generator function ``fn(*args, **kwargs)`` on the pool and yield its items
+        as they are produced. Admission, timeout (for the whole stream) and metrics work
+        as in ``run``.
+        """
+        loop = asyncio.get_running_loop()
+        channel = self._channel(loop)
+        submission = asyncio.ensure_future(self.run(_drain_into, channel, fn, args, kwargs, timeout=timeout))
+        timeout = self.timeout_s if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise GenerationTimeoutError(f"Generation did not finish within {timeout:.1f}s")
+                # Wait in short slices so admission errors from ``run`` surface promptly
+                wait = min(0.25, remaining or 0.25)
+                try:
+                    if isinstance(channel, _LoopChannel):
+                        kind, payload = await channel.get(wait)
+                    else:
+                        kind, payload = await loop.run_in_executor(None, functools.partial(channel.get, True, wait))
+                except queue.Empty:
+                    if submission.done():
+                        submission.result()  # re-raises saturation, timeouts and pool errors
+                        if channel.empty():
+                            return
+                    continue
+                if kind == _ITEM:
+                    yield payload
+                elif kind == _ERROR:
+                    raise StreamTaskError(payload)
+                else:
+                    break
+            await submission
+        finally:
+            if not submission.done():
+                submission.cancel()
+
+    def _release(self, _future):
+        with self._stats_lock:
+            self._in_flight -= 1
+
+    def shutdown(self, wait: bool = True):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+    @staticmethod
+    def _summarize(samples) -> Dict:
+        if not samples:
+            return {'count': 0, 'avg_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        values = np.fromiter(samples, dtype=np.float64) * 1000.0
+        return {
+            'count': int(values.size),
+            'avg_ms': round(float(values.mean()), 2),
+            'p50_ms': round(float(np.percentile(values, 50)), 2),
+            'p95_ms': round(float(np.percentile(values, 95)), 2),
+            'max_ms': round(float(values.max()), 2),
+        }
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            waits = list(self._wait_samples)
+            runs = list(self._run_samples)
+            return {
+                'mode': self.mode,
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'timeout_s': self.timeout_s,
+                'in_flight': self._in_flight,
+                'queued': max(0, self._in_flight - self.max_workers),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'errors': self._errors,
+                'queue_wait': self._summarize(waits),
+                'run_time': self._summarize(runs),
+            }
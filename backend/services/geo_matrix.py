@@ -0,0 +1,132 @@
+"""
+services/geo_matrix.py
+Vectorized distance, travel-time and cost matrices for route optimization.
+
+Distances use the haversine formula on WGS84 reduced latitudes plus
+Lambert's flattening correction, which stays within metres of geodesic
+(Vincenty) distances for trip-scale legs at NumPy speed.
+Matrices are contiguous float32 arrays and can optionally be cached on disk
+and reopened memory-mapped.
+"""
+
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.embedding_store import save_npy_atomic
+
+logger = logging.getLogger(__name__)
+
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+# Rows computed per block, bounding float64 scratch memory for large catalogs
+_BLOCK_ROWS = 512
+
+
+def geodesic_distance_matrix(latitudes: Sequence[float], longitudes: Sequence[float]) -> np.ndarray:
+    """Pairwise ellipsoidal distances in kilometres as a contiguous float32 (n, n) matrix."""
+    # Haversine on reduced latitudes, then Lambert's flattening correction
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    beta = np.arctan((1.0 - WGS84_F) * np.tan(lat))
+    cos_beta = np.cos(beta)
+    n = lat.shape[0]
+    distances = np.empty((n, n), dtype=np.float32)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, n, _BLOCK_ROWS):
+            rows = slice(start, min(start + _BLOCK_ROWS, n))
+            dbeta = beta[None, :] - beta[rows, None]
+            dlon = lon[None, :] - lon[rows, None]
+            h = np.sin(dbeta / 2.0) ** 2 + cos_beta[rows, None] * cos_beta[None, :] * np.sin(dlon / 2.0) ** 2
+            sigma = 2.0 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+            p = (beta[rows, None] + beta[None, :]) / 2.0
+            q = dbeta / 2.0
+            x = (sigma - np.sin(sigma)) * (np.sin(p) * np.cos(q)) ** 2 / np.cos(sigma / 2.0) ** 2
+            y = (sigma + np.sin(sigma)) * (np.cos(p) * np.sin(q)) ** 2 / np.sin(sigma / 2.0) ** 2
+            block = WGS84_A_KM * (sigma - WGS84_F / 2.0 * (x + y))
+            distances[rows] = np.where(sigma > 0.0, block, 0.0)
+
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+
+@dataclass
+class RouteMatrices:
+    """Distance (km), travel-time (hours) and cost matrices indexed by destination name"""
+    names: List[str]
+    distance: np.ndarray
+    travel_time: np.ndarray
+    cost: np.ndarray
+    index: Dict[str, int] = field(init=False)
+
+    def __post_init__(self):
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def positions(self, names: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.index[name] for name in names), dtype=np.int64, count=len(names))
+
+    def submatrix(self, names: Sequence[str], kind: str = 'cost') -> np.ndarray:
+        """Square sub-matrix of ``kind`` ('distance', 'travel_time' or 'cost') for ``names``."""
+        positions = self.positions(names)
+        return getattr(self, kind)[np.ix_(positions, positions)]
+
+    def leg(self, origin: str, destination: str) -> Optional[Dict[str, float]]:
+        """Distance, travel time and cost between two destinations, or None if either is unknown."""
+        i = self.index.get(origin)
+        j = self.index.get(destination)
+        if i is None or j is None:
+            return None
+        return {
+            'distance': float(self.distance[i, j]),
+            'travel_time': float(self.travel_time[i, j]),
+            'cost': float(self.cost[i, j]),
+        }
+
+
+def build_route_matrices(names: Sequence[str], latitudes: Sequence[float], longitudes: Sequence[float],
+                         speed_kmh: float, cost_per_km: float,
+                         cache_dir: Optional[str] = None) -> RouteMatrices:
+    """
+    Build distance/time/cost matrices for the given destinations.
+    When ``cache_dir`` is set the stacked matrices are persisted there keyed by
+    coordinates and parameters, and reopened memory-mapped on later builds.
+    """
+    names = list(names)
+    path = None
+    if cache_dir:
+        digest = hashlib.sha256()
+        digest.update(repr((names, speed_kmh, cost_per_km)).encode("utf-8"))
+        digest.update(np.asarray(latitudes, dtype=np.float64).tobytes())
+        digest.update(np.asarray(longitudes, dtype=np.float64).tobytes())
+        path = os.path.join(cache_dir, f"route_matrices__{digest.hexdigest()[:16]}.npy")
+        if os.path.exists(path):
+            try:
+                stacked = np.load(path, mmap_mode="r")
+                if stacked.shape == (3, len(names), len(names)):
+                    return RouteMatrices(names, stacked[0], stacked[1], stacked[2])
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable route matrix cache %s: %s", path, e)
+
+    distance = geodesic_distance_matrix(latitudes, longitudes)
+    travel_time = distance / np.float32(speed_kmh)
+    cost = distance * np.float32(cost_per_km)
+
+    if path:
+        stacked = np.stack((distance, travel_time, cost))
+        try:
+            save_npy_atomic(path, stacked)
+        except OSError as e:
+            logger.warning("Could not cache route matrices to %s: %s", path, e)
+        return RouteMatrices(names, stacked[0], stacked[1], stacked[2])
+
+    return RouteMatrices(names, distance, travel_time, cost)
@@ -0,0 +1,171 @@
+"""
+services/inference_batcher.py
+Micro-batching scheduler for model inference.
+
+Concurrent callers submit single texts; a background thread collects them for
+up to ``max_wait_ms`` or ``max_batch_size`` items, runs one batched forward pass
+and resolves each caller's future with its own row of the result. A text that
+arrives while nothing else is queued is dispatched at once, so sequential
+callers never pay the batching window.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets reported in stats()
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# Seconds a caller waits for its result before giving up, unless overridden per call
+DEFAULT_RESULT_TIMEOUT_S = float(os.getenv('AI_BATCH_TIMEOUT_S', '30'))
+
+
+class MicroBatcher:
+    """Collects concurrent single-item calls into batched calls of ``batch_fn``."""
+
+    def __init__(self, name: str, batch_fn: Callable[[List[Any]], Sequence[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._max_batch_seen = 0
+        self._busy_seconds = 0.0
+        self._histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item and return a future resolved with its result."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any, timeout: Optional[float] = DEFAULT_RESULT_TIMEOUT_S) -> Any:
+        return self.submit(item).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        # The worker is started lazily and restarted after fork, since threads do not survive it
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _run(self):
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            # Only hold the batch open when other callers are already waiting behind this one
+            deadline = time.perf_counter() + (self.max_wait if not pending.empty() else 0.0)
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: List[tuple]):
+        items = [item for item, _ in batch]
+        started = time.perf_counter()
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(items)} inputs")
+        except Exception as e:
+            logger.error("%s batch of %d failed: %s", self.name, len(items), e)
+            with self._lock:
+                self._errors += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._batches += 1
+            self._items += len(items)
+            self._busy_seconds += elapsed
+            self._max_batch_seen = max(self._max_batch_seen, len(items))
+            self._histogram[self._bucket(len(items))] += 1
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    @staticmethod
+    def _bucket(size: int) -> int:
+        for index, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                return index
+        return len(BATCH_SIZE_BUCKETS)
+
+    def stats(self) -> Dict:
+        """Queue depth and batch-size metrics for monitoring endpoints."""
+        with self._lock:
+            labels = [f"<={bound}" for bound in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+            return {
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'items': self._items,
+                'errors': self._errors,
+                'average_batch_size': round(self._items / self._batches, 2) if self._batches else 0,
+                'max_batch_size_seen': self._max_batch_seen,
+                'average_batch_latency_ms': round(1000 * self._busy_seconds / self._batches, 2) if self._batches else 0,
+                'batch_size_histogram': dict(zip(labels, self._histogram)),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+            }
+
+
+class InferenceScheduler:
+    """Batched front-end for the sentence encoder and the emotion classification pipeline."""
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 classify_fn: Callable[[List[str]], List[Dict]],
+                 max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        max_batch_size = max_batch_size or int(os.getenv('AI_BATCH_MAX_SIZE', '32'))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv('AI_BATCH_MAX_WAIT_MS', '5'))
+
+        self.encoder = MicroBatcher(
+            'encoder', lambda texts: list(np.asarray(encode_fn(texts))), max_batch_size, max_wait_ms
+        )
+        # A list input yields one top prediction per text; wrap each to keep the single-text shape
+        self.classifier = MicroBatcher(
+            'classifier', lambda texts: [[result] for result in classify_fn(texts)], max_batch_size, max_wait_ms
+        )
+
+    def encode(self, text: str) -> np.ndarray:
+        """Encode one text, returning a (1, dim) array like ``encode([text])``."""
+        return self.encoder(text)[np.newaxis, :]
+
+    def classify(self, text: str) -> List[Dict]:
+        """Classify one text, returning ``[{'label': ..., 'score': ...}]`` like ``pipeline(text)``."""
+        return self.classifier(text)
+
+    def stats(self) -> Dict:
+        return {
+            'encoder': self.encoder.stats(),
+            'classifier': self.classifier.stats(),
+        }
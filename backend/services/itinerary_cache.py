@@ -0,0 +1,135 @@
+"""
+services/itinerary_cache.py
+Whole-itinerary result cache keyed by canonical user preferences.
+
+Itinerary generation is deterministic in the preference fields apart from the
+start date and generated ids, so finished itineraries are stored under a hash
+of the canonicalized preferences (start date excluded) in the shared
+Redis/in-memory layer of ``app/cache.py``. On a hit the date-dependent parts
+are re-stamped for the requested start date by the ``restamp`` callback.
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from app.cache import cache_delete, cache_get, cache_set, get_redis, memory_cache_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = int(os.getenv("AI_ITINERARY_CACHE_TTL", "3600"))
+
+# Bump when the cached itinerary layout changes so old entries are ignored
+CACHE_SCHEMA_VERSION = 1
+KEY_PREFIX = "ai_itinerary"
+
+
+def normalize_interests(interests) -> list:
+    """Lower-cased, stripped, de-duplicated and sorted interests."""
+    return sorted({interest.strip().lower() for interest in interests or [] if interest and interest.strip()})
+
+
+def canonical_preferences(preferences):
+    """Copy of a ``UserPreferences`` with interests in canonical form."""
+    return dataclasses.replace(preferences, interests=normalize_interests(preferences.interests))
+
+
+def canonical_fields(preferences) -> Dict:
+    """Preference fields that determine the itinerary, in canonical form (start date excluded)."""
+    travel_style = getattr(preferences.travel_style, 'value', preferences.travel_style)
+    return {
+        'destination': preferences.destination.strip(),
+        'duration': int(preferences.duration),
+        'budget': round(float(preferences.budget), 2),
+        'interests': normalize_interests(preferences.interests),
+        'travel_style': str(travel_style).lower(),
+        'group_size': int(preferences.group_size),
+        'accommodation_preference': (preferences.accommodation_preference or '').strip().lower(),
+        'transportation_preference': (preferences.transportation_preference or '').strip().lower(),
+    }
+
+
+def _json_default(value: Any):
+    # numpy scalars and arrays that slip into itineraries
+    if hasattr(value, 'item') and callable(value.item) and getattr(value, 'ndim', 0) == 0:
+        return value.item()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ItineraryCache:
+    """Get/set finished itineraries by canonical preferences, re-stamping dates on hits"""
+
+    def __init__(self, restamp: Callable[[Dict, str], Dict], version: str = "",
+                 ttl: Optional[int] = None):
+        self.restamp = restamp
+        self.version = version
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._sets = 0
+        self._errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def key(self, preferences) -> str:
+        payload = json.dumps(canonical_fields(preferences), sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:v{CACHE_SCHEMA_VERSION}:{self.version}:{digest}"
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, preferences) -> Optional[Dict]:
+        """Cached itinerary re-stamped for ``preferences.start_date``, or None."""
+        if not self.enabled:
+            return None
+        key = self.key(preferences)
+        try:
+            raw = cache_get(key)
+            itinerary = json.loads(raw) if raw else None
+        except (TypeError, ValueError) as e:
+            logger.warning("Dropping unreadable itinerary cache entry %s: %s", key, e)
+            cache_delete(key)
+            self._count('_errors')
+            itinerary = None
+        if itinerary is None:
+            self._count('_misses')
+            return None
+        self._count('_hits')
+        return self.restamp(itinerary, preferences.start_date)
+
+    def set(self, preferences, itinerary: Dict):
+        if not self.enabled:
+            return
+        try:
+            cache_set(self.key(preferences), json.dumps(itinerary, default=_json_default), self.ttl)
+            self._count('_sets')
+        except (TypeError, ValueError) as e:
+            logger.warning("Could not cache itinerary: %s", e)
+            self._count('_errors')
+
+    def stats(self) -> Dict:
+        redis_backend = get_redis() is not None
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'backend': 'redis' if redis_backend else 'memory',
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'sets': self._sets,
+                'errors': self._errors,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'memory': None if redis_backend else memory_cache_stats(),
+            }
@@ -0,0 +1,366 @@
+"""
+services/itinerary_chunks.py
+Chunked generation of long LLM itineraries.
+
+A single completion for a long trip is slow (output tokens are produced one
+after another) and runs into the ``max_tokens`` cap, which truncates the JSON.
+Long trips are instead generated in two steps:
+
+1. One short completion plans a trip-level skeleton: summary, tips, total
+   cost and, for every day, its base, theme and highlights.
+2. The days are split into ranges of ``AI_CHUNK_DAYS`` and every range is
+   written by its own completion. The calls run concurrently, at most
+   ``AI_CHUNK_REQUEST_PARALLELISM`` per trip on a process-wide pool of
+   ``AI_CHUNK_PARALLELISM`` threads, so one long trip cannot hold every
+   thread. Both are capped at the provider client's ``AI_LLM_MAX_CONNECTIONS``
+   so chunk calls never queue for a pooled connection. Each call sees the whole skeleton, so the ranges agree on where
+   the traveller is and which places belong to which day.
+
+The chunks are merged in day order: day numbers and dates are re-stamped,
+days a chunk skipped are filled in from the skeleton, and places already
+visited on an earlier day are dropped. Up to ``AI_CHUNK_REQUEST_PARALLELISM``
+chunks the wall-clock time is roughly one skeleton call plus the slowest
+chunk, whatever the trip length.
+"""
+
+import functools
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from services.llm_clients import MAX_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Trips at least this long are generated in chunks
+CHUNK_MIN_DAYS = int(os.getenv("AI_CHUNK_MIN_DAYS", "5"))
+CHUNK_DAYS = int(os.getenv("AI_CHUNK_DAYS", "3"))
+# Concurrent chunk completions across all requests of this process, and for any one trip;
+# more threads than the provider client has connections would only wait on its pool
+CHUNK_PARALLELISM = min(int(os.getenv("AI_CHUNK_PARALLELISM", "32")), MAX_CONNECTIONS)
+CHUNK_REQUEST_PARALLELISM = min(int(os.getenv("AI_CHUNK_REQUEST_PARALLELISM", "8")), CHUNK_PARALLELISM)
+CHUNK_RETRIES = int(os.getenv("AI_CHUNK_RETRIES", "1"))
+# The outline costs roughly 40-50 tokens per day on top of the summary and tips
+SKELETON_MAX_TOKENS = int(os.getenv("AI_SKELETON_MAX_TOKENS", "900"))
+SKELETON_BASE_TOKENS = int(os.getenv("AI_SKELETON_BASE_TOKENS", "400"))
+SKELETON_TOKENS_PER_DAY = int(os.getenv("AI_SKELETON_TOKENS_PER_DAY", "60"))
+CHUNK_MAX_TOKENS = int(os.getenv("AI_CHUNK_MAX_TOKENS", "1400"))
+
+# complete(prompt, max_tokens) -> parsed JSON object
+CompleteFn = Callable[[str, int], Dict]
+
+_PLACE_NOISE = re.compile(r"[^\w]+")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, CHUNK_PARALLELISM), thread_name_prefix="llm-chunk")
+        return _executor
+
+
+def should_chunk(duration: int) -> bool:
+    return CHUNK_DAYS > 0 and duration >= max(CHUNK_MIN_DAYS, CHUNK_DAYS + 1)
+
+
+def plan_chunks(duration: int, chunk_days: int = CHUNK_DAYS) -> List[Tuple[int, int]]:
+    """Inclusive 1-based day ranges of at most ``chunk_days``; a short tail is folded into the last range."""
+    ranges = [(start, min(start + chunk_days - 1, duration)) for start in range(1, duration + 1, chunk_days)]
+    if len(ranges) > 1 and 2 * (ranges[-1][1] - ranges[-1][0] + 1) < chunk_days:
+        tail = ranges.pop()
+        ranges[-1] = (ranges[-1][0], tail[1])
+    return ranges
+
+
+def skeleton_max_tokens(duration: int) -> int:
+    """Output budget of the skeleton call, growing with the number of days it has to outline."""
+    return max(SKELETON_MAX_TOKENS, SKELETON_BASE_TOKENS + SKELETON_TOKENS_PER_DAY * duration)
+
+
+def _date(trip: Dict, day: int) -> str:
+    try:
+        start = datetime.strptime(str(trip["start_date"])[:10], "%Y-%m-%d")
+    except ValueError:
+        return ""
+    return (start + timedelta(days=day - 1)).strftime("%Y-%m-%d")
+
+
+def build_skeleton_prompt(trip: Dict, details: str) -> str:
+    duration = trip["duration"]
+    return f"""
+You are TravelSensei — an expert travel planner. Outline a realistic, local-aware {duration}-day trip in JSON format. The detailed days are written separately from this outline, so keep every entry short.
+
+{details}
+
+Requirements & formatting rules:
+1. Output MUST be valid JSON only (no explanation before/after).
+2. Top-level keys: summary, travel_tips, estimated_total_cost, days.
+3. "days" has exactly {duration} objects with: day (int), base (town or area of that night's stay), theme (short day title), highlights (1-3 main places).
+4. Order the days so travel between bases is logical; never repeat a highlight on two days.
+5. Stay within the given budget level; "estimated_total_cost" is an integer in INR and "travel_tips" an array of short strings.
+""".strip()
+
+
+def build_chunk_prompt(trip: Dict, details: str, outline: List[Dict], start: int, end: int) -> str:
+    duration = trip["duration"]
+    elsewhere = sorted({place for day in outline if not start <= day.get("day", 0) <= end
+                        for place in day.get("highlights") or []})
+    return f"""
+You are TravelSensei — an expert travel planner. Write days {start} to {end} of a {duration}-day itinerary in JSON format.
+
+{details}
+
+Trip outline (fixed; follow the base, theme and highlights of each day):
+{json.dumps(outline, ensure_ascii=False)}
+
+Places planned for other days (do not include them): {", ".join(elsewhere) or "none"}
+
+Requirements & formatting rules:
+1. Output MUST be valid JSON only (no explanation before/after).
+2. Top-level key: days, a list with exactly the days {start} to {end}.
+3. Each day has: day (int), date (YYYY-MM-DD), title, description, activities (list), food_suggestion.
+   - Each activity object must have: time (Morning/Afternoon/Evening), place, details, approx_time_mins (int), estimated_cost (INR)
+4. Provide 3-5 activities per day (unless travel/arrival day).
+5. Stay within the given budget level; avoid luxury-only suggestions if budget is low.
+""".strip()
+
+
+def _fallback_outline(trip: Dict) -> List[Dict]:
+    return [{"day": day, "base": trip["destination"], "theme": f"Explore {trip['destination']}", "highlights": []}
+            for day in range(1, trip["duration"] + 1)]
+
+
+def normalize_outline(trip: Dict, skeleton: Dict) -> List[Dict]:
+    """One outline entry per day (1..duration) from a model skeleton, filling any gaps."""
+    outline = {entry["day"]: entry for entry in _fallback_outline(trip)}
+    for position, entry in enumerate(skeleton.get("days") or []):
+        if not isinstance(entry, dict):
+            continue
+        day = _day_number(entry, position + 1)
+        if day in outline:
+            highlights = entry.get("highlights") or []
+            outline[day] = {
+                "day": day,
+                "base": str(entry.get("base") or outline[day]["base"]),
+                "theme": str(entry.get("theme") or entry.get("title") or outline[day]["theme"]),
+                "highlights": [str(place) for place in highlights][:3] if isinstance(highlights, list) else [],
+            }
+    return [outline[day] for day in sorted(outline)]
+
+
+def _day_number(day: Dict, default: int) -> int:
+    try:
+        return int(day.get("day", default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _place_key(activity) -> str:
+    place = activity.get("place") if isinstance(activity, dict) else None
+    return _PLACE_NOISE.sub(" ", str(place or "")).strip().casefold()
+
+
+class DayMerger:
+    """Merge chunk outputs in day order into one itinerary, de-duplicating places across days"""
+
+    def __init__(self, trip: Dict, skeleton: Dict, outline: List[Dict]):
+        self.trip = trip
+        self.skeleton = skeleton
+        self.outline = {entry["day"]: entry for entry in outline}
+        self.days: List[Dict] = []
+        self.travel_tips: List[str] = []
+        self._seen_places = set()
+        self._chunk_costs: List[int] = []
+        self.filled_days = 0
+        self.dropped_activities = 0
+
+    def _outline_day(self, number: int) -> Dict:
+        entry = self.outline[number]
+        self.filled_days += 1
+        return {
+            "title": entry["theme"],
+            "description": f"{entry['theme']} around {entry['base']}",
+            "activities": [{"time": slot, "place": place, "details": "", "approx_time_mins": 120, "estimated_cost": 0}
+                           for slot, place in zip(("Morning", "Afternoon", "Evening"), entry["highlights"])],
+        }
+
+    def _dedupe(self, day: Dict) -> Dict:
+        activities = day.get("activities")
+        if not isinstance(activities, list):
+            day["activities"] = []
+            return day
+        kept = []
+        for activity in activities:
+            key = _place_key(activity)
+            if key and key in self._seen_places:
+                continue
+            kept.append(activity)
+        if not kept and activities:
+            # Never leave a day empty because of a repeat
+            kept = activities[:1]
+        self.dropped_activities += len(activities) - len(kept)
+        self._seen_places.update(key for key in map(_place_key, kept) if key)
+        day["activities"] = kept
+        return day
+
+    def add_chunk(self, start: int, end: int, parsed: Dict) -> List[Dict]:
+        """Days ``start..end`` of one chunk response, merged; call in day order."""
+        by_number = {}
+        for position, day in enumerate(parsed.get("days") or []):
+            if isinstance(day, dict):
+                number = _day_number(day, start + position)
+                if start <= number <= end:
+                    by_number.setdefault(number, day)
+        for tip in parsed.get("travel_tips") or []:
+            if isinstance(tip, str) and tip not in self.travel_tips:
+                self.travel_tips.append(tip)
+        if isinstance(parsed.get("estimated_total_cost"), (int, float)):
+            self._chunk_costs.append(int(parsed["estimated_total_cost"]))
+
+        merged = []
+        for number in range(start, end + 1):
+            day = dict(by_number.get(number) or self._outline_day(number))
+            day["day"] = number
+            day["date"] = _date(self.trip, number) or day.get("date", "")
+            merged.append(self._dedupe(day))
+        self.days.extend(merged)
+        return merged
+
+    def itinerary(self) -> Dict:
+        trip, skeleton = self.trip, self.skeleton
+        tips = [tip for tip in skeleton.get("travel_tips") or [] if isinstance(tip, str)]
+        tips += [tip for tip in self.travel_tips if tip not in tips]
+        total = skeleton.get("estimated_total_cost")
+        if not isinstance(total, (int, float)):
+            total = sum(self._chunk_costs) or sum(
+                int(activity.get("estimated_cost") or 0) for day in self.days for activity in day["activities"]
+                if isinstance(activity, dict) and isinstance(activity.get("estimated_cost"), (int, float)))
+        return {
+            "destination": trip["destination"],
+            "start_date": trip["start_date"],
+            "duration_days": trip["duration"],
+            "group_size": trip["group_size"],
+            "budget": f"₹{trip['budget_display']}",
+            "summary": skeleton.get("summary") or f"{trip['duration']}-day trip to {trip['destination']}",
+            "days": self.days,
+            "travel_tips": tips,
+            "estimated_total_cost": int(total),
+        }
+
+
+def _complete_chunk(complete: CompleteFn, prompt: str, start: int, end: int) -> Dict:
+    for attempt in range(CHUNK_RETRIES + 1):
+        try:
+            return complete(prompt, CHUNK_MAX_TOKENS)
+        except Exception as e:
+            if attempt == CHUNK_RETRIES:
+                raise
+            logger.warning("Retrying days %d-%d after failed chunk: %s", start, end, e)
+
+
+class _ChunkWindow:
+    """Runs one trip's chunk calls on the shared pool with at most ``limit`` of them in flight"""
+
+    def __init__(self, pool: ThreadPoolExecutor, calls: List[Callable[[], Dict]], limit: int):
+        self.pool = pool
+        self.calls = calls
+        self.results: List[Future] = [Future() for _ in calls]
+        self._pending = deque(range(len(calls)))
+        self._submitted: List[Future] = []
+        self._closed = False
+        self._lock = threading.Lock()
+        for _ in range(max(1, limit)):
+            self._launch()
+
+    def _launch(self):
+        with self._lock:
+            if self._closed or not self._pending:
+                return
+            index = self._pending.popleft()
+            self._submitted.append(self.pool.submit(self._run, index))
+
+    def _run(self, index: int):
+        try:
+            self.results[index].set_result(self.calls[index]())
+        except Exception as e:
+            self.results[index].set_exception(e)
+        finally:
+            self._launch()
+
+    def close(self):
+        """Start no further calls and cancel the queued ones."""
+        with self._lock:
+            self._closed = True
+            submitted = list(self._submitted)
+        for future in submitted:
+            future.cancel()
+
+
+def iter_chunked_itinerary(trip: Dict, details: str, complete: CompleteFn) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yields ('day', day) in day order as soon as every earlier chunk is done, then
+    ('itinerary', itinerary) with all days merged. A chunk that still fails after its
+    retries is filled in from the outline; only when every chunk fails is the error raised.
+    When any day came from the outline, ('degraded', {'failed_chunks', 'filled_days'})
+    precedes the itinerary so callers can keep it out of their caches.
+    """
+    try:
+        skeleton = complete(build_skeleton_prompt(trip, details), skeleton_max_tokens(trip["duration"]))
+    except Exception as e:
+        # The chunks can still be written without the shared plan, just less coordinated
+        logger.warning("Trip skeleton failed, chunking without it: %s", e)
+        skeleton = {}
+    outline = normalize_outline(trip, skeleton)
+
+    ranges = plan_chunks(trip["duration"])
+    logger.info("Generating %d-day trip to %s in %d chunks", trip["duration"], trip["destination"], len(ranges))
+    window = _ChunkWindow(_pool(), [
+        functools.partial(_complete_chunk, complete, build_chunk_prompt(trip, details, outline, start, end), start, end)
+        for start, end in ranges
+    ], CHUNK_REQUEST_PARALLELISM)
+    merger = DayMerger(trip, skeleton, outline)
+    # Failed ranges are held back until some chunk succeeds, so an all-failed trip streams nothing
+    failed: List[Tuple[int, int]] = []
+    first_error: Optional[Exception] = None
+    succeeded = False
+    try:
+        for (start, end), result in zip(ranges, window.results):
+            try:
+                parsed = result.result()
+            except Exception as e:
+                logger.error("Days %d-%d failed after retries, filling them from the outline: %s", start, end, e)
+                first_error = first_error or e
+                failed.append((start, end))
+                if not succeeded:
+                    continue
+                parsed = {}
+            else:
+                if not succeeded:
+                    succeeded = True
+                    for failed_start, failed_end in failed:
+                        for day in merger.add_chunk(failed_start, failed_end, {}):
+                            yield "day", day
+            for day in merger.add_chunk(start, end, parsed):
+                yield "day", day
+    finally:
+        window.close()
+    if not succeeded:
+        raise first_error
+    if failed:
+        logger.warning("Filled %d of %d chunks from the outline", len(failed), len(ranges))
+    if merger.filled_days or merger.dropped_activities:
+        logger.info("Merged chunks: %d days filled from the outline, %d repeated activities dropped",
+                    merger.filled_days, merger.dropped_activities)
+    if merger.filled_days:
+        yield "degraded", {"failed_chunks": len(failed), "filled_days": merger.filled_days}
+    yield "itinerary", merger.itinerary()
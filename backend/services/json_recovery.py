@@ -0,0 +1,227 @@
+"""
+services/json_recovery.py
+Tolerant extraction of the itinerary JSON from raw model output.
+
+Model output is usually JSON wrapped in code fences or a line of prose, but
+it can also carry trailing commas, raw newlines inside strings, Python
+literals, or stop mid-document when it hits ``max_tokens``.
+``parse_model_json`` starts at the first ``{`` and decodes the document once:
+well-formed JSON goes through the C decoder and ends at its closing brace,
+ignoring whatever follows. Anything else is read by a single left-to-right
+recovery pass that skips stray commas and garbage and drops incomplete
+trailing values, including an array element (such as a day) that was cut off
+before its closing bracket. At end of input it closes every structure still
+open, so a truncated response keeps exactly its completed days.
+
+The decoded ``days`` are then normalized in place into the shape the
+frontend reads (``day``, ``title``, ``description``, ``activities`` and
+``locations``), so neither the text nor the result is walked again by callers.
+"""
+
+import json
+import re
+from json.decoder import scanstring
+from typing import Any, Dict, List, Tuple
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_WORD = re.compile(r"[A-Za-z_$][\w$\-]*")
+_STRING_CHUNK = re.compile(r'[^"\\]*')
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# Deeper nesting than any itinerary is treated as garbage instead of exhausting the stack
+MAX_DEPTH = 64
+
+_DECODER = json.JSONDecoder(strict=False)
+
+
+class _Missing:
+    """Marker for a value that was cut off or unreadable"""
+
+
+_MISSING = _Missing()
+
+
+class _Recovery:
+    """Recursive-descent reader over one text; every method returns (value, end, complete)"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+
+    def _skip(self, index: int) -> int:
+        return _WHITESPACE.match(self.text, index).end()
+
+    def value(self, index: int, depth: int) -> Tuple[Any, int, bool]:
+        text = self.text
+        char = text[index]
+        if char == "{":
+            return self.object(index, depth)
+        if char == "[":
+            return self.array(index, depth)
+        if char == '"':
+            return self.string(index)
+        if char == "-" or char.isdigit():
+            match = _NUMBER.match(text, index)
+            if match is None:
+                return _MISSING, index + 1, True
+            end = match.end()
+            if end >= self.length:
+                # The number may have been cut short
+                return _MISSING, end, False
+            number = match.group()
+            return (float(number) if any(c in number for c in ".eE") else int(number)), end, True
+        match = _WORD.match(text, index)
+        if match is not None:
+            word = match.group()
+            if word in _LITERALS:
+                return _LITERALS[word], match.end(), True
+            return _MISSING, match.end(), match.end() < self.length
+        return _MISSING, index + 1, True
+
+    def string(self, index: int) -> Tuple[Any, int, bool]:
+        try:
+            value, end = scanstring(self.text, index + 1, False)
+            return value, end, True
+        except json.JSONDecodeError as e:
+            if e.msg.startswith("Unterminated string"):
+                return _MISSING, self.length, False
+        # Invalid escapes (\' or \x) are kept literally
+        text, parts, index = self.text, [], index + 1
+        while True:
+            end = _STRING_CHUNK.match(text, index).end()
+            parts.append(text[index:end])
+            if end + 1 >= self.length:
+                return _MISSING, self.length, False
+            if text[end] == '"':
+                return "".join(parts), end + 1, True
+            escape = text[end + 1]
+            if escape == "u" and re.fullmatch(r"[0-9a-fA-F]{4}", text[end + 2:end + 6]):
+                parts.append(chr(int(text[end + 2:end + 6], 16)))
+                index = end + 6
+            else:
+                parts.append(_ESCAPES.get(escape, escape))
+                index = end + 2
+
+    def object(self, index: int, depth: int) -> Tuple[Dict, int, bool]:
+        if depth >= MAX_DEPTH:
+            raise ValueError("Model output is nested too deeply")
+        text, result = self.text, {}
+        index += 1
+        while True:
+            index = self._skip(index)
+            if index >= self.length:
+                return result, index, False
+            char = text[index]
+            if char == "}":
+                return result, index + 1, True
+            if char == ",":
+                index += 1
+                continue
+            if char == '"':
+                key, index, complete = self.string(index)
+                if not complete:
+                    return result, index, False
+            else:
+                match = _WORD.match(text, index)
+                if match is None:
+                    # Not a key: skip it rather than give up on the object
+                    index += 1
+                    continue
+                key, index = match.group(), match.end()
+            index = self._skip(index)
+            if index < self.length and text[index] == ":":
+                index = self._skip(index + 1)
+            if index >= self.length:
+                return result, index, False
+            if text[index] in ",}":
+                continue
+            value, index, complete = self.value(index, depth + 1)
+            if value is not _MISSING:
+                result[key] = value
+            if not complete:
+                return result, index, False
+
+    def array(self, index: int, depth: int) -> Tuple[List, int, bool]:
+        if depth >= MAX_DEPTH:
+            raise ValueError("Model output is nested too deeply")
+        text, result = self.text, []
+        index += 1
+        while True:
+            index = self._skip(index)
+            if index >= self.length:
+                return result, index, False
+            char = text[index]
+            if char == "]":
+                return result, index + 1, True
+            if char == ",":
+                index += 1
+                continue
+            if char == "}":
+                # Mismatched closer: treat it as the end of the array
+                return result, index, True
+            value, index, complete = self.value(index, depth + 1)
+            if not complete:
+                # A half-written element (e.g. the day the output stopped in) is dropped, not kept partially
+                return result, index, False
+            if value is not _MISSING:
+                result.append(value)
+
+
+def normalize_day(day: Dict, position: int) -> Dict:
+    """Give one model day the fields the frontend reads; ``locations`` mirrors ``activities``."""
+    try:
+        number = int(day.get("day", position))
+    except (TypeError, ValueError):
+        number = position
+    activities = day.get("activities")
+    activities = [activity for activity in activities if isinstance(activity, dict)] \
+        if isinstance(activities, list) else []
+    day["day"] = number
+    day.setdefault("title", f"Day {number}")
+    day.setdefault("description", "")
+    day["activities"] = activities
+    day["locations"] = [{**activity, "name": activity.get("place", ""), "description": activity.get("details", "")}
+                        for activity in activities] or [{
+                            "name": "No activities planned",
+                            "description": "No activities or locations were generated for this day."
+                        }]
+    return day
+
+
+def normalize_days(itinerary: Dict) -> Dict:
+    """Normalize ``days`` (or a ``day_plans``/``dayPlans`` list standing in for it) in place."""
+    days = itinerary.get("days")
+    if not isinstance(days, list):
+        days = itinerary.get("day_plans") or itinerary.get("dayPlans")
+        if not isinstance(days, list):
+            return itinerary
+    itinerary["days"] = [normalize_day(day, position) for position, day in
+                         enumerate((day for day in days if isinstance(day, dict)), start=1)]
+    return itinerary
+
+
+def recover_json(text: str) -> Tuple[Dict, bool]:
+    """
+    The first JSON object in ``text`` and whether it had to be repaired.
+    Raises ValueError when the text contains no object at all.
+    """
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("Could not parse JSON from model output")
+    try:
+        value, _ = _DECODER.raw_decode(text, start)
+        return value, False
+    except json.JSONDecodeError:
+        pass
+    value, _, _ = _Recovery(text).object(start, 0)
+    return value, True
+
+
+def parse_model_json(text: str, normalize: bool = True) -> Dict:
+    """Itinerary dict from raw model output (see module docstring); ValueError if there is none."""
+    value, repaired = recover_json(text or "")
+    if not isinstance(value, dict) or (repaired and not value):
+        raise ValueError("Could not parse JSON from model output")
+    return normalize_days(value) if normalize else value
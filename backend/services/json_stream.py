@@ -0,0 +1,140 @@
+"""
+services/json_stream.py
+Incremental parsing of streamed model output.
+
+``DaysStreamParser`` consumes the text of an itinerary response chunk by
+chunk as the model produces it and returns every element of the top-level
+``days`` array as soon as that element's closing brace arrives, long before
+the whole document is complete. Text before the first ``{`` (code fences,
+prose) is ignored; each character is scanned once, so the cost is linear in
+the response length however it is chunked.
+"""
+
+import json
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class DaysStreamParser:
+    """Feed response chunks, get back each completed element of the top-level ``key`` array"""
+
+    def __init__(self, key: str = "days"):
+        self.key = key
+        # Positions of array elements seen so far, and of those that could not be decoded
+        self.elements = 0
+        self.skipped: List[int] = []
+        self._chunks: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        # Key strings of the top-level object are captured to find ``key``
+        self._key_parts: Optional[List[str]] = None
+        self._last_key: Optional[str] = None
+        self._expect_value = False
+        self._array_depth: Optional[int] = None
+        self._element: Optional[List[str]] = None
+        self._finished = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._chunks)
+
+    @property
+    def finished(self) -> bool:
+        """True once the top-level object has been closed."""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume the next chunk; returns the array elements it completed, in order."""
+        return [element for _, element in self.feed_indexed(chunk)]
+
+    def feed_indexed(self, chunk: str) -> List[Tuple[int, Dict]]:
+        """Like ``feed`` but pairs each completed element with its 0-based position in the array."""
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        completed = []
+        stack = self._stack
+        element_start = 0 if self._element is not None else None
+
+        for index, char in enumerate(chunk):
+            if self._finished:
+                break
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_parts is not None:
+                        self._last_key = "".join(self._key_parts)
+                        self._key_parts = None
+                        continue
+                if self._key_parts is not None:
+                    self._key_parts.append(char)
+                continue
+
+            if char in " \t\r\n":
+                continue
+            if not stack and char != "{":
+                # Preamble before the document (```json fences, prose)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if len(stack) == 1 and not self._expect_value:
+                    self._key_parts = []
+            elif char == ":":
+                if len(stack) == 1:
+                    self._expect_value = True
+            elif char == ",":
+                if len(stack) == 1:
+                    self._expect_value = False
+                    self._last_key = None
+            elif char in "{[":
+                if char == "[" and len(stack) == 1 and self._expect_value and self._last_key == self.key:
+                    self._array_depth = 2
+                elif char == "{" and self._array_depth is not None and len(stack) == self._array_depth:
+                    self._element = []
+                    element_start = index
+                stack.append(char)
+            elif char in "}]":
+                if not stack:
+                    continue
+                stack.pop()
+                if char == "}" and self._element is not None and len(stack) == self._array_depth:
+                    self._element.append(chunk[element_start:index + 1])
+                    element = self._decode("".join(self._element))
+                    self._element = None
+                    element_start = None
+                    if element is not None:
+                        completed.append((self.elements, element))
+                    else:
+                        self.skipped.append(self.elements)
+                    self.elements += 1
+                elif char == "]" and self._array_depth is not None and len(stack) == self._array_depth - 1:
+                    self._array_depth = None
+                elif not stack:
+                    self._finished = True
+
+        if self._element is not None and element_start is not None:
+            self._element.append(chunk[element_start:])
+        return completed
+
+    def _decode(self, text: str) -> Optional[Dict]:
+        try:
+            value = json.loads(text)
+        except ValueError:
+            try:
+                value = json.loads(_TRAILING_COMMA.sub(r"\1", text))
+            except ValueError as e:
+                logger.warning("Skipping unparseable streamed %s element: %s", self.key, e)
+                return None
+        return value if isinstance(value, dict) else None
@@ -0,0 +1,178 @@
+"""
+services/llm_cache.py
+Response cache for the OpenAI/Gemini itinerary calls.
+
+Identical trip requests render the same prompt, so parsed model responses are
+stored under a hash of the normalized prompt text (whitespace collapsed,
+case folded) plus the provider, the model name and a temperature bucket.
+Entries are zlib-compressed JSON, base64-encoded because the Redis client of
+``app/cache.py`` decodes responses to ``str``. Entries whose encoded size
+exceeds ``AI_LLM_CACHE_MAX_ENTRY_BYTES`` are not stored. Without Redis the
+entries live in a dedicated LRU capped at ``AI_LLM_CACHE_MEMORY_MAX_ENTRIES``
+entries and ``AI_LLM_CACHE_MEMORY_MAX_BYTES`` in total, so large responses
+neither grow the process without bound nor push out other cached data.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Optional
+
+from app.cache import InMemoryCache, cache_delete, cache_get, cache_set, get_redis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = int(os.getenv("AI_LLM_CACHE_TTL", "86400"))
+DEFAULT_MAX_ENTRY_BYTES = int(os.getenv("AI_LLM_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+DEFAULT_MEMORY_MAX_ENTRIES = int(os.getenv("AI_LLM_CACHE_MEMORY_MAX_ENTRIES", "512"))
+DEFAULT_MEMORY_MAX_BYTES = int(os.getenv("AI_LLM_CACHE_MEMORY_MAX_BYTES", str(32 * 1024 * 1024)))
+# Temperatures within the same bucket share cache entries
+DEFAULT_TEMPERATURE_STEP = float(os.getenv("AI_LLM_CACHE_TEMPERATURE_STEP", "0.25"))
+
+# Bump when the cached response layout changes so old entries are ignored
+CACHE_SCHEMA_VERSION = 2
+KEY_PREFIX = "llm_itinerary"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Prompt text with whitespace runs collapsed and case folded."""
+    return _WHITESPACE.sub(" ", prompt or "").strip().casefold()
+
+
+def temperature_bucket(temperature: Optional[float], step: float = DEFAULT_TEMPERATURE_STEP) -> str:
+    if temperature is None:
+        return "default"
+    if step <= 0:
+        return f"{float(temperature):.2f}"
+    return f"{round(float(temperature) / step) * step:.2f}"
+
+
+def encode_entry(value: Dict) -> str:
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+
+
+def decode_entry(entry: str) -> Dict:
+    return json.loads(zlib.decompress(base64.b64decode(entry)).decode("utf-8"))
+
+
+class LLMResponseCache:
+    """Get/set parsed model responses by normalized prompt, model and temperature bucket"""
+
+    def __init__(self, ttl: Optional[int] = None, max_entry_bytes: Optional[int] = None,
+                 temperature_step: Optional[float] = None, memory_max_entries: Optional[int] = None,
+                 memory_max_bytes: Optional[int] = None):
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.max_entry_bytes = DEFAULT_MAX_ENTRY_BYTES if max_entry_bytes is None else max_entry_bytes
+        self.temperature_step = DEFAULT_TEMPERATURE_STEP if temperature_step is None else temperature_step
+        self._memory = InMemoryCache(
+            DEFAULT_MEMORY_MAX_ENTRIES if memory_max_entries is None else memory_max_entries,
+            DEFAULT_MEMORY_MAX_BYTES if memory_max_bytes is None else memory_max_bytes,
+        )
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._sets = 0
+        self._oversize = 0
+        self._errors = 0
+        self._raw_bytes = 0
+        self._stored_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def key(self, prompt: str, provider: str, model: str, temperature: Optional[float]) -> str:
+        material = "\x1f".join((provider or "", model or "",
+                                temperature_bucket(temperature, self.temperature_step),
+                                normalize_prompt(prompt)))
+        digest = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:v{CACHE_SCHEMA_VERSION}:{digest}"
+
+    # Redis when configured, otherwise this cache's own bounded LRU
+    def _get(self, key: str) -> Optional[str]:
+        return cache_get(key) if get_redis() is not None else self._memory.get(key)
+
+    def _set(self, key: str, entry: str):
+        if get_redis() is not None:
+            cache_set(key, entry, self.ttl)
+        else:
+            self._memory.set(key, entry, self.ttl)
+
+    def _delete(self, key: str):
+        if get_redis() is not None:
+            cache_delete(key)
+        else:
+            self._memory.delete(key)
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, prompt: str, provider: str, model: str, temperature: Optional[float],
+            record: bool = True) -> Optional[Dict]:
+        """Freshly decoded cached response (safe to mutate), or None. ``record=False`` skips the hit/miss counts."""
+        if not self.enabled:
+            return None
+        key = self.key(prompt, provider, model, temperature)
+        try:
+            entry = self._get(key)
+            value = decode_entry(entry) if entry else None
+        except (TypeError, ValueError, zlib.error) as e:
+            logger.warning("Dropping unreadable LLM cache entry %s: %s", key, e)
+            self._delete(key)
+            self._count('_errors')
+            value = None
+        if record:
+            self._count('_hits' if value is not None else '_misses')
+        return value
+
+    def set(self, prompt: str, provider: str, model: str, temperature: Optional[float], value: Dict) -> bool:
+        """Store ``value``; False when caching is off, the value is not JSON or the entry is too large."""
+        if not self.enabled:
+            return False
+        try:
+            raw_size = len(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            entry = encode_entry(value)
+        except (TypeError, ValueError) as e:
+            logger.warning("Could not cache LLM response: %s", e)
+            self._count('_errors')
+            return False
+        if self.max_entry_bytes and len(entry) > self.max_entry_bytes:
+            logger.info("LLM response of %d bytes (%d compressed) exceeds the %d byte cache entry limit",
+                        raw_size, len(entry), self.max_entry_bytes)
+            self._count('_oversize')
+            return False
+        self._set(self.key(prompt, provider, model, temperature), entry)
+        with self._lock:
+            self._sets += 1
+            self._raw_bytes += raw_size
+            self._stored_bytes += len(entry)
+        return True
+
+    def stats(self) -> Dict:
+        redis_backend = get_redis() is not None
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'backend': 'redis' if redis_backend else 'memory',
+                'ttl_seconds': self.ttl,
+                'max_entry_bytes': self.max_entry_bytes,
+                'temperature_step': self.temperature_step,
+                'hits': self._hits,
+                'misses': self._misses,
+                'sets': self._sets,
+                'skipped_oversize': self._oversize,
+                'errors': self._errors,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'compression_ratio': round(self._stored_bytes / self._raw_bytes, 4) if self._raw_bytes else 0.0,
+                'memory': None if redis_backend else self._memory.stats(),
+            }
@@ -0,0 +1,547 @@
+"""
+services/llm_clients.py
+Pooled OpenAI and Gemini chat clients with timeouts, async calls and hedging.
+
+Both providers are called over their REST APIs through one long-lived
+``httpx`` client per provider and key, so connections (and their TLS
+sessions) are kept alive and reused instead of being set up per request.
+Connect, read, write and pool timeouts are explicit. Every client offers
+``complete``/``stream`` and the async ``acomplete``/``astream``.
+
+``HedgedClient`` optionally fires a second request (on a backup provider, or
+a second attempt on the same one) when the first has not answered within the
+p95 latency observed so far for the same call class (model and ``max_tokens``
+bucket); the first answer that passes validation wins.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT_S = float(os.getenv("AI_LLM_CONNECT_TIMEOUT", "5"))
+# Longest gap between two received bytes; completions stream or arrive well within this
+READ_TIMEOUT_S = float(os.getenv("AI_LLM_READ_TIMEOUT", "60"))
+MAX_CONNECTIONS = int(os.getenv("AI_LLM_MAX_CONNECTIONS", "20"))
+# How long a call waits for a free pooled connection; a burst over MAX_CONNECTIONS queues instead of failing
+POOL_TIMEOUT_S = float(os.getenv("AI_LLM_POOL_TIMEOUT", str(READ_TIMEOUT_S)))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AI_LLM_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY_S = float(os.getenv("AI_LLM_KEEPALIVE_EXPIRY", "60"))
+
+HEDGE_ENABLED = os.getenv("AI_LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+# Provider of the hedged request; empty means a second attempt on the primary provider
+HEDGE_PROVIDER = os.getenv("AI_LLM_HEDGE_PROVIDER", "").lower()
+HEDGE_PERCENTILE = float(os.getenv("AI_LLM_HEDGE_PERCENTILE", "95"))
+# No hedging until this many latencies have been observed
+HEDGE_MIN_SAMPLES = int(os.getenv("AI_LLM_HEDGE_MIN_SAMPLES", "20"))
+# Threads running hedged attempts; never more than the connection pool can serve at once
+HEDGE_THREADS = min(int(os.getenv("AI_LLM_HEDGE_THREADS", "0")) or MAX_CONNECTIONS, MAX_CONNECTIONS)
+
+LATENCY_WINDOW = 200
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+
+DEFAULT_MODELS = {
+    'openai': "gpt-4o-mini",
+    'gemini': "gemini-2.5-flash",
+}
+
+Messages = List[Dict[str, str]]
+
+
+class LLMError(RuntimeError):
+    """A provider call that failed or returned no usable text"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(q / 100.0 * (len(samples) - 1))))]
+
+
+def call_class(model: str, max_tokens: Optional[int]) -> Tuple[str, int]:
+    """Latency class of a call: the model and ``max_tokens`` rounded up to a power of two (0 if unset)."""
+    if not max_tokens:
+        return model, 0
+    return model, 1 << (int(max_tokens) - 1).bit_length()
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(connect=CONNECT_TIMEOUT_S, read=READ_TIMEOUT_S, write=CONNECT_TIMEOUT_S,
+                         pool=POOL_TIMEOUT_S)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY_S)
+
+
+class LLMClient:
+    """One provider over a pooled keep-alive connection; subclasses map requests and responses"""
+
+    provider = ""
+
+    def __init__(self, api_key: str, base_url: str, default_model: Optional[str] = None,
+                 transport: Optional[httpx.BaseTransport] = None,
+                 async_transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.default_model = default_model or DEFAULT_MODELS[self.provider]
+        # All successful calls, plus one tracker per call class so short chats do not skew long completions
+        self.latency = LatencyTracker()
+        self._class_latency: Dict[Tuple[str, int], LatencyTracker] = {}
+        self._api_key = api_key
+        self._base_url = base_url.rstrip("/")
+        self._async_transport = async_transport
+        self._client = httpx.Client(base_url=self._base_url, headers=self._headers(), timeout=_timeout(),
+                                    limits=_limits(), transport=transport)
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    def _headers(self) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def _request(self, messages: Messages, model: str, temperature: Optional[float],
+                 max_tokens: Optional[int], stream: bool) -> Tuple[str, Dict]:
+        """(path, JSON body) of one call"""
+        raise NotImplementedError
+
+    def _text(self, data: Dict) -> str:
+        """Text of a complete response"""
+        raise NotImplementedError
+
+    def _delta(self, data: Dict) -> str:
+        """Text of one streamed event"""
+        raise NotImplementedError
+
+    def _count(self, error: bool = False):
+        with self._lock:
+            self._requests += 1
+            self._errors += int(error)
+
+    def _check(self, response: httpx.Response):
+        if response.status_code >= 400:
+            self._count(error=True)
+            raise LLMError(f"{self.provider} returned HTTP {response.status_code}: {response.text[:300]}",
+                           response.status_code)
+
+    @staticmethod
+    def _sse_data(line: str) -> Optional[str]:
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        return None if not data or data == "[DONE]" else data
+
+    def latency_for(self, model: Optional[str], max_tokens: Optional[int]) -> LatencyTracker:
+        """Latency tracker of the call class of ``model`` (default model if None) and ``max_tokens``."""
+        key = call_class(model or self.default_model, max_tokens)
+        with self._lock:
+            tracker = self._class_latency.get(key)
+            if tracker is None:
+                tracker = self._class_latency[key] = LatencyTracker()
+            return tracker
+
+    def _finish(self, data: Dict, started: float, model: str, max_tokens: Optional[int]) -> str:
+        text = self._text(data)
+        if not text:
+            self._count(error=True)
+            raise LLMError(f"{self.provider} returned no text")
+        self._count()
+        elapsed = time.perf_counter() - started
+        self.latency.record(elapsed)
+        self.latency_for(model, max_tokens).record(elapsed)
+        return text
+
+    def complete(self, messages: Messages, model: Optional[str] = None, temperature: Optional[float] = None,
+                 max_tokens: Optional[int] = None) -> str:
+        model = model or self.default_model
+        path, body = self._request(messages, model, temperature, max_tokens, False)
+        started = time.perf_counter()
+        try:
+            response = self._client.post(path, json=body)
+        except httpx.HTTPError as e:
+            self._count(error=True)
+            raise LLMError(f"{self.provider} request failed: {e}") from e
+        self._check(response)
+        return self._finish(response.json(), started, model, max_tokens)
+
+    def stream(self, messages: Messages, model: Optional[str] = None, temperature: Optional[float] = None,
+               max_tokens: Optional[int] = None) -> Iterator[str]:
+        path, body = self._request(messages, model or self.default_model, temperature, max_tokens, True)
+        try:
+            with self._client.stream("POST", path, json=body) as response:
+                if response.status_code >= 400:
+                    response.read()
+                self._check(response)
+                for line in response.iter_lines():
+                    data = self._sse_data(line)
+                    if data is not None:
+                        text = self._delta(json.loads(data))
+                        if text:
+                            yield text
+        except httpx.HTTPError as e:
+            self._count(error=True)
+            raise LLMError(f"{self.provider} stream failed: {e}") from e
+        self._count()
+
+    def _async(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(base_url=self._base_url, headers=self._headers(),
+                                                   timeout=_timeout(), limits=_limits(),
+                                                   transport=self._async_transport)
+        return self._async_client
+
+    async def acomplete(self, messages: Messages, model: Optional[str] = None,
+                        temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> str:
+        model = model or self.default_model
+        path, body = self._request(messages, model, temperature, max_tokens, False)
+        started = time.perf_counter()
+        try:
+            response = await self._async().post(path, json=body)
+        except httpx.HTTPError as e:
+            self._count(error=True)
+            raise LLMError(f"{self.provider} request failed: {e}") from e
+        self._check(response)
+        return self._finish(response.json(), started, model, max_tokens)
+
+    async def astream(self, messages: Messages, model: Optional[str] = None,
+                      temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        path, body = self._request(messages, model or self.default_model, temperature, max_tokens, True)
+        try:
+            async with self._async().stream("POST", path, json=body) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                self._check(response)
+                async for line in response.aiter_lines():
+                    data = self._sse_data(line)
+                    if data is not None:
+                        text = self._delta(json.loads(data))
+                        if text:
+                            yield text
+        except httpx.HTTPError as e:
+            self._count(error=True)
+            raise LLMError(f"{self.provider} stream failed: {e}") from e
+        self._count()
+
+    def close(self):
+        self._client.close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+
+    def stats(self) -> Dict:
+        p50, p95 = self.latency.percentile(50), self.latency.percentile(95)
+        with self._lock:
+            classes = dict(self._class_latency)
+        by_class = {}
+        for (model, tokens), tracker in sorted(classes.items()):
+            class_p95 = tracker.percentile(95)
+            by_class[f"{model}/{tokens or 'default'}"] = {
+                'samples': tracker.count,
+                'latency_p95_s': round(class_p95, 3) if class_p95 is not None else None,
+            }
+        with self._lock:
+            return {
+                'provider': self.provider,
+                'default_model': self.default_model,
+                'requests': self._requests,
+                'errors': self._errors,
+                'latency_samples': self.latency.count,
+                'latency_p50_s': round(p50, 3) if p50 is not None else None,
+                'latency_p95_s': round(p95, 3) if p95 is not None else None,
+                'latency_by_call_class': by_class,
+            }
+
+
+class OpenAIChatClient(LLMClient):
+    """OpenAI Chat Completions API"""
+
+    provider = "openai"
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self._api_key}"}
+
+    def _request(self, messages, model, temperature, max_tokens, stream):
+        body = {"model": model, "messages": messages}
+        if temperature is not None:
+            body["temperature"] = temperature
+        if max_tokens is not None:
+            body["max_tokens"] = max_tokens
+        if stream:
+            body["stream"] = True
+        return "/chat/completions", body
+
+    def _text(self, data):
+        choices = data.get("choices") or []
+        return (choices[0].get("message") or {}).get("content") or "" if choices else ""
+
+    def _delta(self, data):
+        choices = data.get("choices") or []
+        return (choices[0].get("delta") or {}).get("content") or "" if choices else ""
+
+
+class GeminiClient(LLMClient):
+    """
+    Gemini ``generateContent`` API. System messages become the system instruction.
+    Gemini counts thinking tokens against ``maxOutputTokens``, so per-call ``max_tokens``
+    sized for OpenAI are not forwarded; set ``AI_GEMINI_MAX_OUTPUT_TOKENS`` to cap output.
+    """
+
+    provider = "gemini"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        limit = os.getenv("AI_GEMINI_MAX_OUTPUT_TOKENS")
+        self.max_output_tokens = int(limit) if limit else None
+
+    def _headers(self) -> Dict[str, str]:
+        return {"x-goog-api-key": self._api_key}
+
+    def _request(self, messages, model, temperature, max_tokens, stream):
+        model = model[len("models/"):] if model.startswith("models/") else model
+        system = [{"text": message["content"]} for message in messages if message["role"] == "system"]
+        contents = [{"role": "model" if message["role"] == "assistant" else "user",
+                     "parts": [{"text": message["content"]}]}
+                    for message in messages if message["role"] != "system"]
+        body: Dict[str, Any] = {"contents": contents}
+        if system:
+            body["systemInstruction"] = {"parts": system}
+        config = {}
+        if temperature is not None:
+            config["temperature"] = temperature
+        if self.max_output_tokens:
+            config["maxOutputTokens"] = self.max_output_tokens
+        if config:
+            body["generationConfig"] = config
+        if stream:
+            return f"/models/{model}:streamGenerateContent?alt=sse", body
+        return f"/models/{model}:generateContent", body
+
+    def _text(self, data):
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        # Thought summaries are not part of the answer
+        return "".join(part.get("text", "") for part in parts if not part.get("thought"))
+
+    _delta = _text
+
+
+CLIENT_TYPES = {
+    'openai': (OpenAIChatClient, "OPENAI_API_KEY", lambda: OPENAI_BASE_URL),
+    'gemini': (GeminiClient, "GEMINI_API_KEY", lambda: GEMINI_BASE_URL),
+}
+
+_clients: Dict[Tuple[str, str], LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(provider: str, api_key: Optional[str] = None) -> Optional[LLMClient]:
+    """Shared pooled client for ``provider``, or None when it is unknown or has no API key."""
+    provider = (provider or "").lower()
+    if provider not in CLIENT_TYPES:
+        return None
+    client_type, key_variable, base_url = CLIENT_TYPES[provider]
+    api_key = api_key or os.getenv(key_variable)
+    if not api_key:
+        return None
+    with _clients_lock:
+        client = _clients.get((provider, api_key))
+        if client is None:
+            client = _clients[(provider, api_key)] = client_type(api_key, base_url())
+        return client
+
+
+class HedgedClient:
+    """
+    ``complete`` on ``primary`` that, when hedging is on and enough latencies are known for the
+    call's class (model and ``max_tokens`` bucket), fires a second request on ``backup`` (or
+    ``primary`` again) once the first has been outstanding for that class's observed p95. The first result that passes ``validate`` wins; the other is abandoned.
+    Streams always go to the primary.
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, primary: LLMClient, backup: Optional[LLMClient] = None, enabled: bool = HEDGE_ENABLED,
+                 percentile: float = HEDGE_PERCENTILE, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.primary = primary
+        self.backup = backup or primary
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'failed_attempts': 0}
+
+    @property
+    def provider(self) -> str:
+        return self.primary.provider
+
+    @property
+    def default_model(self) -> str:
+        return self.primary.default_model
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def hedge_delay(self, model: Optional[str] = None, max_tokens: Optional[int] = None) -> Optional[float]:
+        """Seconds to wait before hedging a call of this class, or None when no hedge should be sent."""
+        if not self.enabled:
+            return None
+        latency = self.primary.latency_for(model, max_tokens)
+        if latency.count < self.min_samples:
+            return None
+        return latency.percentile(self.percentile)
+
+    def _backup_model(self, model: Optional[str]) -> Optional[str]:
+        return model if self.backup is self.primary else self.backup.default_model
+
+    @classmethod
+    def _pool(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=HEDGE_THREADS, thread_name_prefix="llm-hedge")
+            return cls._executor
+
+    def complete(self, messages: Messages, model: Optional[str] = None, temperature: Optional[float] = None,
+                 max_tokens: Optional[int] = None, validate: Optional[Callable[[str], Any]] = None) -> Any:
+        """Completion text, or ``validate(text)`` when given; raises when every attempt failed."""
+        self._count('requests')
+
+        def attempt(client: LLMClient, attempt_model: Optional[str], started: Optional[threading.Event] = None):
+            if started is not None:
+                started.set()
+            text = client.complete(messages, attempt_model, temperature, max_tokens)
+            return validate(text) if validate is not None else text
+
+        delay = self.hedge_delay(model, max_tokens)
+        if delay is None:
+            return attempt(self.primary, model)
+
+        pool = self._pool()
+        started = threading.Event()
+        attempts = {pool.submit(attempt, self.primary, model, started): False}
+        # The hedge delay counts from when the primary request starts, not from when it was queued
+        started.wait()
+        done, _ = wait(attempts, timeout=delay)
+        if not done:
+            logger.info("Hedging %s request after %.2fs (p%.0f) to %s", self.provider, delay, self.percentile,
+                        self.backup.provider)
+            self._count('hedged')
+            attempts[pool.submit(attempt, self.backup, self._backup_model(model))] = True
+
+        pending, errors = set(attempts), []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self._count('failed_attempts')
+                    errors.append(e)
+                    continue
+                if attempts[future]:
+                    self._count('hedge_wins')
+                for other in pending:
+                    other.cancel()
+                return result
+        raise errors[0]
+
+    async def acomplete(self, messages: Messages, model: Optional[str] = None,
+                        temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                        validate: Optional[Callable[[str], Any]] = None) -> Any:
+        """Async ``complete``; the losing request is cancelled and its connection released."""
+        self._count('requests')
+
+        async def attempt(client: LLMClient, attempt_model: Optional[str]):
+            text = await client.acomplete(messages, attempt_model, temperature, max_tokens)
+            return validate(text) if validate is not None else text
+
+        delay = self.hedge_delay(model, max_tokens)
+        if delay is None:
+            return await attempt(self.primary, model)
+
+        attempts = {asyncio.ensure_future(attempt(self.primary, model)): False}
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if not done:
+            self._count('hedged')
+            attempts[asyncio.ensure_future(attempt(self.backup, self._backup_model(model)))] = True
+
+        pending, errors = set(attempts), []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        self._count('failed_attempts')
+                        errors.append(task.exception())
+                        continue
+                    if attempts[task]:
+                        self._count('hedge_wins')
+                    return task.result()
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stream(self, *args, **kwargs) -> Iterator[str]:
+        return self.primary.stream(*args, **kwargs)
+
+    def astream(self, *args, **kwargs) -> AsyncIterator[str]:
+        return self.primary.astream(*args, **kwargs)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'hedging': self.enabled,
+            'primary': self.primary.stats(),
+            'backup': self.backup.stats() if self.backup is not self.primary else None,
+        }
+
+
+def build_hedged_client(provider: str) -> Optional[HedgedClient]:
+    """Pooled client for ``provider`` hedged to ``AI_LLM_HEDGE_PROVIDER`` (when it has a key)."""
+    primary = get_client(provider)
+    if primary is None:
+        return None
+    backup = get_client(HEDGE_PROVIDER) if HEDGE_PROVIDER else None
+    if HEDGE_PROVIDER and backup is None:
+        logger.warning("Hedge provider %s has no API key; hedging with a second %s attempt instead",
+                       HEDGE_PROVIDER, provider)
+    return HedgedClient(primary, backup)
@@ -0,0 +1,279 @@
+"""
+services/metrics.py
+Fixed-memory, thread-safe metrics with JSON and Prometheus text export.
+
+Latencies go into cumulative-bucket histograms (constant memory regardless of
+traffic) from which p50/p90/p99 are estimated by interpolating inside the
+bucket that holds the quantile. Metrics are grouped into families keyed by
+name with optional labels, e.g. ``histogram('ai_stage_seconds', stage='routing')``.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, roughly 1-2-5 steps from 0.1 ms to 60 s (+Inf is implicit)
+DEFAULT_LATENCY_BUCKETS = (
+    0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+    1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic thread-safe counter"""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> float:
+        with self._lock:
+            self._value += amount
+            return self._value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+            self._count += 1
+            if seconds > self._max:
+                self._max = seconds
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def _state(self):
+        with self._lock:
+            return list(self._counts), self._sum, self._count, self._max
+
+    def quantile(self, q: float) -> float:
+        counts, _, count, maximum = self._state()
+        return self._quantile(counts, count, maximum, q)
+
+    def _quantile(self, counts: List[int], count: int, maximum: float, q: float) -> float:
+        if count == 0:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else maximum
+                fraction = (rank - cumulative) / bucket_count
+                # Never report more than the largest value actually seen
+                return min(lower + (upper - lower) * fraction, maximum)
+            cumulative += bucket_count
+        return maximum
+
+    def snapshot(self) -> Dict:
+        counts, total, count, maximum = self._state()
+        return {
+            'count': count,
+            'avg_ms': round(total / count * 1000.0, 3) if count else 0.0,
+            'p50_ms': round(self._quantile(counts, count, maximum, 0.50) * 1000.0, 3),
+            'p90_ms': round(self._quantile(counts, count, maximum, 0.90) * 1000.0, 3),
+            'p99_ms': round(self._quantile(counts, count, maximum, 0.99) * 1000.0, 3),
+            'max_ms': round(maximum * 1000.0, 3),
+        }
+
+    def prometheus_lines(self, name: str, key: LabelKey) -> List[str]:
+        counts, total, count, _ = self._state()
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named counter/histogram families plus gauges and counters read from callbacks at export time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families: Dict[str, Dict] = {}
+        # name -> (type, help, {labels: callback})
+        self._callbacks: Dict[str, Tuple[str, str, Dict[LabelKey, Callable[[], float]]]] = {}
+
+    def _child(self, kind: str, name: str, help_text: str, labels: Dict[str, str], factory):
+        key = _label_key(labels)
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = {'type': kind, 'help': help_text, 'children': {}}
+            elif family['type'] != kind:
+                raise ValueError(f"Metric {name} is already registered as a {family['type']}")
+            child = family['children'].get(key)
+            if child is None:
+                child = family['children'][key] = factory()
+            return child
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._child('counter', name, help_text, labels, Counter)
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                  **labels) -> Histogram:
+        return self._child('histogram', name, help_text, labels, lambda: Histogram(buckets))
+
+    def gauge_callback(self, name: str, help_text: str, fn: Callable[[], float], **labels):
+        """Gauge whose value is read from ``fn`` at export time."""
+        self._register_callback('gauge', name, help_text, fn, labels)
+
+    def counter_callback(self, name: str, help_text: str, fn: Callable[[], float], **labels):
+        """Counter whose monotonic total is read from ``fn`` at export time (exported as ``<name>_total``)."""
+        self._register_callback('counter', name, help_text, fn, labels)
+
+    def _register_callback(self, kind: str, name: str, help_text: str, fn: Callable[[], float],
+                           labels: Dict[str, str]):
+        key = _label_key(labels)
+        with self._lock:
+            registered_kind, _, callbacks = self._callbacks.get(name, (kind, help_text, {}))
+            if registered_kind != kind:
+                raise ValueError(f"Metric {name} is already registered as a {registered_kind}")
+            callbacks[key] = fn
+            self._callbacks[name] = (kind, help_text, callbacks)
+
+    def histograms(self, name: str) -> Dict[str, Dict]:
+        """Snapshots of every child of a histogram family, keyed by its label values."""
+        with self._lock:
+            children = dict(self._families.get(name, {}).get('children', {}))
+        return {",".join(value for _, value in key) or "all": child.snapshot() for key, child in children.items()}
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            families = {name: (family['type'], family['help'], dict(family['children']))
+                        for name, family in self._families.items()}
+            callback_families = {name: (kind, help_text, dict(callbacks))
+                                 for name, (kind, help_text, callbacks) in self._callbacks.items()}
+
+        lines = []
+        for name in sorted(families):
+            kind, help_text, children = families[name]
+            exported = f"{name}_total" if kind == 'counter' and not name.endswith('_total') else name
+            lines.append(f"# HELP {exported} {help_text}")
+            lines.append(f"# TYPE {exported} {kind}")
+            for key in sorted(children):
+                child = children[key]
+                if kind == 'counter':
+                    lines.append(f"{exported}{_format_labels(key)} {_format_value(child.value)}")
+                else:
+                    lines.extend(child.prometheus_lines(name, key))
+        for name in sorted(callback_families):
+            kind, help_text, callbacks = callback_families[name]
+            exported = f"{name}_total" if kind == 'counter' and not name.endswith('_total') else name
+            lines.append(f"# HELP {exported} {help_text}")
+            lines.append(f"# TYPE {exported} {kind}")
+            for key in sorted(callbacks):
+                try:
+                    value = float(callbacks[key]())
+                except Exception:
+                    continue
+                lines.append(f"{exported}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the AI service and the API server
+metrics = MetricsRegistry()
+
+STAGE_HISTOGRAM = "ai_itinerary_stage_seconds"
+STAGE_HELP = "Time spent per itinerary generation stage"
+
+
+# Per-thread observers of stage sections (benchmarks, diagnostics); empty while serving
+_stage_hooks = threading.local()
+
+
+class StageSection:
+    """One timed section of a generation stage; ``seconds`` is set when it exits."""
+    __slots__ = ('stage', 'seconds')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.seconds = 0.0
+
+
+@contextmanager
+def stage_hook(hook):
+    """Call ``hook.start(stage)`` and ``hook.end(stage, seconds)`` around every stage section on this thread."""
+    previous = getattr(_stage_hooks, 'active', ())
+    _stage_hooks.active = previous + (hook,)
+    try:
+        yield hook
+    finally:
+        _stage_hooks.active = previous
+
+
+@contextmanager
+def stage_section(stage: str):
+    """Time one section of a stage and report it to the stage hooks, without observing the histogram."""
+    section = StageSection(stage)
+    hooks = getattr(_stage_hooks, 'active', ())
+    for hook in hooks:
+        hook.start(stage)
+    started = time.perf_counter()
+    try:
+        yield section
+    finally:
+        section.seconds = time.perf_counter() - started
+        for hook in hooks:
+            hook.end(stage, section.seconds)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time one stage of itinerary generation into the per-stage histogram."""
+    histogram = metrics.histogram(STAGE_HISTOGRAM, STAGE_HELP, stage=stage)
+    section = None
+    try:
+        with stage_section(stage) as section:
+            yield
+    finally:
+        if section is not None:
+            histogram.observe(section.seconds)
@@ -0,0 +1,168 @@
+"""
+services/model_registry.py
+Lazily loaded ML models with load-state tracking and warmup.
+
+Models are registered with a loader callable and only built on first use (or
+by an explicit ``load_all``/``warmup``), so importing the API server stays
+cheap. Each model records its state, load time and last error, which back the
+liveness/readiness probes of the AI server.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyModel:
+    """A model built on first access by ``loader`` and cached afterwards"""
+
+    def __init__(self, name: str, loader: Callable[[], Any],
+                 warmup_fn: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self.loader = loader
+        self.warmup_fn = warmup_fn
+
+        self.state = NOT_LOADED
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self._instance: Any = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """The loaded model, loading it now if needed. Re-raises the loader's error on failure."""
+        if self.state == READY:
+            return self._instance
+        with self._lock:
+            if self.state == READY:
+                return self._instance
+            self.state = LOADING
+            logger.info("Loading model '%s'...", self.name)
+            started = time.perf_counter()
+            try:
+                instance = self.loader()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                logger.error("Failed to load model '%s': %s", self.name, e)
+                raise
+            self.load_seconds = time.perf_counter() - started
+            self.loaded_at = time.time()
+            self._instance = instance
+            self.error = None
+            self.state = READY
+            logger.info("Model '%s' loaded in %.2fs", self.name, self.load_seconds)
+            return instance
+
+    def warmup(self):
+        """Load the model and run its dummy batch once."""
+        model = self.get()
+        if self.warmup_fn is None or self.warmup_seconds is not None:
+            return
+        started = time.perf_counter()
+        self.warmup_fn(model)
+        self.warmup_seconds = time.perf_counter() - started
+        logger.info("Model '%s' warmed up in %.2fs", self.name, self.warmup_seconds)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.state == READY
+
+    def status(self) -> Dict:
+        return {
+            'state': self.state,
+            'load_seconds': None if self.load_seconds is None else round(self.load_seconds, 3),
+            'warmup_seconds': None if self.warmup_seconds is None else round(self.warmup_seconds, 3),
+            'error': self.error,
+        }
+
+
+class ModelRegistry:
+    """Named lazy models plus an optional background warmup of the whole set"""
+
+    def __init__(self):
+        self._models: Dict[str, LazyModel] = {}
+        self._warmup_hooks: List[Callable[[], Any]] = []
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._warmup_lock = threading.Lock()
+        self.warmed_up = False
+        self.warmup_error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 warmup_fn: Optional[Callable[[Any], Any]] = None) -> LazyModel:
+        model = LazyModel(name, loader, warmup_fn)
+        self._models[name] = model
+        return model
+
+    def add_warmup_hook(self, hook: Callable[[], Any]):
+        """Extra work run after every model has warmed up (e.g. a full dummy request)."""
+        self._warmup_hooks.append(hook)
+
+    def get(self, name: str) -> Any:
+        return self._models[name].get()
+
+    def names(self) -> List[str]:
+        return list(self._models)
+
+    def is_loaded(self, name: str) -> bool:
+        model = self._models.get(name)
+        return model is not None and model.is_loaded
+
+    def load_all(self):
+        for model in self._models.values():
+            model.get()
+
+    def warmup(self):
+        """Load every model, run each one's dummy batch, then the registered warmup hooks."""
+        with self._warmup_lock:
+            if self.warmed_up:
+                return
+            started = time.perf_counter()
+            try:
+                for model in self._models.values():
+                    model.warmup()
+                for hook in self._warmup_hooks:
+                    hook()
+            except Exception as e:
+                self.warmup_error = str(e)
+                logger.error("Model warmup failed: %s", e)
+                raise
+            self.warmup_seconds = time.perf_counter() - started
+            self.warmup_error = None
+            self.warmed_up = True
+            logger.info("Model warmup finished in %.2fs", self.warmup_seconds)
+
+    def start_background_warmup(self) -> threading.Thread:
+        """Run ``warmup`` on a daemon thread so the server can answer liveness probes meanwhile."""
+        if self._warmup_thread is None or not self._warmup_thread.is_alive():
+            def run():
+                try:
+                    self.warmup()
+                except Exception:
+                    pass  # recorded in warmup_error / per-model status
+            self._warmup_thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    @property
+    def is_ready(self) -> bool:
+        return self.warmed_up and all(model.is_loaded for model in self._models.values())
+
+    def status(self) -> Dict:
+        return {
+            'ready': self.is_ready,
+            'warmed_up': self.warmed_up,
+            'warmup_seconds': None if self.warmup_seconds is None else round(self.warmup_seconds, 3),
+            'warmup_error': self.warmup_error,
+            'models': {name: model.status() for name, model in self._models.items()},
+        }
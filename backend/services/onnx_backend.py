@@ -0,0 +1,297 @@
+"""
+services/onnx_backend.py
+int8-quantized ONNX Runtime backend for the itinerary NLP models.
+
+The sentence encoder and the emotion classifier are exported once from their
+Hugging Face checkpoints to ONNX, dynamically quantized to int8 and then served
+with onnxruntime and a standalone ``tokenizers`` tokenizer, so a worker needs
+neither torch nor transformers loaded at request time. The runtime wrappers
+mirror the call shapes the service already uses:
+``encoder.encode(texts) -> (n, dim)`` and ``classifier(texts) -> [{label, score}]``.
+
+Usage:
+    python -m services.onnx_backend export
+    python -m services.onnx_backend parity
+"""
+
+import argparse
+import inspect
+import json
+import logging
+import os
+import shutil
+import sys
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# onnxruntime and tokenizers are optional: only needed when AI_INFERENCE_BACKEND=onnx
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = os.getenv(
+    "AI_ONNX_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "onnx"),
+)
+DEFAULT_THREADS = int(os.getenv("AI_ONNX_THREADS", "0"))
+
+MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+META_FILE = "meta.json"
+
+ONNX_OPSET = 17
+
+# Minimum agreement required by the parity check
+PARITY_MIN_COSINE = 0.98
+PARITY_MIN_LABEL_AGREEMENT = 0.9
+
+PARITY_TEXTS = [
+    "nature photography trekking budget",
+    "luxury spa relaxation backwaters",
+    "temples history culture food",
+    "adventure wildlife safari mountains",
+    "beach sunset seafood relaxation",
+    "kathakali performance art museums",
+    "tea plantation hill station peaceful",
+    "street food markets shopping nightlife",
+]
+
+
+def hub_model_id(model_name: str) -> str:
+    """Hugging Face id for a model name (sentence-transformers short names get their org prefix)."""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def model_path(model_dir: str, model_name: str) -> str:
+    """Directory holding the exported artifacts of ``model_name``."""
+    slug = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in model_name)
+    return os.path.join(model_dir, slug)
+
+
+def is_exported(model_dir: str, model_name: str) -> bool:
+    path = model_path(model_dir, model_name)
+    return all(os.path.isfile(os.path.join(path, name)) for name in (MODEL_FILE, TOKENIZER_FILE, META_FILE))
+
+
+def export_model(model_name: str, kind: str, model_dir: Optional[str] = None) -> str:
+    """
+    Export ``model_name`` to an int8 ONNX graph plus tokenizer under ``model_dir``.
+    ``kind`` is 'encoder' (last hidden state) or 'classifier' (logits).
+    Needs torch, transformers and onnxruntime; returns the artifact directory.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+    model_dir = model_dir or DEFAULT_MODEL_DIR
+    target = model_path(model_dir, model_name)
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    hub_id = hub_model_id(model_name) if kind == "encoder" else model_name
+    logger.info("Exporting %s '%s' to ONNX...", kind, hub_id)
+    tokenizer = AutoTokenizer.from_pretrained(hub_id)
+    model_cls = AutoModel if kind == "encoder" else AutoModelForSequenceClassification
+    model = model_cls.from_pretrained(hub_id).eval()
+
+    sample = tokenizer(["warmup text", "a slightly longer warmup text"], padding=True, return_tensors="pt")
+    input_names = list(sample.keys())
+    output_name = "last_hidden_state" if kind == "encoder" else "logits"
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch", 1: "sequence"} if kind == "encoder" else {0: "batch"}
+
+    class _Wrapped(torch.nn.Module):
+        # Positional inputs in tokenizer order, single tensor output
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            outputs = self.inner(**dict(zip(input_names, inputs)))
+            return outputs[0]
+
+    fp32_path = os.path.join(staging, "model.onnx")
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Newer torch defaults to the dynamo exporter; the TorchScript one handles dynamic_axes directly
+        export_kwargs["dynamo"] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            _Wrapped(model), tuple(sample[name] for name in input_names), fp32_path,
+            input_names=input_names, output_names=[output_name],
+            dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET, do_constant_folding=True,
+            **export_kwargs,
+        )
+    quantize_dynamic(fp32_path, os.path.join(staging, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.unlink(fp32_path)
+
+    tokenizer.backend_tokenizer.save(os.path.join(staging, TOKENIZER_FILE))
+    max_length = min(int(getattr(tokenizer, "model_max_length", 512) or 512), 512)
+    if kind == "encoder":
+        # sentence-transformers truncates at its own max_seq_length (256 for MiniLM)
+        from sentence_transformers import SentenceTransformer
+        max_length = int(SentenceTransformer(model_name, device="cpu").max_seq_length or max_length)
+    meta = {
+        "model_name": model_name,
+        "kind": kind,
+        "input_names": input_names,
+        "max_length": max_length,
+        "pad_token_id": tokenizer.pad_token_id or 0,
+        "pad_token": tokenizer.pad_token,
+        "id2label": {str(k): v for k, v in getattr(model.config, "id2label", {}).items()},
+        "quantization": "dynamic-int8",
+    }
+    with open(os.path.join(staging, META_FILE), "w") as fh:
+        json.dump(meta, fh, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    logger.info("Exported %s to %s", model_name, target)
+    return target
+
+
+class _OnnxModel:
+    """Tokenizer + onnxruntime session for one exported model directory"""
+
+    def __init__(self, model_name: str, model_dir: Optional[str] = None, threads: Optional[int] = None):
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime and tokenizers are required for the ONNX inference backend")
+        self.model_name = model_name
+        self.path = model_path(model_dir or DEFAULT_MODEL_DIR, model_name)
+        with open(os.path.join(self.path, META_FILE)) as fh:
+            self.meta = json.load(fh)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.path, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=int(self.meta["max_length"]))
+        self.tokenizer.enable_padding(pad_id=int(self.meta["pad_token_id"]), pad_token=self.meta["pad_token"] or "[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = DEFAULT_THREADS if threads is None else threads
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(self.path, MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _run(self, texts: Sequence[str]):
+        encodings = self.tokenizer.encode_batch(list(texts))
+        features = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {name: features[name] for name in self.input_names}
+        return self.session.run(None, feeds)[0], features["attention_mask"]
+
+
+class OnnxSentenceEncoder(_OnnxModel):
+    """Drop-in for ``SentenceTransformer.encode``: mean pooling + L2 normalization"""
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size)[0]
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            hidden, mask = self._run(texts[start:start + batch_size])
+            mask = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            batches.append(pooled / np.clip(norms, 1e-12, None))
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(batches).astype(np.float32)
+
+
+class OnnxTextClassifier(_OnnxModel):
+    """Drop-in for a ``text-classification`` pipeline returning the top label per text"""
+
+    def __call__(self, texts, batch_size: int = 32, **kwargs) -> List[Dict]:
+        if isinstance(texts, str):
+            texts = [texts]
+        id2label = self.meta.get("id2label", {})
+        results = []
+        for start in range(0, len(texts), batch_size):
+            logits, _ = self._run(texts[start:start + batch_size])
+            logits = logits - logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=1, keepdims=True)
+            for row in probs:
+                best = int(row.argmax())
+                results.append({'label': id2label.get(str(best), f"LABEL_{best}"), 'score': float(row[best])})
+        return results
+
+
+def load_encoder(model_name: str, model_dir: Optional[str] = None) -> OnnxSentenceEncoder:
+    """ONNX sentence encoder, exporting it first if no artifact exists yet."""
+    model_dir = model_dir or DEFAULT_MODEL_DIR
+    if not is_exported(model_dir, model_name):
+        export_model(model_name, "encoder", model_dir)
+    return OnnxSentenceEncoder(model_name, model_dir)
+
+
+def load_classifier(model_name: str, model_dir: Optional[str] = None) -> OnnxTextClassifier:
+    """ONNX text classifier, exporting it first if no artifact exists yet."""
+    model_dir = model_dir or DEFAULT_MODEL_DIR
+    if not is_exported(model_dir, model_name):
+        export_model(model_name, "classifier", model_dir)
+    return OnnxTextClassifier(model_name, model_dir)
+
+
+def check_parity(encoder_name: str, classifier_name: str, model_dir: Optional[str] = None,
+                 texts: Sequence[str] = PARITY_TEXTS) -> Dict:
+    """Compare ONNX int8 outputs against the PyTorch models on ``texts``."""
+    from sentence_transformers import SentenceTransformer
+    from transformers import pipeline
+
+    texts = list(texts)
+    reference = SentenceTransformer(encoder_name, device="cpu").encode(texts, normalize_embeddings=True)
+    candidate = load_encoder(encoder_name, model_dir).encode(texts)
+    cosines = (np.asarray(reference) * candidate).sum(axis=1)
+
+    reference_labels = [r['label'] for r in pipeline("text-classification", model=classifier_name, device=-1)(texts)]
+    candidate_labels = [r['label'] for r in load_classifier(classifier_name, model_dir)(texts)]
+    agreement = float(np.mean([a == b for a, b in zip(reference_labels, candidate_labels)]))
+
+    report = {
+        'texts': len(texts),
+        'encoder_min_cosine': float(cosines.min()),
+        'encoder_mean_cosine': float(cosines.mean()),
+        'classifier_label_agreement': agreement,
+    }
+    report['passed'] = (report['encoder_min_cosine'] >= PARITY_MIN_COSINE
+                        and agreement >= PARITY_MIN_LABEL_AGREEMENT)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from ai_itinerary_service import EMOTION_MODEL_NAME, SENTENCE_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Export and verify the int8 ONNX inference backend")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("export", help="Export and quantize the encoder and classifier")
+    commands.add_parser("parity", help="Compare ONNX outputs against the PyTorch models")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "export":
+        export_model(SENTENCE_MODEL_NAME, "encoder", args.model_dir)
+        export_model(EMOTION_MODEL_NAME, "classifier", args.model_dir)
+        return 0
+
+    report = check_parity(SENTENCE_MODEL_NAME, EMOTION_MODEL_NAME, args.model_dir)
+    print(json.dumps(report, indent=2))
+    return 0 if report['passed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
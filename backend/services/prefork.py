@@ -0,0 +1,224 @@
+"""
+services/prefork.py
+Preload-and-fork serving: models load once in a parent process and forked
+uvicorn workers share their weights copy-on-write.
+
+Forked pages stay shared only while nobody writes to them, so before forking:
+
+* torch modules are switched to eval mode with gradients off and their
+  parameters moved into shared memory (``Module.share_memory``). Every weight
+  tensor then lives in its own page-aligned mapping, away from the Python
+  object headers whose reference counts change on each access, and a stray
+  write can no longer duplicate the weights per worker.
+* ``gc.freeze()`` moves every object allocated so far into the permanent
+  generation, so the cyclic GC in the workers stops touching (and copying)
+  their headers.
+
+Native thread pools do not survive ``fork``: the parent runs torch single
+threaded and each worker picks its own thread count after forking. The
+listening socket is bound once in the parent and inherited by every worker,
+and the parent restarts workers that die. POSIX only.
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A worker that exits sooner than this after starting counts as a crash loop
+MIN_WORKER_UPTIME_S = 5.0
+MAX_RESTART_DELAY_S = 30.0
+
+
+def fork_supported() -> bool:
+    return hasattr(os, "fork")
+
+
+def share_model_weights(model) -> bool:
+    """
+    Freeze a torch model (SentenceTransformer, pipeline or bare module) for copy-on-write sharing.
+    Returns False for models that are not torch-based (e.g. the ONNX backend).
+    """
+    if "torch" not in sys.modules:
+        return False
+    import torch
+
+    module = model if isinstance(model, torch.nn.Module) else getattr(model, "model", None)
+    if not isinstance(module, torch.nn.Module):
+        return False
+    module.eval()
+    for parameter in module.parameters():
+        parameter.requires_grad_(False)
+    module.share_memory()
+    return True
+
+
+def _trim_heap():
+    # Hand the heap pages freed by share_memory back to the OS (glibc only)
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def preload(warmup: Callable[[], None], models, use_torch: bool = True):
+    """Load and warm every model in this (parent) process, then freeze the heap for forking."""
+    if use_torch:
+        import torch
+        # Worker processes would hang on an OpenMP pool started here; they size their own pools
+        torch.set_num_threads(1)
+    started = time.perf_counter()
+    warmup()
+    shared = [name for name in models.names() if share_model_weights(models.get(name))]
+    gc.collect()
+    _trim_heap()
+    gc.freeze()
+    logger.info("Preloaded models in %.2fs (shared weights: %s, %d objects frozen)",
+                time.perf_counter() - started, ", ".join(shared) or "none", gc.get_freeze_count())
+
+
+def configure_worker_threads(threads: int):
+    """Size the native thread pools of a freshly forked worker."""
+    if "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(max(1, threads))
+
+
+def memory_usage() -> Dict[str, float]:
+    """
+    RSS, PSS and shared/private memory of this process in MiB (Linux ``smaps_rollup``).
+    With preloaded workers most of the model weights show up as shared; PSS divides them
+    between the processes mapping them.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {}
+    mib = lambda *names: round(sum(fields.get(name, 0) for name in names) / 1024.0, 1)
+    return {
+        'rss_mib': mib("Rss"),
+        'pss_mib': mib("Pss"),
+        'shared_mib': mib("Shared_Clean", "Shared_Dirty"),
+        'private_mib': mib("Private_Clean", "Private_Dirty"),
+    }
+
+
+class PreforkServer:
+    """Bind once, fork ``workers`` uvicorn servers on the shared socket and keep them running"""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 8001, workers: int = 2,
+                 log_level: str = "info", worker_threads: Optional[int] = None,
+                 on_fork: Optional[Callable[[], None]] = None):
+        if not fork_supported():
+            raise RuntimeError("Prefork serving needs os.fork (POSIX)")
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.log_level = log_level
+        self.worker_threads = worker_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.on_fork = on_fork
+        self.socket: Optional[socket.socket] = None
+        self._children: Dict[int, float] = {}
+        self._shutting_down = False
+        self._restart_delay = 0.0
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = time.monotonic()
+            return pid
+
+        # Worker process: uvicorn installs its own SIGINT/SIGTERM handlers for graceful shutdown
+        code = 0
+        try:
+            for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            configure_worker_threads(self.worker_threads)
+            if self.on_fork is not None:
+                self.on_fork()
+            import uvicorn
+            config = uvicorn.Config(self.app, log_level=self.log_level)
+            uvicorn.Server(config).run(sockets=[self.socket])
+        except BaseException as e:
+            if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+                logger.exception("Worker %d crashed: %s", os.getpid(), e)
+                code = 1
+        finally:
+            os._exit(code)
+
+    def _stop(self, signum, _frame):
+        if self._shutting_down:
+            return
+        logger.info("Received %s, stopping %d workers", signal.Signals(signum).name, len(self._children))
+        self._shutting_down = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self) -> List[int]:
+        exited = []
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, 0 if self._shutting_down else os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                break
+            if pid == 0:
+                break
+            started = self._children.pop(pid, None)
+            if started is None:
+                continue
+            exited.append(pid)
+            if not self._shutting_down:
+                uptime = time.monotonic() - started
+                logger.warning("Worker %d exited with status %d after %.1fs", pid, os.waitstatus_to_exitcode(status), uptime)
+                # Back off when workers die right after starting instead of fork-bombing
+                self._restart_delay = (min(MAX_RESTART_DELAY_S, max(1.0, self._restart_delay * 2))
+                                       if uptime < MIN_WORKER_UPTIME_S else 0.0)
+        return exited
+
+    def run(self):
+        """Serve until SIGINT/SIGTERM; call after ``preload`` so workers inherit the loaded models."""
+        self.socket = self._bind()
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        logger.info("Serving on %s:%d with %d preforked workers (%d threads each)",
+                    self.host, self.port, self.workers, self.worker_threads)
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            while not self._shutting_down:
+                time.sleep(0.5)
+                if self._reap() and not self._shutting_down:
+                    if self._restart_delay:
+                        time.sleep(self._restart_delay)
+                    while len(self._children) < self.workers and not self._shutting_down:
+                        self._spawn()
+            self._reap()
+        finally:
+            self.socket.close()
+        logger.info("All workers stopped")
@@ -0,0 +1,342 @@
+"""
+services/profiling.py
+Opt-in sampling profiler for itinerary generation.
+
+A configurable fraction of requests (``AI_PROFILE_RATE``, 0 disables) runs under
+a profiler and the results are merged into one process-wide aggregate:
+
+* ``cprofile`` mode: deterministic cProfile per sampled request, merged with
+  ``pstats``; downloadable as a ``.pstats`` file for snakeviz/pstats.
+* ``sample`` mode: a background thread snapshots the sampled threads' stacks
+  every ``AI_PROFILE_INTERVAL_MS``; lower overhead, statistical timings.
+
+Both modes produce a per-function cumulative/self time table and a
+flamegraph-compatible collapsed-stack file (``frame;frame;frame weight``).
+When a request is not sampled the hook costs one random draw and returns a
+shared no-op context manager.
+"""
+
+import cProfile
+import contextlib
+import logging
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = float(os.getenv("AI_PROFILE_RATE", "0"))
+DEFAULT_MODE = os.getenv("AI_PROFILE_MODE", "cprofile").lower()
+DEFAULT_INTERVAL_MS = float(os.getenv("AI_PROFILE_INTERVAL_MS", "5"))
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# Deepest stack kept per sample / per reconstructed cProfile chain
+MAX_STACK_DEPTH = 64
+
+_NOT_SAMPLED = contextlib.nullcontext()
+
+FuncKey = Tuple[str, int, str]
+
+
+def _frame_label(key: FuncKey) -> str:
+    filename, line, name = key
+    if filename == "~":
+        # cProfile's key for builtins, e.g. ('~', 0, "<built-in method time.sleep>")
+        label = name
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+    # ';' separates frames in the collapsed format
+    return label.replace(";", ":")
+
+
+class _StackSampler:
+    """Daemon thread recording the stacks of registered threads at a fixed interval"""
+
+    def __init__(self, interval_s: float, on_sample):
+        self.interval_s = interval_s
+        self._on_sample = on_sample
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, thread_id: int):
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="profile-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def remove(self, thread_id: int):
+        with self._lock:
+            remaining = self._threads.get(thread_id, 1) - 1
+            if remaining > 0:
+                self._threads[thread_id] = remaining
+            else:
+                self._threads.pop(thread_id, None)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                watched = list(self._threads)
+            if not watched:
+                # Idle until the next sampled request
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            for thread_id in watched:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._on_sample(self._stack(frame))
+            time.sleep(self.interval_s)
+
+    @staticmethod
+    def _stack(frame) -> Tuple[FuncKey, ...]:
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+
+class SamplingProfiler:
+    """Profiles a random fraction of requests and aggregates the results"""
+
+    def __init__(self, rate: Optional[float] = None, mode: Optional[str] = None,
+                 interval_ms: Optional[float] = None):
+        self._lock = threading.Lock()
+        # cProfile cannot run two profilers at once in one process, so sampled requests take turns
+        self._cprofile_slot = threading.Lock()
+        self.rate = 0.0
+        self.mode = DEFAULT_MODE
+        self.interval_s = (DEFAULT_INTERVAL_MS if interval_ms is None else interval_ms) / 1000.0
+        self._sampler: Optional[_StackSampler] = None
+        self.configure(DEFAULT_RATE if rate is None else rate, mode or DEFAULT_MODE)
+        self.reset()
+
+    def configure(self, rate: Optional[float] = None, mode: Optional[str] = None):
+        """Change the sampling rate and/or mode at runtime; switching modes clears the aggregate."""
+        if mode is not None:
+            mode = mode.lower()
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"Unknown profile mode: {mode}")
+        if rate is not None and not 0.0 <= rate <= 1.0:
+            raise ValueError("Profile rate must be between 0 and 1")
+        with self._lock:
+            if rate is not None:
+                self.rate = float(rate)
+            if mode is not None and mode != self.mode:
+                self.mode = mode
+                self._reset_locked()
+        if self.rate > 0:
+            logger.info("Profiling %.1f%% of itinerary requests (%s mode)", self.rate * 100, self.mode)
+
+    def reset(self):
+        with self._lock:
+            self._reset_locked()
+
+    def _reset_locked(self):
+        self._stats: Optional[pstats.Stats] = None
+        self._samples: Counter = Counter()
+        self._profiled = 0
+        self._skipped_busy = 0
+        self._profiled_seconds = 0.0
+        self._labels: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def profile(self, label: str = "generate"):
+        """
+        Context manager around one request: profiles it with probability ``rate``,
+        otherwise returns a shared no-op context manager.
+        """
+        if self.rate <= 0 or random.random() >= self.rate:
+            return _NOT_SAMPLED
+        return self._profiled_block(label)
+
+    @contextlib.contextmanager
+    def _profiled_block(self, label: str):
+        if self.mode == "sample":
+            with self._sampled_thread():
+                started = time.perf_counter()
+                yield
+        else:
+            if not self._cprofile_slot.acquire(blocking=False):
+                with self._lock:
+                    self._skipped_busy += 1
+                yield
+                return
+            try:
+                profiler = cProfile.Profile()
+                started = time.perf_counter()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Another profiling tool (debugger, coverage) owns the interpreter hooks
+                    with self._lock:
+                        self._skipped_busy += 1
+                    yield
+                    return
+                try:
+                    yield
+                finally:
+                    profiler.disable()
+                self._add_cprofile(profiler)
+            finally:
+                self._cprofile_slot.release()
+        with self._lock:
+            self._profiled += 1
+            self._profiled_seconds += time.perf_counter() - started
+            self._labels[label] += 1
+
+    @contextlib.contextmanager
+    def _sampled_thread(self):
+        with self._lock:
+            if self._sampler is None:
+                self._sampler = _StackSampler(self.interval_s, self._add_sample)
+            sampler = self._sampler
+        thread_id = threading.get_ident()
+        sampler.add(thread_id)
+        try:
+            yield
+        finally:
+            sampler.remove(thread_id)
+
+    def _add_cprofile(self, profiler: cProfile.Profile):
+        try:
+            stats = pstats.Stats(profiler)
+        except TypeError:
+            # Nothing was recorded
+            return
+        with self._lock:
+            if self._stats is None:
+                self._stats = stats
+            else:
+                self._stats.add(stats)
+
+    def _add_sample(self, stack: Tuple[FuncKey, ...]):
+        with self._lock:
+            self._samples[stack] += 1
+
+    def function_table(self, limit: int = 50, sort: str = "cumulative") -> List[Dict]:
+        """Per-function call counts and cumulative/self times in milliseconds, slowest first."""
+        sort_field = 'cumulative_ms' if sort == "cumulative" else 'self_ms'
+        if self.mode == "sample":
+            rows = self._sample_table()
+        else:
+            rows = self._cprofile_table()
+        rows.sort(key=lambda row: row[sort_field], reverse=True)
+        return rows[:limit]
+
+    def _cprofile_table(self) -> List[Dict]:
+        with self._lock:
+            raw = dict(self._stats.stats) if self._stats is not None else {}
+        return [
+            {
+                'function': _frame_label(key),
+                'calls': calls,
+                'primitive_calls': primitive_calls,
+                'cumulative_ms': round(cumulative * 1000.0, 3),
+                'self_ms': round(own * 1000.0, 3),
+            }
+            for key, (primitive_calls, calls, own, cumulative, _callers) in raw.items()
+        ]
+
+    def _sample_table(self) -> List[Dict]:
+        with self._lock:
+            samples = dict(self._samples)
+        cumulative: Counter = Counter()
+        own: Counter = Counter()
+        for stack, count in samples.items():
+            for key in set(stack):
+                cumulative[key] += count
+            if stack:
+                own[stack[-1]] += count
+        interval_ms = self.interval_s * 1000.0
+        return [
+            {
+                'function': _frame_label(key),
+                'samples': count,
+                'cumulative_ms': round(count * interval_ms, 3),
+                'self_ms': round(own[key] * interval_ms, 3),
+            }
+            for key, count in cumulative.items()
+        ]
+
+    def collapsed_stacks(self) -> str:
+        """
+        Aggregate in the collapsed-stack format read by flamegraph.pl, speedscope and
+        inferno. Sample mode weights are sample counts; cProfile mode weights are self
+        time in microseconds along each function's most expensive caller chain.
+        """
+        if self.mode == "sample":
+            with self._lock:
+                samples = dict(self._samples)
+            folded = Counter()
+            for stack, count in samples.items():
+                folded[";".join(_frame_label(key) for key in stack)] += count
+        else:
+            with self._lock:
+                raw = dict(self._stats.stats) if self._stats is not None else {}
+            folded = self._fold_pstats(raw)
+        return "".join(f"{stack} {weight}\n" for stack, weight in sorted(folded.items()) if stack and weight > 0)
+
+    @staticmethod
+    def _fold_pstats(raw: Dict) -> Counter:
+        # cProfile keeps only caller -> callee edges, so each function is placed under the
+        # chain of callers that accounted for most of its cumulative time
+        folded = Counter()
+        for key, (_, _, own, _, _) in raw.items():
+            weight = int(own * 1_000_000)
+            if weight <= 0:
+                continue
+            chain = [key]
+            current = key
+            while len(chain) < MAX_STACK_DEPTH:
+                callers = raw.get(current, (0, 0, 0, 0, {}))[4]
+                # Skip callers already on the chain (recursion, dunder <-> builtin ping-pong)
+                candidates = [caller for caller in callers if caller not in chain]
+                if not candidates:
+                    break
+                caller = max(candidates, key=lambda c: callers[c][3])
+                chain.append(caller)
+                current = caller
+            folded[";".join(_frame_label(k) for k in reversed(chain))] += weight
+        return folded
+
+    def pstats_bytes(self) -> Optional[bytes]:
+        """Aggregate in the marshal format of ``pstats.Stats.dump_stats`` (cProfile mode only)."""
+        with self._lock:
+            if self._stats is None:
+                return None
+            return marshal.dumps(self._stats.stats)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'enabled': self.rate > 0,
+                'rate': self.rate,
+                'mode': self.mode,
+                'interval_ms': round(self.interval_s * 1000.0, 3) if self.mode == "sample" else None,
+                'profiled_requests': self._profiled,
+                'profiled_by_endpoint': dict(self._labels),
+                'skipped_busy': self._skipped_busy,
+                'profiled_seconds': round(self._profiled_seconds, 3),
+                'stack_samples': sum(self._samples.values()),
+            }
+
+
+# Process-wide profiler shared by the AI service and the API server
+profiler = SamplingProfiler()
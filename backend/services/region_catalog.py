@@ -0,0 +1,250 @@
+"""
+services/region_catalog.py
+Pluggable, lazily loaded destination/activity catalogs, one per region.
+
+Each region lives in its own directory of columnar Parquet files:
+
+    <AI_CATALOG_DIR>/<region>/destinations.parquet
+    <AI_CATALOG_DIR>/<region>/activities.parquet
+
+Files are read memory-mapped through pyarrow on first use of a region, handed
+to a ``prepare`` hook (which builds indexes, matrices and embeddings) and kept
+in an LRU of at most ``AI_MAX_RESIDENT_REGIONS`` prepared regions. Regions can
+also be registered in code as built-in loaders, used when no files exist.
+
+Usage:
+    python -m services.region_catalog list
+    python -m services.region_catalog export kerala
+    python -m services.region_catalog import rajasthan path/to/rajasthan.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# pyarrow is optional: without it only built-in regions are available
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_DIR = os.getenv(
+    "AI_CATALOG_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "catalog"),
+)
+DEFAULT_MAX_RESIDENT = int(os.getenv("AI_MAX_RESIDENT_REGIONS", "4"))
+
+DESTINATIONS_FILE = "destinations.parquet"
+ACTIVITIES_FILE = "activities.parquet"
+
+# List-valued columns come back from Arrow as numpy arrays; convert them to lists
+LIST_COLUMNS = ("activities", "tags")
+
+# Region keys double as directory names under the catalog dir, so only plain names are accepted
+REGION_NAME = re.compile(r"^[a-z0-9_-]+$")
+
+Frames = Tuple[pd.DataFrame, pd.DataFrame]
+
+
+def normalize_region(name: str) -> str:
+    """Catalog key for a user-facing destination ("Kerala, India" -> "kerala")."""
+    return (name or "").split(",")[0].strip().lower().replace(" ", "_")
+
+
+def is_valid_region(region: str) -> bool:
+    """Whether a normalized region key is safe to use as a catalog directory name."""
+    return bool(REGION_NAME.match(region))
+
+
+def read_frames(region_dir: str) -> Frames:
+    """Read a region's destination and activity tables (memory-mapped)."""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required to read columnar region catalogs")
+    frames = []
+    for filename in (DESTINATIONS_FILE, ACTIVITIES_FILE):
+        table = pq.read_table(os.path.join(region_dir, filename), memory_map=True)
+        df = table.to_pandas()
+        for column in LIST_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].map(list)
+        frames.append(df)
+    return frames[0], frames[1]
+
+
+def write_frames(region_dir: str, destinations_df: pd.DataFrame, activities_df: pd.DataFrame):
+    """Write a region's tables as Parquet files."""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required to write columnar region catalogs")
+    os.makedirs(region_dir, exist_ok=True)
+    for filename, df in ((DESTINATIONS_FILE, destinations_df), (ACTIVITIES_FILE, activities_df)):
+        tmp_path = os.path.join(region_dir, filename + ".tmp")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+        os.replace(tmp_path, os.path.join(region_dir, filename))
+
+
+class RegionCatalog:
+    """LRU of prepared regions, loaded on first use from Parquet files or built-in loaders"""
+
+    def __init__(self, catalog_dir: Optional[str] = None, max_resident: Optional[int] = None,
+                 prepare: Optional[Callable[[str, pd.DataFrame, pd.DataFrame], Any]] = None):
+        self.catalog_dir = catalog_dir or DEFAULT_CATALOG_DIR
+        self.max_resident = max(1, max_resident or DEFAULT_MAX_RESIDENT)
+        self.prepare = prepare or (lambda region, destinations_df, activities_df: (destinations_df, activities_df))
+
+        self._builtin: Dict[str, Callable[[], Frames]] = {}
+        self._resident: "OrderedDict[str, Any]" = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._loads = 0
+        self._evictions = 0
+
+    def register_builtin(self, region: str, loader: Callable[[], Frames]):
+        """Register an in-code catalog used when the region has no files on disk."""
+        self._builtin[normalize_region(region)] = loader
+
+    def pin(self, region: str):
+        """Keep a region resident regardless of LRU pressure."""
+        self._pinned.add(normalize_region(region))
+
+    def _region_dir(self, region: str) -> str:
+        if not is_valid_region(region):
+            raise ValueError(f"Invalid region name: {region!r}")
+        return os.path.join(self.catalog_dir, region)
+
+    def _has_files(self, region: str) -> bool:
+        if not is_valid_region(region):
+            return False
+        region_dir = self._region_dir(region)
+        return (PYARROW_AVAILABLE
+                and os.path.isfile(os.path.join(region_dir, DESTINATIONS_FILE))
+                and os.path.isfile(os.path.join(region_dir, ACTIVITIES_FILE)))
+
+    def available_regions(self) -> List[str]:
+        regions = set(self._builtin)
+        if os.path.isdir(self.catalog_dir):
+            regions.update(name for name in os.listdir(self.catalog_dir) if self._has_files(name))
+        return sorted(regions)
+
+    def has_region(self, region: str) -> bool:
+        region = normalize_region(region)
+        return region in self._builtin or self._has_files(region)
+
+    def load_frames(self, region: str) -> Frames:
+        """Raw tables for a region, preferring files on disk over built-in loaders."""
+        region = normalize_region(region)
+        if self._has_files(region):
+            return read_frames(self._region_dir(region))
+        if region in self._builtin:
+            return self._builtin[region]()
+        raise KeyError(f"Unknown region: {region}")
+
+    def get(self, region: str) -> Any:
+        """Prepared data for ``region``, loading and preparing it on first use."""
+        region = normalize_region(region)
+        with self._lock:
+            if region in self._resident:
+                self._resident.move_to_end(region)
+                return self._resident[region]
+            load_lock = self._load_locks.setdefault(region, threading.Lock())
+
+        # Load outside the global lock so other regions stay available, but only once per region
+        with load_lock:
+            with self._lock:
+                if region in self._resident:
+                    self._resident.move_to_end(region)
+                    return self._resident[region]
+
+            logger.info("Loading catalog for region '%s'...", region)
+            destinations_df, activities_df = self.load_frames(region)
+            prepared = self.prepare(region, destinations_df, activities_df)
+
+            with self._lock:
+                self._resident[region] = prepared
+                self._loads += 1
+                self._evict_locked()
+            return prepared
+
+    def peek(self, region: str) -> Optional[Any]:
+        """Prepared data for ``region`` if it is already resident; never loads or prepares it."""
+        with self._lock:
+            return self._resident.get(normalize_region(region))
+
+    def _evict_locked(self):
+        while len(self._resident) > self.max_resident:
+            victim = next((name for name in self._resident if name not in self._pinned), None)
+            if victim is None:
+                return
+            del self._resident[victim]
+            self._evictions += 1
+            logger.info("Evicted region '%s' from the catalog cache", victim)
+
+    def resident_regions(self) -> List[str]:
+        with self._lock:
+            return list(self._resident)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'available_regions': self.available_regions(),
+                'resident_regions': list(self._resident),
+                'max_resident': self.max_resident,
+                'loads': self._loads,
+                'evictions': self._evictions,
+                'columnar_backend': 'pyarrow' if PYARROW_AVAILABLE else None,
+            }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage columnar region catalogs for the AI itinerary service")
+    parser.add_argument("--catalog-dir", default=DEFAULT_CATALOG_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List available regions")
+    export = commands.add_parser("export", help="Write a built-in region to Parquet")
+    export.add_argument("region")
+    imported = commands.add_parser("import", help="Convert a JSON catalog ({destinations, activities}) to Parquet")
+    imported.add_argument("region")
+    imported.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        from ai_itinerary_service import register_builtin_regions
+        catalog = RegionCatalog(args.catalog_dir)
+        register_builtin_regions(catalog)
+        for region in catalog.available_regions():
+            print(region)
+        return 0
+
+    region = normalize_region(args.region)
+    if not is_valid_region(region):
+        parser.error(f"invalid region name {args.region!r}: use letters, digits, '_' and '-'")
+    if args.command == "export":
+        from ai_itinerary_service import register_builtin_regions
+        catalog = RegionCatalog(args.catalog_dir)
+        register_builtin_regions(catalog)
+        destinations_df, activities_df = catalog.load_frames(region)
+    else:
+        with open(args.path) as fh:
+            data = json.load(fh)
+        destinations_df = pd.DataFrame(data["destinations"])
+        activities_df = pd.DataFrame(data["activities"])
+
+    write_frames(os.path.join(args.catalog_dir, region), destinations_df, activities_df)
+    print(f"Wrote {len(destinations_df)} destinations and {len(activities_df)} activities for '{region}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
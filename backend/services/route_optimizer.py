@@ -0,0 +1,197 @@
+"""
+services/route_optimizer.py
+Route optimization over a precomputed NumPy cost matrix.
+
+Routes are open paths with a fixed first stop (the traveller does not return
+to the start). Small instances are solved exactly with Held-Karp dynamic
+programming vectorized over subset layers; larger ones start from a
+nearest-neighbour tour and are improved with 2-opt and Or-opt local search
+until no move helps or the per-call time budget runs out. Local search
+assumes a symmetric matrix, which holds for the distance-derived matrices
+used by the itinerary service.
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXACT_STOP_LIMIT = int(os.getenv("AI_ROUTE_EXACT_LIMIT", "12"))
+DEFAULT_TIME_BUDGET_MS = float(os.getenv("AI_ROUTE_TIME_BUDGET_MS", "20"))
+
+_EPSILON = 1e-9
+
+
+@dataclass
+class RouteSolution:
+    """Visiting order (matrix indices), its total cost and the method that produced it"""
+    order: List[int]
+    cost: float
+    method: str
+
+
+def path_cost(matrix: np.ndarray, order: List[int]) -> float:
+    """Total cost of visiting ``order`` as an open path."""
+    if len(order) < 2:
+        return 0.0
+    order = np.asarray(order)
+    return float(matrix[order[:-1], order[1:]].sum())
+
+
+def solve_route(matrix: np.ndarray, start: int = 0, time_budget_ms: Optional[float] = None,
+                exact_limit: int = EXACT_STOP_LIMIT) -> RouteSolution:
+    """
+    Find a minimum-cost open path through every node of ``matrix`` beginning at ``start``.
+    Exact for up to ``exact_limit`` nodes, near-optimal local search above that.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = matrix.shape[0]
+    if n <= 2:
+        order = [start] + [i for i in range(n) if i != start]
+        return RouteSolution(order, path_cost(matrix, order), 'trivial')
+
+    if n <= exact_limit:
+        order = _held_karp(matrix, start)
+        return RouteSolution(order, path_cost(matrix, order), 'held-karp')
+
+    budget = DEFAULT_TIME_BUDGET_MS if time_budget_ms is None else time_budget_ms
+    deadline = time.perf_counter() + budget / 1000.0
+    path = _nearest_neighbour(matrix, start)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = _two_opt_pass(matrix, path, deadline)
+        improved = _or_opt_pass(matrix, path, deadline) or improved
+    order = path.tolist()
+    return RouteSolution(order, path_cost(matrix, order), '2-opt+or-opt')
+
+
+@lru_cache(maxsize=None)
+def _subset_layers(n: int) -> Tuple[np.ndarray, ...]:
+    """Bitmasks over ``n`` nodes grouped by population count (layer k holds k-element subsets)."""
+    masks = np.arange(1 << n, dtype=np.int64)
+    popcount = ((masks[:, None] >> np.arange(n)) & 1).sum(axis=1)
+    return tuple(masks[popcount == k] for k in range(n + 1))
+
+
+def _held_karp(matrix: np.ndarray, start: int) -> List[int]:
+    n = matrix.shape[0]
+    full = (1 << n) - 1
+    start_bit = 1 << start
+    dp = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+    dp[start_bit, start] = 0.0
+
+    layers = _subset_layers(n)
+    for size in range(2, n + 1):
+        layer = layers[size]
+        layer = layer[(layer & start_bit) != 0]
+        for j in range(n):
+            if j == start:
+                continue
+            bit = 1 << j
+            subsets = layer[(layer & bit) != 0]
+            # Best way to end at j: come from some k in the subset without j
+            candidates = dp[subsets ^ bit] + matrix[:, j]
+            best = candidates.argmin(axis=1)
+            dp[subsets, j] = candidates[np.arange(len(subsets)), best]
+            parent[subsets, j] = best
+
+    last = int(dp[full].argmin())
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last)
+        previous = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous
+    order.reverse()
+    return order
+
+
+def _nearest_neighbour(matrix: np.ndarray, start: int) -> np.ndarray:
+    n = matrix.shape[0]
+    visited = np.zeros(n, dtype=bool)
+    path = np.empty(n, dtype=np.int64)
+    current = start
+    for position in range(n):
+        path[position] = current
+        visited[current] = True
+        if position == n - 1:
+            break
+        row = np.where(visited, np.inf, matrix[current])
+        current = int(row.argmin())
+    return path
+
+
+def _two_opt_pass(matrix: np.ndarray, path: np.ndarray, deadline: float) -> bool:
+    """One sweep of best-improvement segment reversals; mutates ``path`` in place."""
+    n = len(path)
+    improved = False
+    for i in range(1, n - 1):
+        if time.perf_counter() >= deadline:
+            break
+        a, b = path[i - 1], path[i]
+        ks = np.arange(i + 1, n)
+        c = path[ks]
+        delta = matrix[a, c] - matrix[a, b]
+        # Reversing path[i..k] also changes the edge leaving the segment, unless k is the last stop
+        inner = ks < n - 1
+        d = path[ks[inner] + 1]
+        delta[inner] += matrix[b, d] - matrix[c[inner], d]
+        best = int(delta.argmin())
+        if delta[best] < -_EPSILON:
+            k = int(ks[best])
+            path[i:k + 1] = path[i:k + 1][::-1].copy()
+            improved = True
+    return improved
+
+
+def _or_opt_pass(matrix: np.ndarray, path: np.ndarray, deadline: float) -> bool:
+    """Relocate segments of 1-3 stops (optionally reversed) to their cheapest position."""
+    n = len(path)
+    improved = False
+    for length in (1, 2, 3):
+        i = 1
+        while i + length <= n:
+            if time.perf_counter() >= deadline:
+                return improved
+            segment = path[i:i + length].copy()
+            first, last = segment[0], segment[-1]
+            before = path[i - 1]
+            has_after = i + length < n
+            removal_gain = matrix[before, first]
+            if has_after:
+                after = path[i + length]
+                removal_gain += matrix[last, after] - matrix[before, after]
+
+            rest = np.concatenate((path[:i], path[i + length:]))
+            q = rest
+            r = np.empty_like(rest)
+            r[:-1] = rest[1:]
+            forward = matrix[q, first]
+            backward = matrix[q, last]
+            forward[:-1] += matrix[last, r[:-1]] - matrix[q[:-1], r[:-1]]
+            backward[:-1] += matrix[first, r[:-1]] - matrix[q[:-1], r[:-1]]
+            # Inserting right back where it came from is not a move
+            forward[i - 1] = np.inf
+            backward[i - 1] = np.inf if length == 1 else backward[i - 1]
+
+            best_forward = int(forward.argmin())
+            best_backward = int(backward.argmin())
+            if forward[best_forward] <= backward[best_backward]:
+                position, cost, moved = best_forward, forward[best_forward], segment
+            else:
+                position, cost, moved = best_backward, backward[best_backward], segment[::-1]
+
+            if cost - removal_gain < -_EPSILON:
+                path[:] = np.concatenate((rest[:position + 1], moved, rest[position + 1:]))
+                improved = True
+            else:
+                i += 1
+    return improved
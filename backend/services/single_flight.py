@@ -0,0 +1,189 @@
+"""
+services/single_flight.py
+Request coalescing: concurrent calls with the same key share one execution.
+
+Within a process the first caller for a key becomes the leader and runs the
+work; callers arriving while it is in flight wait for it and receive a deep
+copy of its result (or its exception). When Redis is connected through
+``app/cache.py`` the leader also takes a short-lived lock there, renewed while
+it runs, so leaders in other worker processes wait as well and poll a
+``lookup`` callback (normally the shared response cache) instead of repeating
+the work. If the remote leader disappears (its lock lapses) or takes longer
+than the wait timeout, the waiter runs the work itself.
+"""
+
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTED = os.getenv("AI_SINGLE_FLIGHT_DISTRIBUTED", "true").lower() in ("1", "true", "yes")
+# Lease of the Redis lock; the leader renews it every third of this while it runs,
+# so the lock only lapses this long after its holder died
+DEFAULT_LOCK_TTL_S = float(os.getenv("AI_SINGLE_FLIGHT_LOCK_TTL", "30"))
+DEFAULT_WAIT_TIMEOUT_S = float(os.getenv("AI_SINGLE_FLIGHT_WAIT_S", "90"))
+DEFAULT_POLL_INTERVAL_S = float(os.getenv("AI_SINGLE_FLIGHT_POLL_MS", "200")) / 1000.0
+
+LOCK_PREFIX = "single_flight"
+
+# Delete the lock only if this holder still owns it
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+# Extend the lock's lease only if this holder still owns it
+_RENEW_SCRIPT = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                 "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end")
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent ``do(key, fn)`` calls across threads and, optionally, worker processes"""
+
+    def __init__(self, distributed: bool = DISTRIBUTED, lock_ttl: float = DEFAULT_LOCK_TTL_S,
+                 wait_timeout: float = DEFAULT_WAIT_TIMEOUT_S, poll_interval: float = DEFAULT_POLL_INTERVAL_S):
+        self.distributed = distributed
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {'leaders': 0, 'shared': 0, 'remote_waits': 0, 'remote_shared': 0,
+                       'wait_timeouts': 0, 'lock_errors': 0}
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def do(self, key: str, fn: Callable[[], Any],
+           lookup: Optional[Callable[[], Any]] = None) -> Tuple[Any, bool]:
+        """
+        Run ``fn`` once per concurrent ``key`` and return ``(result, shared)``.
+        ``shared`` is True when the result came from another caller's execution.
+        ``lookup`` returns the finished result published by another process, or None.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['leaders'] += 1
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                logger.warning("Single-flight leader for %s still running after %.0fs; running it again",
+                               key, self.wait_timeout)
+                self._count('wait_timeouts')
+                return fn(), False
+            self._count('shared')
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+
+        result = None
+        try:
+            result, shared = self._run_leader(key, fn, lookup)
+            return result, shared
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                waiters = call.waiters
+            if waiters:
+                # Snapshot before the leader's caller gets to mutate its result
+                call.result = copy.deepcopy(result)
+                logger.info("Single-flight %s served %d waiting callers", key, waiters)
+            call.done.set()
+
+    def _run_leader(self, key: str, fn: Callable[[], Any],
+                    lookup: Optional[Callable[[], Any]]) -> Tuple[Any, bool]:
+        client = get_redis() if self.distributed else None
+        if client is None:
+            return fn(), False
+
+        lock_key = f"{LOCK_PREFIX}:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            if waited and lookup is not None:
+                result = lookup()
+                if result is not None:
+                    self._count('remote_shared')
+                    return result, True
+            try:
+                acquired = client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+            except Exception as e:
+                # Redis trouble must not fail the request; coalesce within this process only
+                logger.warning("Single-flight lock unavailable for %s: %s", key, e)
+                self._count('lock_errors')
+                return fn(), False
+            if acquired:
+                stop_renewing = self._keep_alive(client, lock_key, token)
+                try:
+                    return fn(), False
+                finally:
+                    stop_renewing.set()
+                    self._release(client, lock_key, token)
+
+            if not waited:
+                waited = True
+                self._count('remote_waits')
+            if time.monotonic() >= deadline:
+                logger.warning("Gave up waiting for the remote single-flight holder of %s after %.0fs",
+                               key, self.wait_timeout)
+                self._count('wait_timeouts')
+                return fn(), False
+            # A lock that vanished without a published result is taken over by the set() above
+            time.sleep(self.poll_interval)
+
+    def _keep_alive(self, client, lock_key: str, token: str) -> threading.Event:
+        """Renew the lock's lease in the background until the returned event is set."""
+        stop = threading.Event()
+        ttl_ms = int(self.lock_ttl * 1000)
+
+        def renew():
+            while not stop.wait(self.lock_ttl / 3.0):
+                try:
+                    if not client.eval(_RENEW_SCRIPT, 1, lock_key, token, ttl_ms):
+                        logger.warning("Single-flight lock %s was lost; other workers may repeat the call", lock_key)
+                        self._count('lock_errors')
+                        return
+                except Exception as e:
+                    logger.warning("Could not renew single-flight lock %s: %s", lock_key, e)
+                    self._count('lock_errors')
+
+        threading.Thread(target=renew, name="single-flight-lease", daemon=True).start()
+        return stop
+
+    def _release(self, client, lock_key: str, token: str):
+        try:
+            client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.warning("Could not release single-flight lock %s: %s", lock_key, e)
+            self._count('lock_errors')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'distributed': self.distributed and get_redis() is not None,
+                'in_flight': len(self._calls),
+                **self._stats,
+            }
@@ -1,33 +1,62 @@
 """
 Simple script to start the AI API server without reload for testing
+
+With --workers N (or AI_SERVER_WORKERS) above 1 the models are loaded once in
+this process and N uvicorn workers are forked from it, sharing the model
+weights copy-on-write (see services/prefork.py).
 """
 
 import sys
 import os
+import argparse
 import logging
-from ai_api_server import app
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 if __name__ == "__main__":
     import uvicorn
-    
+
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
-    
-    logger.info("Starting AI Itinerary API Server (simple mode)...")
-    
+
+    parser = argparse.ArgumentParser(description="Start the AI Itinerary API server")
+    parser.add_argument("--host", default=os.getenv("AI_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("AI_SERVER_PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("AI_SERVER_WORKERS", "1")),
+                        help="Preforked worker processes sharing one copy of the models")
+    parser.add_argument("--worker-threads", type=int, default=int(os.getenv("AI_WORKER_THREADS", "0")),
+                        help="Native inference threads per worker (default: CPUs / workers)")
+    args = parser.parse_args()
+
+    from services.prefork import PreforkServer, fork_supported, preload
+    prefork = args.workers > 1 and fork_supported()
+    if args.workers > 1 and not prefork:
+        logger.warning("Preforked workers need os.fork; starting a single worker instead")
+    if prefork:
+        # onnxruntime thread pools do not survive fork; one intra-op thread per worker instead
+        os.environ.setdefault("AI_ONNX_THREADS", "1")
+
+    from ai_api_server import app
+    from ai_itinerary_service import INFERENCE_BACKEND, ai_itinerary_service
+
     try:
-        uvicorn.run(
-            app,
-            host="127.0.0.1",
-            port=8001,
-            reload=False,  # Disable reload to avoid multiprocessing issues
-            log_level="info"
-        )
+        if prefork:
+            logger.info(f"Starting AI Itinerary API Server with {args.workers} preforked workers...")
+            preload(ai_itinerary_service.warmup, ai_itinerary_service.models, use_torch=INFERENCE_BACKEND == 'torch')
+            PreforkServer(app, host=args.host, port=args.port, workers=args.workers,
+                          worker_threads=args.worker_threads or None).run()
+        else:
+            logger.info("Starting AI Itinerary API Server (simple mode)...")
+            uvicorn.run(
+                app,
+                host=args.host,
+                port=args.port,
+                reload=False,  # Disable reload to avoid multiprocessing issues
+                log_level="info"
+            )
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
     except Exception as e:
         logger.error(f"Server failed to start: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)